@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Modelos da grade lado a lado nas mesmas divisões (padrão: RF x GB x Hist GB)
+
+Os modelos escolhidos rodam sobre as mesmas divisões walk-forward e são
+comparados em tempo de treino, vazão da predição e RMSE. Os dados são
+sintéticos, em escalas de 1x, 10x, ... estações, ou vêm de exports reais
+(--origem). As tarefas rodam em sequência: o Hist Gradient Boosting usa
+todos os núcleos (OpenMP) e os demais, um.
+
+Exemplos:
+    python benchmarks/comparar_boosting.py --escalas 1 10 30
+    python benchmarks/comparar_boosting.py --origem "dados/dados_INEP/*.csv" --sem-interpolacao
+    python benchmarks/comparar_boosting.py --modelos SVR "SVR Aproximado" --referencia SVR
+"""
+import argparse
+import sys
+import tempfile
+import warnings
+from functools import partial
+from pathlib import Path
+warnings.filterwarnings('ignore')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import pandas as pd
+
+from clima.comparacao import com_imputacao, criar_modelos, executar_comparacao
+from clima.features import criar_lag_features
+from clima.ingestao import carregar_estacoes
+from clima.validacao import divisao_temporal
+from dados_sinteticos import gerar_estacoes
+
+MODELOS = ['Random Forest', 'Gradient Boosting', 'Hist Gradient Boosting']
+FEATURES = ['temp_minima', 'temp_maxima', 'umidade_relativa_media', 'pressao_atm_media']
+TARGET = 'temp_media'
+
+
+def montar_conjunto(origem, interpolar):
+    """(X, y, datas) com features + lags, como na grade de gerar_comparacao_lag_features.py"""
+    dados, _ = carregar_estacoes(origem, usar_cache=False, interpolar=interpolar)
+    dados = criar_lag_features(dados.reset_index(), grupo='estacao', dropna=interpolar)
+    features = FEATURES + [coluna for coluna in dados.columns if '_lag' in coluna]
+    dados = dados.dropna(subset=features + [TARGET] if interpolar else [TARGET])
+    return dados[features], dados[TARGET], dados['data']
+
+
+def resumir(resultados, escala, referencia):
+    """Uma linha por modelo: tempo de treino, linhas/s na predição e RMSE médios nos folds"""
+    resumo = resultados.groupby('Modelo', sort=False).agg(
+        N_Treino=('N_Treino', 'mean'),
+        Tempo_Treino_s=('Tempo_Treino_s', 'mean'),
+        Tempo_Predicao_s=('Tempo_Predicao_s', 'sum'),
+        N_Teste=('N_Teste', 'sum'),
+        RMSE=('RMSE', 'mean'),
+    )
+    resumo['Predicao_linhas_s'] = resumo.pop('N_Teste') / resumo.pop('Tempo_Predicao_s')
+    if referencia in resumo.index:
+        resumo['Aceleracao_Treino'] = resumo.loc[referencia, 'Tempo_Treino_s'] / resumo['Tempo_Treino_s']
+    return resumo.reset_index().assign(Escala=escala)
+
+
+parser = argparse.ArgumentParser(description='Treino, predição e RMSE de modelos da grade nas mesmas divisões')
+parser.add_argument('--modelos', nargs='+', choices=list(criar_modelos()), default=MODELOS)
+parser.add_argument('--referencia', default='Gradient Boosting',
+                    help='Modelo base da coluna Aceleracao_Treino')
+parser.add_argument('--origem', help='Exports reais do INMET (CSV, diretório ou glob) em vez dos sintéticos')
+parser.add_argument('--escalas', nargs='+', type=int, default=[1, 10],
+                    help='Número de estações sintéticas (ignorado com --origem)')
+parser.add_argument('--dias', type=int, default=4_000, help='Dias por estação sintética')
+parser.add_argument('--folds', type=int, default=3)
+parser.add_argument('--sem-interpolacao', action='store_true',
+                    help='Falhas como NaN (RF/HGB nativos; os demais com imputação pela mediana)')
+parser.add_argument('--saida', help='CSV com o resumo')
+args = parser.parse_args()
+
+modelos = {nome: modelo for nome, modelo in criar_modelos().items() if nome in args.modelos}
+if args.sem_interpolacao:
+    modelos = com_imputacao(modelos)
+divisor = partial(divisao_temporal, n_folds=args.folds, intervalo=7)
+
+resumos = []
+with tempfile.TemporaryDirectory() as temporario:
+    fontes = [('real', args.origem)] if args.origem else [
+        (escala, gerar_estacoes(Path(temporario) / f'{escala}_estacoes', escala, args.dias)[0].parent)
+        for escala in sorted(args.escalas)
+    ]
+    for escala, origem in fontes:
+        X, y, datas = montar_conjunto(origem, interpolar=not args.sem_interpolacao)
+        print(f'\n=== ESCALA {escala} ({len(X):,} linhas, {X.shape[1]} features, {args.folds} folds) ===')
+        resultados = executar_comparacao({'Com Lag Features': (X, y, datas)}, modelos, divisor=divisor, n_jobs=1)
+        resumo = resumir(resultados, escala, args.referencia)
+        print(resumo.drop(columns='Escala').round(4).to_string(index=False))
+        resumos.append(resumo)
+
+if args.saida:
+    pd.concat(resumos, ignore_index=True).to_csv(args.saida, index=False)
+    print(f'\nResumo salvo em: {args.saida}')
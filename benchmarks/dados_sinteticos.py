@@ -0,0 +1,82 @@
+"""
+Dados Sintéticos
+Exports diários no formato do INMET (cabeçalho de metadados + CSV) para os benchmarks
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Cabeçalho igual ao dos exports reais (nomes com vírgula, por isso lidos por posição)
+CABECALHO_DADOS = (
+    'Data Medicao,PRECIPITACAO TOTAL, DIARIO (AUT)(mm),PRESSAO ATMOSFERICA MEDIA DIARIA (AUT)(mB),'
+    'TEMPERATURA DO PONTO DE ORVALHO MEDIA DIARIA (AUT)(°C),TEMPERATURA MAXIMA, DIARIA (AUT)(°C),'
+    'TEMPERATURA MEDIA, DIARIA (AUT)(°C),TEMPERATURA MINIMA, DIARIA (AUT)(°C)'
+)
+
+
+def dados_estacao(n_dias, inicio='2014-01-01', proporcao_nulos=0.03, semente=0):
+    """Série diária com sazonalidade e ruído nas colunas de COLUNAS_INMET"""
+    rng = np.random.default_rng(semente)
+    datas = pd.date_range(inicio, periods=n_dias, freq='D')
+    fase = 2 * np.pi * datas.dayofyear.to_numpy() / 365.25
+
+    temp_media = 22 + 4 * np.cos(fase) + rng.normal(0, 1.5, n_dias)
+    amplitude = rng.gamma(4, 2.5, n_dias)
+    umidade = np.clip(70 + 10 * np.cos(fase) + rng.normal(0, 8, n_dias), 15, 100)
+
+    df = pd.DataFrame({
+        'data': datas.strftime('%Y-%m-%d'),
+        'precipitacao_total': np.round(rng.exponential(4, n_dias) * (rng.random(n_dias) < 0.3), 1),
+        'pressao_atm_media': np.round(962 - 3 * np.cos(fase) + rng.normal(0, 2, n_dias), 1),
+        'temp_orvalho_media': np.round(temp_media - (100 - umidade) / 5, 1),
+        'temp_maxima': np.round(temp_media + amplitude / 2, 1),
+        'temp_media': np.round(temp_media, 1),
+        'temp_minima': np.round(temp_media - amplitude / 2, 1),
+        'umidade_relativa_media': np.round(umidade, 1),
+        'umidade_relativa_minima': np.round(np.clip(umidade - rng.gamma(4, 5, n_dias), 5, 100), 0),
+        'umidade_relativa_maxima': np.round(np.clip(umidade + rng.gamma(4, 4, n_dias), 5, 100), 0),
+        'vento_vel_media': np.round(rng.gamma(2, 0.7, n_dias), 1),
+    })
+
+    # falhas de sensor, como nos exports reais
+    valores = df.columns[1:]
+    nulos = rng.random((n_dias, len(valores))) < proporcao_nulos
+    df[valores] = df[valores].astype(object).mask(nulos, 'null')
+    return df
+
+
+def escrever_csv_inmet(df, caminho, estacao, nome=None):
+    """Grava o DataFrame com as 11 linhas de metadados de um export do INMET"""
+    metadados = [
+        f'Nome: {nome or estacao}',
+        f'Codigo Estacao: {estacao}',
+        'Latitude: -22.11999999',
+        'Longitude: -51.40861111',
+        'Altitude: 431.92',
+        'Situacao: Operante',
+        f"Data Inicial: {df['data'].iloc[0]}",
+        f"Data Final: {df['data'].iloc[-1]}",
+        'Periodicidade da Medicao: Diaria',
+        '',
+    ]
+    separadores = ',' * (len(df.columns) - 1)
+    with open(caminho, 'w', encoding='latin1', newline='') as arquivo:
+        for linha in metadados:
+            arquivo.write(f'{linha}{separadores}\n')
+        arquivo.write(CABECALHO_DADOS + '\n')
+        df.to_csv(arquivo, header=False, index=False)
+
+
+def gerar_estacoes(diretorio, n_estacoes, n_dias):
+    """Gera `n_estacoes` exports sintéticos em `diretorio`; retorna os caminhos"""
+    diretorio = Path(diretorio)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    caminhos = []
+    for i in range(n_estacoes):
+        estacao = f'S{i:03d}'
+        caminho = diretorio / f'dados_{estacao}_D.csv'
+        escrever_csv_inmet(dados_estacao(n_dias, semente=i), caminho, estacao)
+        caminhos.append(caminho)
+    return caminhos
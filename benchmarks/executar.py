@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Benchmarks dos caminhos críticos (leitura, features, treino, predição, explicações)
+
+Cada etapa roda em escalas 1x, 10x e 100x (número de estações sintéticas de
+`--dias` dias cada) e o resultado vai para um JSON comparável entre commits.
+
+Exemplos:
+    python benchmarks/executar.py
+    python benchmarks/executar.py --etapas lags predict --escalas 1 10
+    python benchmarks/executar.py --comparar benchmarks/resultados/<anterior>.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime
+from pathlib import Path
+warnings.filterwarnings('ignore')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.base import clone
+
+from clima.comparacao import criar_modelos
+from clima.explicacao import (AMOSTRA_FUNDO, LimeTabularExplainer, calcular_valores_shap, criar_explicador,
+                              explicar_lime_lote, obter_treino_lime, salvar_explicador, shap)
+from clima.features import criar_lag_features
+from clima.ingestao import (_eh_horario, _opcoes_leitura, _preparar_dados, caminho_cache, carregar_inmet,
+                            interpolar_no_tempo, ler_metadados_inmet)
+from clima.registro import registrar_modelo
+from dados_sinteticos import gerar_estacoes
+
+DIRETORIO_RESULTADOS = Path(__file__).resolve().parent / 'resultados'
+FEATURES = ['temp_minima', 'temp_maxima', 'umidade_relativa_media', 'pressao_atm_media']
+TARGET = 'temp_media'
+ETAPAS = ['parse_csv', 'interpolacao', 'lags', 'treino', 'predict', 'shap', 'lime']
+# Linhas explicadas por escala 1x (SHAP/LIME são caros por linha)
+LINHAS_EXPLICACAO = {'shap': 20, 'lime': 5}
+MODELO_EXPLICADO = 'Random Forest'
+
+
+def medir(funcao, repeticoes, preparar=None):
+    """
+    Uma execução de aquecimento (fora da medição) e `repeticoes` cronometradas;
+    se o aquecimento passar de 10s, só uma. `preparar` roda antes de cada
+    execução, fora do cronômetro (ex.: apagar o cache para medir a leitura fria).
+    """
+    if preparar is not None:
+        preparar()
+    inicio = time.perf_counter()
+    funcao()
+    n = repeticoes if time.perf_counter() - inicio < 10 else 1
+    tempos = []
+    for _ in range(max(n, 1)):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+class Dados:
+    """Dados sintéticos de uma escala, gerados uma vez e reaproveitados entre etapas"""
+
+    def __init__(self, diretorio, n_estacoes, n_dias):
+        self.diretorio = Path(diretorio) / f'{n_estacoes}_estacoes'
+        self.arquivos = gerar_estacoes(self.diretorio, n_estacoes, n_dias)
+        self.metadados = [ler_metadados_inmet(caminho) for caminho in self.arquivos]
+        self.brutos = [self._ler(caminho, meta) for caminho, meta in zip(self.arquivos, self.metadados)]
+        self.interpolados = [interpolar_no_tempo(df) for df in self.brutos]
+        self.tabela = pd.concat(self.interpolados, keys=[m['estacao'] for m in self.metadados],
+                                names=['estacao']).reset_index()
+        self.limpos = self.tabela.dropna(subset=FEATURES + [TARGET])
+        self.X = self.limpos[FEATURES].to_numpy()
+        self.y = self.limpos[TARGET].to_numpy()
+        self._modelos = None
+        self._explicador = None
+        self._registro = None
+
+    @staticmethod
+    def _ler(caminho, metadados):
+        return _preparar_dados(pd.read_csv(caminho, **_opcoes_leitura(metadados)), _eh_horario(metadados))
+
+    def carregar(self):
+        """Leitura pelo caminho público (carregar_inmet), com o cache padrão ao lado dos CSVs"""
+        return [carregar_inmet(caminho) for caminho in self.arquivos]
+
+    def apagar_cache(self):
+        for diretorio in {caminho_cache(caminho).parent for caminho in self.arquivos}:
+            shutil.rmtree(diretorio, ignore_errors=True)
+
+    def modelos(self):
+        """Modelos da comparação treinados nesta escala (uma vez só)"""
+        if self._modelos is None:
+            self._modelos = {nome: clone(modelo).fit(self.X, self.y) for nome, modelo in criar_modelos().items()}
+        return self._modelos
+
+    def explicador_shap(self):
+        """Explicador SHAP do modelo explicado, salvo em disco como em explicar_modelo"""
+        if self._explicador is None:
+            fundo = self.X[np.random.default_rng(42).choice(len(self.X), min(AMOSTRA_FUNDO, len(self.X)), replace=False)]
+            self._explicador = salvar_explicador(criar_explicador(self.modelos()[MODELO_EXPLICADO], fundo),
+                                                 self.diretorio / 'explicador_shap.joblib')
+        return self._explicador
+
+    def registro_lime(self):
+        """Registro com o modelo explicado e a amostra de treino do LIME (nome, diretório)"""
+        if self._registro is None:
+            self._registro = self.diretorio / 'registro'
+            registrar_modelo(self.modelos()[MODELO_EXPLICADO], 'explicado', FEATURES, diretorio=self._registro)
+            obter_treino_lime('explicado', self.X, diretorio=self._registro)
+        return 'explicado', self._registro
+
+    @property
+    def linhas(self):
+        return len(self.tabela)
+
+
+def casos(etapa, dados, base, n_jobs=-1):
+    """
+    Casos (nome, função, linhas processadas[, preparação]) de uma etapa numa escala.
+    `base` é o conjunto 1x, usado para treinar os modelos de predict/SHAP/LIME;
+    `n_jobs` vai para as explicações em paralelo.
+    """
+    if etapa == 'parse_csv':
+        # cache frio: CSV processado e cache gravado a cada execução; quente: só o memory-map do cache
+        yield 'carregar_inmet_frio', dados.carregar, dados.linhas, dados.apagar_cache
+        yield 'carregar_inmet_quente', dados.carregar, dados.linhas
+    elif etapa == 'interpolacao':
+        yield 'interpolar_no_tempo', lambda: [interpolar_no_tempo(df) for df in dados.brutos], dados.linhas
+    elif etapa == 'lags':
+        yield 'criar_lag_features', lambda: criar_lag_features(dados.tabela, grupo='estacao'), dados.linhas
+    elif etapa == 'treino':
+        for nome, modelo in criar_modelos().items():
+            yield nome, lambda modelo=modelo: clone(modelo).fit(dados.X, dados.y), len(dados.X)
+    elif etapa == 'predict':
+        for nome, modelo in base.modelos().items():
+            yield nome, lambda modelo=modelo: modelo.predict(dados.X), len(dados.X)
+    elif etapa == 'shap' and shap is not None:
+        n = LINHAS_EXPLICACAO['shap'] * len(dados.arquivos)
+        explicador = base.explicador_shap()
+        yield 'calcular_valores_shap', lambda: calcular_valores_shap(explicador, dados.X[:n], n_jobs=n_jobs), n
+    elif etapa == 'lime' and LimeTabularExplainer is not None:
+        n = LINHAS_EXPLICACAO['lime'] * len(dados.arquivos)
+        nome, registro = base.registro_lime()
+        yield 'explicar_lime_lote', lambda: explicar_lime_lote(
+            nome, dados.X[:n], diretorio=registro, num_features=len(FEATURES), n_jobs=n_jobs
+        ), n
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ambiente():
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'shap': getattr(shap, '__version__', None),
+        'maquina': platform.machine(),
+        'processador': platform.processor() or None,
+        'nucleos': os.cpu_count(),
+    }
+
+
+def ler_base(arquivo_base):
+    with open(arquivo_base, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def parametros_divergentes(base, parametros):
+    """Parâmetros da execução atual diferentes dos da base (só os gravados nas duas)"""
+    anteriores = base.get('parametros', {})
+    return {chave: (anteriores[chave], valor) for chave, valor in parametros.items()
+            if chave in anteriores and anteriores[chave] != valor}
+
+
+def comparar(resultados, base, limiar):
+    """Tabela de razão atual/base da mediana; marca regressões acima do limiar"""
+    chave = ['etapa', 'caso', 'escala']
+    atual = pd.DataFrame(resultados)
+    anterior = pd.DataFrame(base['resultados'])
+    if atual.empty or anterior.empty:
+        return pd.DataFrame()
+    tabela = atual[chave + ['mediana_s']].merge(
+        anterior[chave + ['mediana_s']], on=chave, suffixes=('', '_base')
+    ).dropna()
+    tabela['razao'] = tabela['mediana_s'] / tabela['mediana_s_base']
+    tabela['status'] = np.select(
+        [tabela['razao'] > 1 + limiar, tabela['razao'] < 1 - limiar], ['REGRESSAO', 'melhora'], 'igual'
+    )
+    return tabela
+
+
+parser = argparse.ArgumentParser(description='Benchmarks dos caminhos críticos do projeto')
+parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=ETAPAS)
+parser.add_argument('--escalas', nargs='+', type=int, default=[1, 10, 100],
+                    help='Multiplicadores do volume de dados (número de estações)')
+parser.add_argument('--dias', type=int, default=4_000,
+                    help='Dias por estação sintética (~ um export real de 11 anos)')
+parser.add_argument('--repeticoes', type=int, default=3)
+parser.add_argument('--n-jobs', type=int, default=-1, help='Processos das etapas shap e lime')
+parser.add_argument('--tempo-limite', type=float, default=60.0,
+                    help='Se um caso passar deste tempo (s), as escalas maiores dele são puladas')
+parser.add_argument('--saida', default=None,
+                    help='JSON de saída (padrão: benchmarks/resultados/<data>_<commit>.json)')
+parser.add_argument('--comparar', default=None, help='JSON de uma execução anterior')
+parser.add_argument('--limiar', type=float, default=0.10,
+                    help='Variação relativa da mediana considerada regressão na comparação')
+args = parser.parse_args()
+parametros = {'dias': args.dias, 'repeticoes': args.repeticoes, 'n_jobs': args.n_jobs}
+
+# execuções com outros parâmetros não são comparáveis: recusa antes de medir
+base_comparacao = ler_base(args.comparar) if args.comparar else None
+if base_comparacao is not None:
+    divergentes = parametros_divergentes(base_comparacao, parametros)
+    if divergentes:
+        parser.error(f'{args.comparar} foi medido com outros parâmetros: ' + ', '.join(
+            f'{chave}={anterior} (atual: {atual})' for chave, (anterior, atual) in divergentes.items()
+        ))
+
+if shap is None and 'shap' in args.etapas:
+    print('shap não instalado: etapa shap ignorada')
+if LimeTabularExplainer is None and 'lime' in args.etapas:
+    print('lime não instalado: etapa lime ignorada')
+
+resultados = []
+lentos = set()
+with tempfile.TemporaryDirectory() as temporario:
+    base = Dados(temporario, 1, args.dias)
+    for escala in sorted(args.escalas):
+        dados = base if escala == 1 else Dados(temporario, escala, args.dias)
+        print(f'\n=== ESCALA {escala}x ({dados.linhas:,} linhas) ===')
+        for etapa in args.etapas:
+            for caso, funcao, linhas, *preparar in casos(etapa, dados, base, args.n_jobs):
+                if (etapa, caso) in lentos:
+                    print(f'{etapa:>13} | {caso:<22} | pulado (acima de {args.tempo_limite:g}s na escala anterior)')
+                    continue
+                tempos = medir(funcao, args.repeticoes, *preparar)
+                mediana = statistics.median(tempos)
+                resultados.append({
+                    'etapa': etapa,
+                    'caso': caso,
+                    'escala': escala,
+                    'linhas': linhas,
+                    'repeticoes': len(tempos),
+                    'mediana_s': mediana,
+                    'minimo_s': min(tempos),
+                    'linhas_por_s': linhas / mediana if mediana > 0 else None,
+                })
+                print(f'{etapa:>13} | {caso:<22} | {mediana * 1000:10.1f} ms | {linhas / mediana:14,.0f} linhas/s')
+                if mediana > args.tempo_limite:
+                    lentos.add((etapa, caso))
+
+commit = _commit()
+saida = Path(args.saida) if args.saida else DIRETORIO_RESULTADOS / (
+    f"{datetime.now():%Y%m%d_%H%M%S}_{commit or 'sem_commit'}.json"
+)
+saida.parent.mkdir(parents=True, exist_ok=True)
+with open(saida, 'w', encoding='utf-8') as arquivo:
+    json.dump({
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': ambiente(),
+        'parametros': parametros,
+        'resultados': resultados,
+    }, arquivo, ensure_ascii=False, indent=2)
+print(f'\nResultados salvos em: {saida}')
+
+if args.comparar:
+    tabela = comparar(resultados, base_comparacao, args.limiar)
+    print(f'\n=== COMPARAÇÃO COM {Path(args.comparar).name} ===')
+    if tabela.empty:
+        print('Nenhum caso em comum')
+    else:
+        print(tabela.round(4).to_string(index=False))
+        if (tabela['status'] == 'REGRESSAO').any():
+            sys.exit(1)
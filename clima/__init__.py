@@ -0,0 +1,23 @@
+"""
+Pacote compartilhado de dados climáticos
+Ingestão dos dados INMET e engenharia de features usadas pelos scripts e dashboards
+"""
+
+from .features import (
+    adicionar_features_temporais,
+    criar_lag_features,
+    estender_features_temporais,
+    features_temporais,
+    matriz_lags,
+)
+from .horario import reamostrar_diario
+from .ingestao import (
+    COLUNAS_INMET,
+    carregar_estacoes,
+    carregar_horario,
+    carregar_inmet,
+    ler_csv_inmet,
+    ler_metadados_inmet,
+    versao_origem,
+)
+from .jaschke import carregar_jaschke
@@ -0,0 +1,547 @@
+"""
+Agregados para Dashboards
+Tabelas pequenas (rollups, histogramas, quantis, correlações) calculadas uma
+vez por versão dos dados, para que as páginas não varram o conjunto completo
+"""
+
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .features import estacao_do_ano
+from .ingestao import COLUNAS_INMET, DIRETORIO_CACHE, _metadados_origem, escrever_cache, ler_cache
+
+VERSAO_AGREGADOS = '3'
+QUANTIS = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+N_BINS = 50
+N_AMOSTRA = 5_000
+N_LINHAS_BORDA = 1_000
+# Faixas finas da grade por faixa do histograma exibido
+RESOLUCAO_GRADE = 20
+
+TABELAS = [
+    'meta', 'resumo', 'diario', 'mensal', 'sazonal', 'histogramas',
+    'caixas', 'correlacao', 'covariancia', 'amostra', 'primeiros', 'ultimos',
+    'momentos', 'grade', 'produtos',
+]
+# Tabelas que dependem da distribuição completa: na extensão saem do estado somável
+TABELAS_DISTRIBUICAO = ['resumo', 'sazonal', 'histogramas', 'caixas', 'correlacao', 'covariancia', 'amostra']
+# Estado somável parte a parte: momentos por coluna, contagens em faixas de largura fixa e produtos cruzados
+TABELAS_ESTADO = ['momentos', 'grade', 'produtos']
+
+
+def variaveis_medidas(df):
+    """Variáveis do INMET presentes no DataFrame, na ordem de COLUNAS_INMET"""
+    return [coluna for coluna in COLUNAS_INMET[1:] if coluna in df.columns]
+
+
+def resumo(df):
+    """Equivalente ao describe() de todas as colunas numéricas, com soma e quantis extras"""
+    numericas = df.select_dtypes('number')
+    valores = numericas.to_numpy(dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        linhas = {
+            'count': np.sum(~np.isnan(valores), axis=0),
+            'soma': np.nansum(valores, axis=0),
+            'mean': np.nanmean(valores, axis=0),
+            'std': np.nanstd(valores, axis=0, ddof=1),
+            'min': np.nanmin(valores, axis=0),
+            **{f'{q:.0%}': linha for q, linha in zip(QUANTIS, np.nanquantile(valores, QUANTIS, axis=0))},
+            'max': np.nanmax(valores, axis=0),
+        }
+    return pd.DataFrame(linhas, index=numericas.columns).T.rename_axis('estatistica')
+
+
+def rollup_diario(df, variaveis):
+    """
+    Média diária entre estações, número de estações no dia e, por variável,
+    quantas tinham o dado (`<variavel>_n`, o peso da média ao juntar partes)
+    """
+    por_dia = df.groupby('data', sort=True)
+    diario = por_dia[variaveis].mean()
+    diario['n_estacoes'] = por_dia.size()
+    diario = diario.join(por_dia[variaveis].count().add_suffix('_n'))
+    return diario.reset_index()
+
+
+def rollup_mensal(df, variaveis):
+    """
+    Soma e contagem por (ano, mês): médias de qualquer intervalo de meses
+    saem somando as linhas do intervalo, sem voltar aos dados diários.
+    """
+    datas = pd.DatetimeIndex(df['data'])
+    chaves = [pd.Series(datas.year, index=df.index, name='ano'),
+              pd.Series(datas.month, index=df.index, name='mes')]
+    agrupado = df[variaveis].groupby(chaves, sort=True)
+    mensal = agrupado.sum().add_suffix('_soma').join(agrupado.count().add_suffix('_n'))
+    return mensal.reset_index()
+
+
+def media_mensal(mensal, variaveis, por=('ano', 'mes')):
+    """Médias a partir do rollup mensal, reagrupadas por `por` (ex.: ('mes',) para sazonalidade)"""
+    grupos = mensal.groupby(list(por), sort=True)
+    somas = grupos[[f'{v}_soma' for v in variaveis]].sum().to_numpy()
+    contagens = grupos[[f'{v}_n' for v in variaveis]].sum().to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias = np.where(contagens > 0, somas / contagens, np.nan)
+    return pd.DataFrame(medias, columns=variaveis, index=grupos.size().index).reset_index()
+
+
+def rollup_sazonal(df, variaveis):
+    """Média e desvio padrão por estação do ano"""
+    estacao = pd.Series(estacao_do_ano(df['data']), index=df.index, name='estacao_ano')
+    agrupado = df[variaveis].groupby(estacao)
+    return agrupado.mean().add_suffix('_media').join(agrupado.std().add_suffix('_std')).reset_index()
+
+
+def caixas(df, variaveis):
+    """Estatísticas de box plot (quartis e bigodes de 1,5 IQR) por variável"""
+    linhas = []
+    for variavel in variaveis:
+        valores = df[variavel].to_numpy(dtype=np.float64)
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            continue
+        q1, mediana, q3 = np.quantile(valores, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        dentro = valores[(valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)]
+        linhas.append({
+            'variavel': variavel, 'q1': q1, 'mediana': mediana, 'q3': q3,
+            'cerca_inferior': dentro.min(), 'cerca_superior': dentro.max(),
+            'n_outliers': int(len(valores) - len(dentro)),
+        })
+    return pd.DataFrame(linhas)
+
+
+def momentos(df, deslocamentos=None):
+    """
+    Estado somável das médias e desvios: por (grupo, coluna), contagem, soma e
+    soma dos quadrados em torno de um deslocamento fixo (a média da primeira
+    carga, para as somas não perderem precisão), mínimo e máximo. O grupo ''
+    cobre todas as colunas numéricas; os grupos por estação do ano, as variáveis.
+    """
+    numericas = df.select_dtypes('number')
+    medias = numericas.mean().fillna(0.0)
+    if deslocamentos is not None:
+        medias.update(deslocamentos[deslocamentos.index.intersection(medias.index)])
+    deslocamentos = medias
+
+    def linhas(tabela, grupo):
+        valores = tabela.to_numpy(dtype=np.float64)
+        centrados = valores - deslocamentos[tabela.columns].to_numpy()
+        validos = ~np.isnan(valores)
+        n = validos.sum(axis=0)
+        minimo = np.fmin.reduce(valores, axis=0, initial=np.inf)
+        maximo = np.fmax.reduce(valores, axis=0, initial=-np.inf)
+        return pd.DataFrame({
+            'grupo': grupo,
+            'coluna': tabela.columns,
+            'n': n,
+            'deslocamento': deslocamentos[tabela.columns].to_numpy(),
+            'soma': np.where(validos, centrados, 0.0).sum(axis=0),
+            'soma_quadrados': np.where(validos, centrados ** 2, 0.0).sum(axis=0),
+            'minimo': np.where(n > 0, minimo, np.nan),
+            'maximo': np.where(n > 0, maximo, np.nan),
+        })
+
+    variaveis = variaveis_medidas(df)
+    estacao = estacao_do_ano(df['data'])
+    partes = [linhas(numericas, '')]
+    partes += [linhas(df.loc[estacao == nome, variaveis], nome) for nome in sorted(set(estacao))]
+    return pd.concat(partes, ignore_index=True)
+
+
+def juntar_momentos(*tabelas):
+    """Soma tabelas de momentos com os mesmos deslocamentos"""
+    return pd.concat(tabelas, ignore_index=True).groupby(['grupo', 'coluna'], sort=False).agg(
+        n=('n', 'sum'), deslocamento=('deslocamento', 'first'), soma=('soma', 'sum'),
+        soma_quadrados=('soma_quadrados', 'sum'), minimo=('minimo', 'min'), maximo=('maximo', 'max'),
+    ).reset_index()
+
+
+def _media_desvio(tabela):
+    n = tabela['n'].to_numpy(dtype=np.float64)
+    soma, quadrados = tabela['soma'].to_numpy(), tabela['soma_quadrados'].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.where(n > 0, tabela['deslocamento'].to_numpy() + soma / n, np.nan)
+        desvio = np.where(n > 1, np.sqrt(np.maximum(quadrados - soma ** 2 / n, 0.0) / (n - 1)), np.nan)
+    return media, desvio
+
+
+def grade(df, referencia=None, n_bins=N_BINS):
+    """
+    Contagens de cada coluna numérica em faixas finas de largura fixa
+    (índice inteiro a partir da origem). Colunas já presentes em `referencia`
+    mantêm a sua origem e largura, então grades de partes diferentes se somam.
+    """
+    parametros = {} if referencia is None else {
+        linha.coluna: (linha.origem, linha.largura)
+        for linha in referencia.drop_duplicates('coluna').itertuples()
+    }
+    partes = []
+    for coluna in df.select_dtypes('number').columns:
+        valores = df[coluna].to_numpy(dtype=np.float64)
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            continue
+        if coluna in parametros:
+            origem, largura = parametros[coluna]
+        else:
+            # a folga relativa deixa o máximo na última faixa, como em np.histogram
+            origem = valores.min()
+            largura = ((valores.max() - origem) or 1.0) / (n_bins * RESOLUCAO_GRADE) * (1 + 1e-9)
+        faixas, contagens = np.unique(np.floor((valores - origem) / largura).astype(np.int64), return_counts=True)
+        partes.append(pd.DataFrame({
+            'coluna': coluna, 'origem': origem, 'largura': largura, 'faixa': faixas, 'contagem': contagens,
+        }))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(
+        columns=['coluna', 'origem', 'largura', 'faixa', 'contagem'])
+
+
+def juntar_grades(*tabelas):
+    """Soma grades com as mesmas origens e larguras"""
+    return pd.concat(tabelas, ignore_index=True).groupby(['coluna', 'faixa'], sort=False).agg(
+        origem=('origem', 'first'), largura=('largura', 'first'), contagem=('contagem', 'sum'),
+    ).reset_index()[['coluna', 'origem', 'largura', 'faixa', 'contagem']]
+
+
+def _faixas(tabela, coluna):
+    """(faixas ordenadas, contagens, origem, largura) de uma coluna da grade, ou None"""
+    linhas = tabela[tabela['coluna'] == coluna].sort_values('faixa')
+    if not len(linhas):
+        return None
+    return (linhas['faixa'].to_numpy(), linhas['contagem'].to_numpy(dtype=np.float64),
+            float(linhas['origem'].iloc[0]), float(linhas['largura'].iloc[0]))
+
+
+def _quantis_grade(faixas, contagens, origem, largura, quantis, minimo, maximo):
+    """Quantis interpolados dentro da faixa fina (erro de no máximo uma largura)"""
+    acumulado = np.cumsum(contagens)
+    alvo = np.asarray(quantis) * acumulado[-1]
+    posicao = np.minimum(np.searchsorted(acumulado, alvo, side='left'), len(faixas) - 1)
+    fracao = (alvo - (acumulado[posicao] - contagens[posicao])) / contagens[posicao]
+    return np.clip(origem + (faixas[posicao] + fracao) * largura, minimo, maximo)
+
+
+def histogramas(tabela, variaveis, n_bins=N_BINS):
+    """
+    Contagens por faixa de cada variável (formato longo), agrupando
+    RESOLUCAO_GRADE faixas finas por faixa (o dobro, quantas vezes for
+    preciso, se a extensão do intervalo passar de 2 * n_bins faixas)
+    """
+    partes = []
+    for variavel in variaveis:
+        dados = _faixas(tabela, variavel)
+        if dados is None:
+            continue
+        faixas, contagens, origem, largura = dados
+        fator = RESOLUCAO_GRADE
+        while faixas[-1] // fator - faixas[0] // fator + 1 > 2 * n_bins:
+            fator *= 2
+        grupos = faixas // fator
+        contagem = np.bincount(grupos - grupos[0], weights=contagens).astype(np.int64)
+        inicio = origem + (grupos[0] + np.arange(len(contagem))) * fator * largura
+        partes.append(pd.DataFrame({
+            'variavel': variavel, 'inicio': inicio, 'fim': inicio + fator * largura, 'contagem': contagem,
+        }))
+    return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(
+        columns=['variavel', 'inicio', 'fim', 'contagem'])
+
+
+def produtos(df, variaveis, deslocamentos):
+    """
+    Estado somável da correlação e da covariância (pares completos, como no
+    pandas): por par de variáveis, contagem, somas, somas dos quadrados e soma
+    dos produtos, em torno dos deslocamentos de `momentos`
+    """
+    valores = df[variaveis].to_numpy(dtype=np.float64) - deslocamentos[variaveis].to_numpy()
+    validos = ~np.isnan(valores)
+    centrados = np.where(validos, valores, 0.0)
+    presentes = validos.astype(np.float64)
+    soma = centrados.T @ presentes
+    quadrados = (centrados ** 2).T @ presentes
+    a, b = np.meshgrid(np.arange(len(variaveis)), np.arange(len(variaveis)), indexing='ij')
+    a, b = a.ravel(), b.ravel()
+    return pd.DataFrame({
+        'variavel_a': np.asarray(variaveis, dtype=object)[a],
+        'variavel_b': np.asarray(variaveis, dtype=object)[b],
+        'n': (presentes.T @ presentes).ravel(),
+        'soma_a': soma.ravel(),
+        'soma_b': soma.T.ravel(),
+        'soma_aa': quadrados.ravel(),
+        'soma_bb': quadrados.T.ravel(),
+        'soma_ab': (centrados.T @ centrados).ravel(),
+    })
+
+
+def juntar_produtos(*tabelas):
+    return pd.concat(tabelas, ignore_index=True).groupby(
+        ['variavel_a', 'variavel_b'], sort=False).sum().reset_index()
+
+
+def _matrizes(tabela, variaveis):
+    """(correlação, covariância) no formato das tabelas do painel, a partir dos produtos"""
+    tabela = tabela.set_index(['variavel_a', 'variavel_b']).reindex(
+        pd.MultiIndex.from_product([variaveis, variaveis]))
+    n = tabela['n'].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariancia = (tabela['soma_ab'].to_numpy() - tabela['soma_a'].to_numpy() * tabela['soma_b'].to_numpy() / n) / (n - 1)
+        var_a = (tabela['soma_aa'].to_numpy() - tabela['soma_a'].to_numpy() ** 2 / n) / (n - 1)
+        var_b = (tabela['soma_bb'].to_numpy() - tabela['soma_b'].to_numpy() ** 2 / n) / (n - 1)
+        correlacao = np.clip(covariancia / np.sqrt(var_a * var_b), -1.0, 1.0)
+    formas = {}
+    for nome, valores in [('correlacao', correlacao), ('covariancia', covariancia)]:
+        valores = np.where(n > 1, valores, np.nan).reshape(len(variaveis), len(variaveis))
+        formas[nome] = pd.DataFrame(valores, index=pd.Index(variaveis, name='variavel'),
+                                    columns=variaveis).reset_index()
+    return formas['correlacao'], formas['covariancia']
+
+
+def _chaves_amostra(df, semente):
+    """Chave pseudoaleatória de cada linha, pela identidade (estação, data)"""
+    identidade = pd.DataFrame({'data': pd.to_datetime(df['data']).astype('datetime64[ns]')})
+    if 'estacao' in df.columns:
+        identidade['estacao'] = df['estacao'].astype(str).to_numpy()
+    return pd.util.hash_pandas_object(identidade, index=False, hash_key=f'{semente:016d}'[:16]).to_numpy()
+
+
+def amostra(df, n_amostra=N_AMOSTRA, semente=42):
+    """
+    Amostra uniforme das linhas: as `n_amostra` de menor chave. A chave só
+    depende da linha, então a amostra da união de duas partes sai das amostras
+    de cada parte.
+    """
+    escolhidas = np.sort(np.argsort(_chaves_amostra(df, semente), kind='stable')[:n_amostra])
+    return df.iloc[escolhidas].sort_values('data', kind='stable').reset_index(drop=True)
+
+
+def _estado(df, variaveis, n_bins=N_BINS, referencia=None):
+    """Tabelas de TABELAS_ESTADO de `df`; com `referencia`, nos deslocamentos e faixas dela"""
+    deslocamentos = None
+    if referencia is not None:
+        globais = referencia['momentos'][referencia['momentos']['grupo'] == '']
+        deslocamentos = globais.set_index('coluna')['deslocamento']
+    estado_momentos = momentos(df, deslocamentos)
+    globais = estado_momentos[estado_momentos['grupo'] == ''].set_index('coluna')['deslocamento']
+    return {
+        'momentos': estado_momentos,
+        'grade': grade(df, None if referencia is None else referencia['grade'], n_bins),
+        'produtos': produtos(df, variaveis, globais),
+    }
+
+
+def _distribuicoes_do_estado(estado, variaveis, n_bins=N_BINS):
+    """
+    Tabelas de TABELAS_DISTRIBUICAO (menos a amostra) a partir do estado
+    somável: médias, desvios, correlações e covariâncias exatas; quantis e
+    caixas interpolados na grade fina (resolução de 1/(n_bins * RESOLUCAO_GRADE)
+    do intervalo da primeira carga)
+    """
+    estado_momentos = estado['momentos']
+    globais = estado_momentos[estado_momentos['grupo'] == ''].reset_index(drop=True)
+    media, desvio = _media_desvio(globais)
+    quantis = np.full((len(QUANTIS), len(globais)), np.nan)
+    caixas_linhas = []
+    for posicao, linha in enumerate(globais.itertuples()):
+        dados = _faixas(estado['grade'], linha.coluna)
+        if dados is None:
+            continue
+        faixas, contagens, origem, largura = dados
+        quantis[:, posicao] = _quantis_grade(faixas, contagens, origem, largura, QUANTIS, linha.minimo, linha.maximo)
+        if linha.coluna not in variaveis:
+            continue
+        q1, mediana, q3 = _quantis_grade(faixas, contagens, origem, largura, [0.25, 0.5, 0.75],
+                                         linha.minimo, linha.maximo)
+        iqr = q3 - q1
+        inicio = origem + faixas * largura
+        dentro = (inicio + largura > q1 - 1.5 * iqr) & (inicio <= q3 + 1.5 * iqr)
+        caixas_linhas.append({
+            'variavel': linha.coluna, 'q1': q1, 'mediana': mediana, 'q3': q3,
+            'cerca_inferior': max(inicio[dentro].min(), q1 - 1.5 * iqr, linha.minimo),
+            'cerca_superior': min(inicio[dentro].max() + largura, q3 + 1.5 * iqr, linha.maximo),
+            'n_outliers': int(contagens[~dentro].sum()),
+        })
+
+    tabela_resumo = pd.DataFrame({
+        'count': globais['n'].to_numpy(),
+        'soma': globais['soma'].to_numpy() + globais['n'].to_numpy() * globais['deslocamento'].to_numpy(),
+        'mean': media,
+        'std': desvio,
+        'min': globais['minimo'].to_numpy(),
+        **{f'{q:.0%}': linha for q, linha in zip(QUANTIS, quantis)},
+        'max': globais['maximo'].to_numpy(),
+    }, index=globais['coluna']).T.rename_axis('estatistica')
+    tabela_resumo.columns.name = None
+
+    por_estacao = estado_momentos[estado_momentos['grupo'] != '']
+    media, desvio = _media_desvio(por_estacao)
+    por_estacao = por_estacao.assign(media=media, std=desvio)
+    largas = por_estacao.pivot(index='grupo', columns='coluna', values=['media', 'std'])
+    sazonal = largas['media'][variaveis].add_suffix('_media').join(largas['std'][variaveis].add_suffix('_std'))
+    sazonal.columns.name = None
+
+    correlacao, covariancia = _matrizes(estado['produtos'], variaveis)
+    return {
+        'resumo': tabela_resumo.reset_index(),
+        'sazonal': sazonal.rename_axis('estacao_ano').reset_index(),
+        'histogramas': histogramas(estado['grade'], variaveis, n_bins),
+        'caixas': pd.DataFrame(caixas_linhas),
+        'correlacao': correlacao,
+        'covariancia': covariancia,
+    }
+
+
+def construir_agregados(df, n_bins=N_BINS, n_amostra=N_AMOSTRA, semente=42):
+    """
+    Calcula todas as tabelas do painel a partir do DataFrame completo
+    (coluna 'data' e, opcionalmente, 'estacao'), junto com o estado somável
+    usado por estender_agregados. Retorna {nome: DataFrame}.
+    """
+    df = df.reset_index(drop=True)
+    df['data'] = pd.to_datetime(df['data'])
+    variaveis = variaveis_medidas(df)
+    estado = _estado(df, variaveis, n_bins)
+
+    return {
+        'meta': pd.DataFrame([{
+            'linhas': len(df),
+            'n_estacoes': df['estacao'].nunique() if 'estacao' in df.columns else 1,
+            'inicio': df['data'].min(),
+            'fim': df['data'].max(),
+            'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        }]),
+        'resumo': resumo(df).reset_index(),
+        'diario': rollup_diario(df, variaveis),
+        'mensal': rollup_mensal(df, variaveis),
+        'sazonal': rollup_sazonal(df, variaveis),
+        'histogramas': histogramas(estado['grade'], variaveis, n_bins),
+        'caixas': caixas(df, variaveis),
+        'correlacao': df[variaveis].corr().rename_axis('variavel').reset_index(),
+        'covariancia': df[variaveis].cov().rename_axis('variavel').reset_index(),
+        'amostra': amostra(df, n_amostra, semente),
+        'primeiros': df.head(N_LINHAS_BORDA),
+        'ultimos': df.tail(N_LINHAS_BORDA),
+        **estado,
+    }
+
+
+def diretorio_agregados(caminho_dados, diretorio=None):
+    """Diretório dos agregados de um arquivo de dados (dentro de .cache/)"""
+    caminho_dados = Path(caminho_dados)
+    base = Path(diretorio) if diretorio is not None else caminho_dados.parent / DIRETORIO_CACHE
+    return base / f'agregados_v{VERSAO_AGREGADOS}' / caminho_dados.stem
+
+
+def salvar_agregados(agregados, destino, metadados):
+    """Grava cada tabela como Arrow (memory-mapped na leitura) com os metadados de origem"""
+    destino = Path(destino)
+    for nome, tabela in agregados.items():
+        escrever_cache(tabela.reset_index(drop=True), destino / f'{nome}.arrow', metadados)
+
+
+def _ler_agregados(destino, caminho_dados):
+    """Tabelas gravadas, ou None se faltar alguma ou a origem tiver mudado"""
+    if not all((destino / f'{nome}.arrow').exists() for nome in TABELAS):
+        return None
+    # a validação contra a origem é feita uma vez, pela tabela meta
+    if ler_cache(destino / 'meta.arrow', caminho_dados) is None:
+        return None
+    return {nome: ler_cache(destino / f'{nome}.arrow').reset_index(drop=True) for nome in TABELAS}
+
+
+def _ler_csv(caminho):
+    return pd.read_csv(caminho, parse_dates=['data'])
+
+
+def carregar_agregados(caminho_dados, diretorio=None, ler_dados=None, recriar=False):
+    """
+    Agregados do arquivo de dados, recalculados só quando o arquivo muda
+    (mesma validação mtime/tamanho/SHA-256 do cache colunar do INMET).
+
+    `ler_dados(caminho)` carrega o DataFrame completo quando é preciso
+    recalcular; por padrão lê um CSV com coluna 'data'.
+    """
+    destino = diretorio_agregados(caminho_dados, diretorio)
+    agregados = None if recriar else _ler_agregados(destino, caminho_dados)
+    if agregados is not None:
+        return agregados
+
+    agregados = construir_agregados((ler_dados or _ler_csv)(caminho_dados))
+    try:
+        salvar_agregados(agregados, destino, _metadados_origem(caminho_dados))
+    except OSError as e:
+        print(f"Aviso: não foi possível gravar os agregados em {destino}: {e}")
+    return agregados
+
+
+def estender_agregados(caminho_dados, novos, diretorio=None, ler_dados=None, n_bins=N_BINS,
+                       n_amostra=N_AMOSTRA, semente=42):
+    """
+    Atualiza no lugar os agregados depois de `novos` serem anexados ao arquivo
+    de dados, sem reler o arquivo: meta, diario, mensal e ultimos se somam
+    direto; as tabelas de TABELAS_DISTRIBUICAO saem do estado somável
+    (TABELAS_ESTADO) acrescido das linhas novas, com quantis e caixas
+    aproximados pela grade fina. Sem agregados gravados, recalcula tudo com
+    `ler_dados`.
+    """
+    destino = diretorio_agregados(caminho_dados, diretorio)
+    if not all((destino / f'{nome}.arrow').exists() for nome in TABELAS):
+        return carregar_agregados(caminho_dados, diretorio, ler_dados=ler_dados, recriar=True)
+    agregados = {nome: ler_cache(destino / f'{nome}.arrow').reset_index(drop=True) for nome in TABELAS}
+    if not len(novos):
+        return agregados
+
+    novos = novos.reset_index(drop=True)
+    novos['data'] = pd.to_datetime(novos['data'])
+    variaveis = [v for v in variaveis_medidas(agregados['resumo'].set_index('estatistica'))
+                 if v in novos.columns]
+
+    # diário: médias de cada variável ponderadas pelo número de estações com o dado
+    diario = agregados['diario'].set_index('data')
+    extra = rollup_diario(novos, variaveis).set_index('data')
+    comuns = extra.index.intersection(diario.index)
+    if len(comuns):
+        contagens = [f'{v}_n' for v in variaveis]
+        n_antes = diario.loc[comuns, contagens].to_numpy(dtype=np.float64)
+        n_extra = extra.loc[comuns, contagens].to_numpy(dtype=np.float64)
+        total = n_antes + n_extra
+        somas = (np.nan_to_num(diario.loc[comuns, variaveis].to_numpy(dtype=np.float64)) * n_antes
+                 + np.nan_to_num(extra.loc[comuns, variaveis].to_numpy(dtype=np.float64)) * n_extra)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            diario.loc[comuns, variaveis] = np.where(total > 0, somas / total, np.nan)
+        diario.loc[comuns, contagens] = total
+        diario.loc[comuns, 'n_estacoes'] += extra.loc[comuns, 'n_estacoes']
+    diario = pd.concat([diario, extra.drop(comuns)]).sort_index()
+    agregados['diario'] = diario.reset_index()
+
+    # mensal: somas e contagens se somam
+    mensal = pd.concat([agregados['mensal'], rollup_mensal(novos, variaveis)])
+    agregados['mensal'] = mensal.groupby(['ano', 'mes'], sort=True).sum(min_count=1).reset_index()
+
+    ultimos = pd.concat([agregados['ultimos'], novos[agregados['ultimos'].columns.intersection(novos.columns)]])
+    agregados['ultimos'] = ultimos.tail(N_LINHAS_BORDA).reset_index(drop=True)
+
+    # distribuições: estado das linhas novas nos mesmos deslocamentos e faixas, somado ao gravado
+    variaveis_estado = list(dict.fromkeys(agregados['produtos']['variavel_a']))
+    extra = _estado(novos, [v for v in variaveis_estado if v in novos.columns], n_bins, agregados)
+    agregados['momentos'] = juntar_momentos(agregados['momentos'], extra['momentos'])
+    agregados['grade'] = juntar_grades(agregados['grade'], extra['grade'])
+    agregados['produtos'] = juntar_produtos(agregados['produtos'], extra['produtos'])
+    agregados.update(_distribuicoes_do_estado(agregados, variaveis_estado, n_bins))
+    amostras = pd.concat([agregados['amostra'], novos[agregados['amostra'].columns.intersection(novos.columns)]],
+                         ignore_index=True)
+    agregados['amostra'] = amostra(amostras, n_amostra, semente)
+
+    meta = agregados['meta'].copy()
+    meta['linhas'] += len(novos)
+    meta['fim'] = max(meta['fim'].iloc[0], novos['data'].max())
+    meta['gerado_em'] = datetime.now().isoformat(timespec='seconds')
+    agregados['meta'] = meta
+
+    # meta por último: é ela que valida o conjunto contra a origem (_ler_agregados)
+    metadados = _metadados_origem(caminho_dados)
+    for nome in ['diario', 'mensal', 'ultimos'] + TABELAS_ESTADO + TABELAS_DISTRIBUICAO + ['meta']:
+        escrever_cache(agregados[nome], destino / f'{nome}.arrow', metadados)
+    return agregados
@@ -0,0 +1,189 @@
+"""
+Cache de Figuras
+Figuras já serializadas (JSON do Plotly) guardadas por aba, entradas do
+callback e versão dos dados: LRU em memória e, opcionalmente, em disco
+compartilhado entre processos
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+CAPACIDADE_PADRAO = 128
+# Orçamento do diretório em disco; ao passar dele, as figuras menos usadas saem até FRACAO_APOS_LIMPEZA
+BYTES_DISCO_PADRAO = 256 * 1024 ** 2
+FRACAO_APOS_LIMPEZA = 0.8
+EXTENSAO = '.json'
+
+
+def _hash(valor):
+    texto = json.dumps(valor, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def chave_figura(aba, entradas, versao_dados):
+    """Chave estável (SHA-256) para (aba, entradas do callback, versão dos dados)"""
+    return _hash([aba, entradas, versao_dados])
+
+
+class _DiscoFiguras:
+    """
+    Um arquivo JSON por chave, com escrita atômica (vários workers podem
+    dividir o diretório), num subdiretório por versão dos dados. Gravar uma
+    versão nova apaga as anteriores; acima de `max_bytes`, saem as figuras
+    lidas há mais tempo (a leitura atualiza o mtime).
+    """
+
+    def __init__(self, diretorio, max_bytes=BYTES_DISCO_PADRAO):
+        self.diretorio = Path(diretorio)
+        self.diretorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._versao = None
+        self._bytes = self._tamanho_total()
+
+    def _arquivos(self):
+        return list(self.diretorio.glob(f'*/*/*{EXTENSAO}'))
+
+    def _tamanho_total(self):
+        total = 0
+        for caminho in self._arquivos():
+            try:
+                total += caminho.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _caminho(self, chave, versao):
+        return self.diretorio / _hash(versao)[:16] / chave[:2] / f'{chave}{EXTENSAO}'
+
+    def ler(self, chave, versao):
+        caminho = self._caminho(chave, versao)
+        try:
+            texto = caminho.read_text(encoding='utf-8')
+            os.utime(caminho)
+        except FileNotFoundError:
+            return None
+        return texto
+
+    def gravar(self, chave, texto, versao):
+        if versao != self._versao:
+            self._remover_outras_versoes(versao)
+        caminho = self._caminho(chave, versao)
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        temporario = caminho.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        temporario.write_text(texto, encoding='utf-8')
+        os.replace(temporario, caminho)
+        self._bytes += caminho.stat().st_size
+        if self._bytes > self.max_bytes:
+            self._despejar()
+
+    def _remover_outras_versoes(self, versao):
+        atual = _hash(versao)[:16]
+        for subdiretorio in self.diretorio.iterdir():
+            if subdiretorio.is_dir() and subdiretorio.name != atual:
+                shutil.rmtree(subdiretorio, ignore_errors=True)
+        self._versao = versao
+        self._bytes = self._tamanho_total()
+
+    def _despejar(self):
+        """Apaga as figuras com mtime mais antigo até ficar em FRACAO_APOS_LIMPEZA do orçamento"""
+        arquivos = []
+        for caminho in self._arquivos():
+            try:
+                stat = caminho.stat()
+            except FileNotFoundError:
+                continue
+            arquivos.append((stat.st_mtime_ns, stat.st_size, caminho))
+        arquivos.sort(key=lambda arquivo: arquivo[0])
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in arquivos:
+            if total <= self.max_bytes * FRACAO_APOS_LIMPEZA:
+                break
+            caminho.unlink(missing_ok=True)
+            total -= tamanho
+        self._bytes = total
+
+    def limpar(self):
+        for caminho in self._arquivos():
+            caminho.unlink(missing_ok=True)
+        self._bytes = 0
+
+
+class CacheFiguras:
+    """
+    Cache LRU (thread-safe) de figuras serializadas. Com `diretorio`, as
+    figuras também vão para o disco: sobrevivem a reinícios e são vistas
+    pelos outros processos do servidor. A versão dos dados faz parte da
+    chave, então dados novos nunca servem figuras antigas.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO, diretorio=None, max_bytes_disco=BYTES_DISCO_PADRAO):
+        self.capacidade = capacidade
+        self.disco = _DiscoFiguras(diretorio, max_bytes_disco) if diretorio is not None else None
+        self._memoria = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def __len__(self):
+        return len(self._memoria)
+
+    def _guardar_memoria(self, chave, texto):
+        with self._trava:
+            self._memoria[chave] = texto
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.capacidade:
+                self._memoria.popitem(last=False)
+
+    def obter(self, chave, versao_dados=None):
+        """JSON da figura, ou None se não estiver em memória nem em disco (na pasta da versão)"""
+        with self._trava:
+            texto = self._memoria.get(chave)
+            if texto is not None:
+                self._memoria.move_to_end(chave)
+                self.acertos += 1
+                return texto
+        texto = self.disco.ler(chave, versao_dados) if self.disco is not None else None
+        with self._trava:
+            if texto is None:
+                self.faltas += 1
+                return None
+            self.acertos += 1
+        self._guardar_memoria(chave, texto)
+        return texto
+
+    def guardar(self, chave, texto, versao_dados=None):
+        self._guardar_memoria(chave, texto)
+        if self.disco is not None:
+            self.disco.gravar(chave, texto, versao_dados)
+
+    def figura(self, aba, entradas, versao_dados, construir):
+        """
+        Figura (dict pronto para dcc.Graph) de (aba, entradas, versão); só
+        chama `construir()` (que retorna uma go.Figure) quando não está em cache.
+        """
+        chave = chave_figura(aba, entradas, versao_dados)
+        texto = self.obter(chave, versao_dados)
+        if texto is None:
+            texto = construir().to_json()
+            self.guardar(chave, texto, versao_dados)
+        return json.loads(texto)
+
+    def limpar(self):
+        with self._trava:
+            self._memoria.clear()
+        if self.disco is not None:
+            self.disco.limpar()
+
+    def estatisticas(self):
+        total = self.acertos + self.faltas
+        return {
+            'itens_memoria': len(self._memoria),
+            'acertos': self.acertos,
+            'faltas': self.faltas,
+            'taxa_acerto': self.acertos / total if total else None,
+        }
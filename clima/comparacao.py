@@ -0,0 +1,279 @@
+"""
+Comparação de Modelos
+Executa a grade (modelo x conjunto de features x divisão) em paralelo
+"""
+
+import re
+import tempfile
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import joblib
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.impute import SimpleImputer
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import GridSearchCV, train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVR
+
+from .validacao import ordenar_por_data
+
+# Rótulos usados em comparacao_lag_features_completa.csv
+TIPOS_CONJUNTO = {
+    'Sem Lag Features': 'Sem Lags',
+    'Com Lag Features': 'Com Lags',
+}
+
+# Grade de ajuste do SVR aproximado (nomes dos passos de criar_svr_aproximado)
+GRADE_SVR_APROXIMADO = {
+    'nystroem__gamma': [None, 0.02, 0.01, 0.005],
+    'nystroem__n_components': [300, 1000],
+    'ridge__alpha': [0.01, 0.1, 1.0],
+}
+
+
+def criar_svr_aproximado(n_componentes=300, gamma=None, alpha=0.1, aproximacao='nystroem', random_state=42):
+    """
+    Substituto escalável do SVR: StandardScaler -> features do kernel RBF
+    aproximado (Nystroem ou RBFSampler, com `n_componentes`) -> Ridge. O
+    treino é linear nas linhas (O(n·k²)) em vez de O(n²)-O(n³) do SVR.
+
+    gamma=None equivale ao gamma='scale' do SVR (1/n_features após a
+    padronização). Os passos se chamam 'nystroem' ou 'rbfsampler' e 'ridge'.
+    """
+    if aproximacao == 'nystroem':
+        mapa = Nystroem(kernel='rbf', gamma=gamma, n_components=n_componentes, random_state=random_state)
+    elif aproximacao == 'rbf':
+        mapa = RBFSampler(gamma='scale' if gamma is None else gamma, n_components=n_componentes,
+                          random_state=random_state)
+    else:
+        raise ValueError(f"Aproximação desconhecida: {aproximacao!r} (use 'nystroem' ou 'rbf')")
+    return make_pipeline(StandardScaler(), mapa, Ridge(alpha=alpha))
+
+
+def criar_modelos(random_state=42):
+    """
+    Modelos da comparação. O SVR vem em pipeline com StandardScaler; o
+    paralelismo fica a cargo do executor da grade (n_jobs=1 no Random Forest).
+    O Hist Gradient Boosting agrupa as features em 255 bins, para com early
+    stopping (10% do treino como validação) e aceita NaN nativamente. O SVR
+    Aproximado (criar_svr_aproximado) mantém o kernel RBF com treino linear.
+    """
+    return {
+        'Regressão Linear': LinearRegression(),
+        'Random Forest': RandomForestRegressor(n_estimators=100, random_state=random_state, n_jobs=1),
+        'Gradient Boosting': GradientBoostingRegressor(n_estimators=100, random_state=random_state),
+        'Hist Gradient Boosting': HistGradientBoostingRegressor(
+            max_iter=500, early_stopping=True, validation_fraction=0.1, n_iter_no_change=10,
+            random_state=random_state
+        ),
+        'SVR': make_pipeline(StandardScaler(), SVR()),
+        'SVR Aproximado': criar_svr_aproximado(random_state=random_state),
+    }
+
+
+def suporta_nan(modelo):
+    """Se o estimador aceita NaN na entrada (tag allow_nan do scikit-learn)"""
+    try:
+        from sklearn.utils import get_tags
+    except ImportError:  # scikit-learn < 1.6
+        return modelo._get_tags().get('allow_nan', False)
+    return get_tags(modelo).input_tags.allow_nan
+
+
+def com_imputacao(modelos):
+    """
+    Para features com falhas (dados sem interpolação): modelos sem suporte a
+    NaN ganham um SimpleImputer (mediana do treino de cada fold) à frente;
+    os demais usam os NaN como estão.
+    """
+    return {
+        nome: modelo if suporta_nan(modelo) else make_pipeline(SimpleImputer(strategy='median'), modelo)
+        for nome, modelo in modelos.items()
+    }
+
+
+def identificador_modelo(nome_modelo, tipo):
+    """Nome do modelo no registro, ex.: 'random_forest_sem_lags'"""
+    texto = f"{nome_modelo} {TIPOS_CONJUNTO.get(tipo, tipo)}"
+    texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode()
+    return '_'.join(re.sub(r'[^\w\s]', ' ', texto).lower().split())
+
+
+def divisao_aleatoria(n_amostras, datas=None, test_size=0.2, random_state=42):
+    """
+    Divisão treino/teste embaralhada usada originalmente pelos scripts.
+    Vaza informação futura em séries temporais; prefira validacao.divisao_temporal.
+    """
+    treino, teste = train_test_split(np.arange(n_amostras), test_size=test_size, random_state=random_state)
+    return [(treino, teste)]
+
+
+def _executar_tarefa(nome_modelo, modelo, tipo, divisao, X, y, treino, teste):
+    """
+    Treina uma cópia nova do modelo numa divisão e mede as métricas.
+    Com divisões em slice, X[treino]/X[teste] são views (sem cópia).
+    """
+    modelo = clone(modelo)
+    X_treino, y_treino = X[treino], y[treino]
+    X_teste, y_teste = X[teste], y[teste]
+
+    inicio = time.perf_counter()
+    modelo.fit(X_treino, y_treino)
+    tempo_treino = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    y_pred = modelo.predict(X_teste)
+    tempo_predicao = time.perf_counter() - inicio
+
+    return {
+        'Modelo': nome_modelo,
+        'Tipo': tipo,
+        'Divisao': divisao,
+        'RMSE': np.sqrt(mean_squared_error(y_teste, y_pred)),
+        'MAE': mean_absolute_error(y_teste, y_pred),
+        'R2': r2_score(y_teste, y_pred),
+        'Tempo_Treino_s': tempo_treino,
+        'Tempo_Predicao_s': tempo_predicao,
+        'N_Treino': len(y_treino),
+        'N_Teste': len(y_teste),
+    }
+
+
+def _mapear_em_disco(matriz, caminho):
+    """Grava a matriz uma vez e a reabre como memmap somente leitura"""
+    joblib.dump(matriz, caminho)
+    return joblib.load(caminho, mmap_mode='r')
+
+
+def executar_comparacao(conjuntos, modelos=None, divisor=divisao_aleatoria, n_jobs=-1,
+                        backend='loky', verbose=0):
+    """
+    Executa cada combinação (modelo x conjunto x divisão) como tarefa independente.
+
+    - conjuntos: {tipo: (X, y)} ou {tipo: (X, y, datas)}; com datas, as
+      amostras são ordenadas cronologicamente uma única vez
+    - divisor: função (n_amostras, datas) -> lista de (treino, teste), como
+      índices ou slices (ex.: validacao.divisao_temporal)
+    - n_jobs/backend: repassados ao joblib.Parallel; com processos, X e y de
+      cada conjunto são gravados uma vez em disco e as tarefas recebem só o
+      memmap (referência ao arquivo), sem copiar as matrizes a cada tarefa
+
+    Retorna um DataFrame com uma linha por tarefa (fold).
+    """
+    if modelos is None:
+        modelos = criar_modelos()
+
+    compartilhar = backend != 'threading' and joblib.effective_n_jobs(n_jobs) > 1
+    with tempfile.TemporaryDirectory(prefix='comparacao_', ignore_cleanup_errors=True) as temporario:
+        tarefas = []
+        periodos = []
+        for indice, (tipo, conjunto) in enumerate(conjuntos.items()):
+            X, y = np.asarray(conjunto[0]), np.asarray(conjunto[1])
+            datas = None
+            if len(conjunto) > 2:
+                X, y, datas = ordenar_por_data(X, y, conjunto[2])
+            if compartilhar:
+                X = _mapear_em_disco(X, Path(temporario) / f'X_{indice}.joblib')
+                y = _mapear_em_disco(y, Path(temporario) / f'y_{indice}.joblib')
+
+            for divisao, (treino, teste) in enumerate(divisor(len(y), datas=datas)):
+                periodo = {}
+                if datas is not None:
+                    datas_teste = datas[teste]
+                    periodo = {'Inicio_Teste': datas_teste.min(), 'Fim_Teste': datas_teste.max()}
+                for nome_modelo, modelo in modelos.items():
+                    tarefas.append((nome_modelo, modelo, tipo, divisao, X, y, treino, teste))
+                    periodos.append(periodo)
+
+        resultados = Parallel(n_jobs=n_jobs, backend=backend, verbose=verbose)(
+            delayed(_executar_tarefa)(*tarefa) for tarefa in tarefas
+        )
+    return pd.DataFrame([{**resultado, **periodo} for resultado, periodo in zip(resultados, periodos)])
+
+
+def tabela_comparacao(resultados):
+    """
+    Resume os resultados no esquema de comparacao_lag_features_completa.csv
+    (Modelo, RMSE, R2, Tipo), com a média entre divisões.
+    """
+    resumo = (
+        resultados.groupby(['Tipo', 'Modelo'], sort=False)[['RMSE', 'R2']]
+        .mean()
+        .reset_index()
+    )
+    resumo['Modelo'] = resumo['Modelo'] + ' (' + resumo['Tipo'].map(TIPOS_CONJUNTO).fillna(resumo['Tipo']) + ')'
+    return resumo[['Modelo', 'RMSE', 'R2', 'Tipo']]
+
+
+def tabela_melhorias(comparacao):
+    """Melhoria percentual com lag features por modelo (esquema de melhorias_lag_features.csv)"""
+    base = comparacao['Modelo'].str.replace(r' \([^)]*\)$', '', regex=True)
+    tabela = comparacao.assign(Base=base).pivot_table(index='Base', columns='Tipo', values=['RMSE', 'R2'], sort=False)
+
+    sem, com = 'Sem Lag Features', 'Com Lag Features'
+    if sem not in tabela['RMSE'] or com not in tabela['RMSE']:
+        return pd.DataFrame(columns=['Modelo', 'Melhoria_RMSE_%', 'Melhoria_R2_%'])
+
+    melhorias = pd.DataFrame({
+        'Modelo': tabela.index,
+        'Melhoria_RMSE_%': (tabela['RMSE'][sem] - tabela['RMSE'][com]) / tabela['RMSE'][sem] * 100,
+        'Melhoria_R2_%': (tabela['R2'][com] - tabela['R2'][sem]) / tabela['R2'][sem] * 100,
+    })
+    return melhorias.dropna().reset_index(drop=True)
+
+
+def ajustar_svr_aproximado(X, y, datas=None, grade=GRADE_SVR_APROXIMADO, divisor=divisao_aleatoria,
+                           n_jobs=-1, **parametros):
+    """
+    Busca em grade dos hiperparâmetros de criar_svr_aproximado(**parametros)
+    nas mesmas divisões da comparação (com datas, ordenadas no tempo).
+    Linhas com NaN ficam de fora da busca.
+
+    Retorna (melhores_parametros, DataFrame com o RMSE médio de cada combinação).
+    """
+    X, y = np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    completas = ~(np.isnan(X).any(axis=1) | np.isnan(y))
+    X, y = X[completas], y[completas]
+    if datas is not None:
+        X, y, datas = ordenar_por_data(X, y, pd.DatetimeIndex(datas)[completas])
+
+    posicoes = np.arange(len(y))
+    divisoes = [(posicoes[treino], posicoes[teste]) for treino, teste in divisor(len(y), datas=datas)]
+    busca = GridSearchCV(criar_svr_aproximado(**parametros), grade, cv=divisoes,
+                         scoring='neg_root_mean_squared_error', n_jobs=n_jobs, refit=False)
+    busca.fit(X, y)
+
+    tabela = pd.DataFrame(busca.cv_results_)
+    tabela = tabela[['params', 'mean_test_score', 'mean_fit_time']].rename(
+        columns={'mean_test_score': 'RMSE', 'mean_fit_time': 'Tempo_Treino_s'}
+    )
+    tabela['RMSE'] = -tabela['RMSE']
+    return busca.best_params_, tabela.sort_values('RMSE', ignore_index=True)
+
+
+def treinar_melhor_modelo(resultados, conjuntos, modelos=None, metrica='RMSE'):
+    """
+    Retreina em todos os dados o modelo com melhor média da métrica nos folds.
+    Retorna (nome_modelo, tipo, modelo_treinado, metricas_medias).
+    """
+    if modelos is None:
+        modelos = criar_modelos()
+
+    medias = resultados.groupby(['Modelo', 'Tipo'], sort=False)[['RMSE', 'MAE', 'R2']].mean()
+    nome_modelo, tipo = medias[metrica].idxmax() if metrica == 'R2' else medias[metrica].idxmin()
+
+    X, y = conjuntos[tipo][0], conjuntos[tipo][1]
+    modelo = clone(modelos[nome_modelo])
+    if hasattr(modelo, 'n_jobs'):
+        modelo.set_params(n_jobs=-1)
+    modelo.fit(np.asarray(X), np.asarray(y))
+    return nome_modelo, tipo, modelo, medias.loc[(nome_modelo, tipo)].to_dict()
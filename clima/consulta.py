@@ -0,0 +1,161 @@
+"""
+Consulta Paginada e Recortes por Período
+Recortes de datas por busca binária (views, sem cópia) e filtros/ordenação no
+formato das DataTables do Dash (filter_query/sort_by), devolvendo só uma página
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from .features import estacao_do_ano
+
+TAMANHO_PAGINA = 20
+
+# Operadores do filter_query do Dash (forma simbólica e por extenso)
+OPERADORES = {
+    '>=': 'ge', '<=': 'le', '!=': 'ne', '>': 'gt', '<': 'lt', '=': 'eq',
+    'ge': 'ge', 'le': 'le', 'ne': 'ne', 'gt': 'gt', 'lt': 'lt', 'eq': 'eq',
+    'contains': 'contains', 'datestartswith': 'datestartswith',
+}
+
+_CONDICAO = re.compile(
+    r'^\s*\{(?P<coluna>[^}]+)\}\s*'
+    r'(?P<operador>>=|<=|!=|>|<|=|s?(?:ge|le|ne|gt|lt|eq)\b|contains\b|datestartswith\b)\s*'
+    r'(?P<valor>.*?)\s*$'
+)
+
+
+def _valor(texto, operador):
+    """Valor do filtro: texto entre aspas (ou de contains/datestartswith) fica texto; o resto vira número se possível"""
+    if len(texto) >= 2 and texto[0] == texto[-1] and texto[0] in '"\'`':
+        return texto[1:-1]
+    if operador in ('contains', 'datestartswith'):
+        return texto
+    try:
+        return float(texto)
+    except ValueError:
+        return texto
+
+
+def interpretar_filtro(filter_query):
+    """
+    Lista de (coluna, operador, valor) de um filter_query do Dash, como
+    '{temp_media} >= 30 && {estacao} contains Ver'. Condições que não
+    seguem o formato levantam ValueError.
+    """
+    if not filter_query:
+        return []
+    condicoes = []
+    for parte in filter_query.split(' && '):
+        encontrado = _CONDICAO.match(parte)
+        if encontrado is None:
+            raise ValueError(f"Condição de filtro não reconhecida: {parte!r}")
+        operador = encontrado['operador']
+        # 'seq', 'sgt'... são as variantes sensíveis a maiúsculas do Dash
+        operador = OPERADORES[operador[1:] if operador.startswith('s') and operador[1:] in OPERADORES else operador]
+        condicoes.append((encontrado['coluna'], operador, _valor(encontrado['valor'], operador)))
+    return condicoes
+
+
+def mascara_filtro(df, condicoes):
+    """Máscara booleana das linhas que atendem a todas as condições"""
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, operador, valor in condicoes:
+        if coluna not in df.columns:
+            raise ValueError(f"Coluna de filtro inexistente: {coluna!r}")
+        serie = df[coluna]
+        if operador == 'contains':
+            atende = serie.astype(str).str.contains(str(valor), case=False, regex=False)
+        elif operador == 'datestartswith':
+            atende = serie.astype(str).str.startswith(str(valor))
+        else:
+            if pd.api.types.is_datetime64_any_dtype(serie):
+                valor = pd.Timestamp(str(valor))
+            elif pd.api.types.is_bool_dtype(serie):
+                valor = str(valor).lower() in ('true', '1', '1.0')
+            elif isinstance(valor, str) and pd.api.types.is_numeric_dtype(serie):
+                raise ValueError(f"Valor não numérico para a coluna {coluna!r}: {valor!r}")
+            atende = getattr(serie, operador)(valor)
+        mascara &= atende.fillna(False).to_numpy(dtype=bool)
+    return mascara
+
+
+def fatia_datas(datas, inicio=None, fim=None):
+    """Fatia [inicio, fim] (datas inclusivas) de uma coluna de datas ordenada, por busca binária"""
+    datas = pd.DatetimeIndex(datas)
+    esquerda = 0 if inicio is None else datas.searchsorted(pd.Timestamp(inicio), side='left')
+    if fim is None:
+        return slice(esquerda, len(datas))
+    limite = pd.Timestamp(fim).normalize() + pd.Timedelta(days=1)
+    return slice(esquerda, datas.searchsorted(limite, side='left'))
+
+
+class IndiceDatas:
+    """
+    DataFrame ordenado por (grupo, data) com as fronteiras de cada grupo
+    (estação meteorológica) e, opcionalmente, colunas de calendário ('mes',
+    'estacao_ano') calculadas uma única vez. Recortes de período custam duas
+    buscas binárias e devolvem fatias do DataFrame, sem máscara nem cópia.
+    """
+
+    def __init__(self, df, coluna_data='data', grupo=None, colunas_calendario=True):
+        chaves = [grupo, coluna_data] if grupo is not None else [coluna_data]
+        df = df.reset_index(drop=True)
+        df[coluna_data] = pd.to_datetime(df[coluna_data])
+        ordenado = (df[coluna_data].is_monotonic_increasing if grupo is None
+                    else df.set_index(chaves).index.is_monotonic_increasing)
+        if not ordenado:
+            df = df.sort_values(chaves, kind='stable', ignore_index=True)
+        if colunas_calendario:
+            df['mes'] = df[coluna_data].dt.month.astype(np.int8)
+            df['estacao_ano'] = estacao_do_ano(df[coluna_data])
+
+        self.df = df
+        self.coluna_data = coluna_data
+        self.datas = pd.DatetimeIndex(df[coluna_data])
+        self.grupos = {}
+        if grupo is not None:
+            valores = df[grupo].to_numpy()
+            inicios = np.flatnonzero(np.r_[True, valores[1:] != valores[:-1]])
+            fins = np.r_[inicios[1:], len(df)]
+            self.grupos = {valores[i]: (int(i), int(f)) for i, f in zip(inicios, fins)}
+
+    def __len__(self):
+        return len(self.df)
+
+    def posicoes(self, inicio=None, fim=None, grupo=None):
+        """Fatia de posições do período [inicio, fim] (datas inclusivas), opcionalmente de um grupo"""
+        esquerda, direita = self.grupos[grupo] if grupo is not None else (0, len(self.df))
+        fatia = fatia_datas(self.datas[esquerda:direita], inicio, fim)
+        return slice(esquerda + fatia.start, esquerda + fatia.stop)
+
+    def fatia(self, inicio=None, fim=None, grupo=None):
+        """Linhas do período (e do grupo) como fatia do DataFrame indexado"""
+        return self.df.iloc[self.posicoes(inicio, fim, grupo)]
+
+
+def consultar_pagina(df, pagina=0, tamanho_pagina=TAMANHO_PAGINA, filter_query=None, sort_by=None,
+                     inicio=None, fim=None, coluna_data='data'):
+    """
+    Uma página do DataFrame (ordenado por `coluna_data`) depois de recortar o
+    período, filtrar e ordenar. Só as linhas da página são copiadas.
+    Retorna (página, total de linhas que atendem à consulta).
+    """
+    if inicio is not None or fim is not None:
+        df = df.iloc[fatia_datas(df[coluna_data], inicio, fim)]
+
+    linhas = np.flatnonzero(mascara_filtro(df, interpretar_filtro(filter_query))) if filter_query else np.arange(len(df))
+
+    if sort_by:
+        # lexsort ordena pela última chave primeiro; ausentes sempre no fim
+        chaves = []
+        for ordem in reversed(sort_by):
+            valores = df[ordem['column_id']].iloc[linhas]
+            chaves.append(valores.rank(method='dense', ascending=ordem.get('direction') != 'desc',
+                                       na_option='bottom').to_numpy())
+        linhas = linhas[np.lexsort(chaves)]
+
+    inicio_pagina = pagina * tamanho_pagina
+    return df.iloc[linhas[inicio_pagina:inicio_pagina + tamanho_pagina]], len(linhas)
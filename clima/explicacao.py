@@ -0,0 +1,289 @@
+"""
+Explicações SHAP e LIME
+Explicadores criados uma vez por modelo registrado; valores SHAP do conjunto
+completo e explicações LIME em lote calculados em paralelo
+"""
+
+import os
+import warnings
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from .ingestao import escrever_cache, ler_cache
+from .registro import obter_modelo
+
+try:
+    import shap
+except ImportError:  # explicações indisponíveis
+    shap = None
+
+try:
+    from lime.lime_tabular import LimeTabularExplainer
+except ImportError:
+    LimeTabularExplainer = None
+
+ARQUIVO_EXPLICADOR = 'explicador_shap.joblib'
+ARQUIVO_VALORES_SHAP = 'valores_shap.arrow'
+ARQUIVO_TREINO_LIME = 'treino_lime.npy'
+TAMANHO_BLOCO_SHAP = 2_000
+AMOSTRA_FUNDO = 100
+AMOSTRA_TREINO_LIME = 20_000
+COLUNA_VALOR_BASE = 'shap_valor_base'
+
+# Explicadores já abertos em cada processo do pool (por caminho e mtime do arquivo)
+_explicadores = {}
+
+
+def _exigir_shap():
+    if shap is None:
+        raise ImportError("O pacote 'shap' é necessário para as explicações (pip install shap)")
+
+
+def _exigir_lime():
+    if LimeTabularExplainer is None:
+        raise ImportError("O pacote 'lime' é necessário para as explicações (pip install lime)")
+
+
+def _eh_arvores(modelo):
+    """Ensembles de árvores e árvores isoladas, explicados pelo TreeExplainer exato"""
+    return hasattr(modelo, 'estimators_') or hasattr(modelo, 'tree_')
+
+
+def criar_explicador(modelo, fundo=None):
+    """
+    Explicador SHAP do modelo, com a amostra de fundo embutida.
+
+    Árvores usam o TreeExplainer intervencional, cujo custo por linha cresce
+    com o tamanho do fundo e não com o número de folhas (o path-dependent,
+    usado quando não há fundo, fica lento em florestas profundas). Os demais
+    modelos exigem o fundo.
+    """
+    _exigir_shap()
+    if _eh_arvores(modelo):
+        if fundo is None:
+            return shap.TreeExplainer(modelo)
+        return shap.TreeExplainer(modelo, np.asarray(fundo), feature_perturbation='interventional')
+    if fundo is None:
+        raise ValueError('Modelos que não são de árvores precisam de dados de fundo para o SHAP')
+    return shap.Explainer(modelo.predict, np.asarray(fundo))
+
+
+def salvar_explicador(explicador, caminho):
+    """Grava o explicador com escrita atômica; retorna o caminho"""
+    caminho = Path(caminho)
+    temporario = caminho.with_suffix(f'.{os.getpid()}.tmp')
+    joblib.dump(explicador, temporario, compress=0)
+    os.replace(temporario, caminho)
+    return caminho
+
+
+def obter_explicador(nome, versao=None, diretorio=None, fundo=None, recriar=False):
+    """
+    Caminho do explicador salvo junto ao artefato do modelo registrado,
+    criado na primeira chamada (ou quando `recriar=True`).
+    """
+    modelo = obter_modelo(nome, versao, diretorio)
+    caminho = modelo.diretorio_versao / ARQUIVO_EXPLICADOR
+    if recriar or not caminho.exists():
+        salvar_explicador(criar_explicador(modelo.modelo, fundo), caminho)
+    return caminho
+
+
+def _abrir_explicador(caminho):
+    # workers do loky são reaproveitados: o mtime invalida explicadores recriados
+    chave = (str(caminho), os.stat(caminho).st_mtime_ns)
+    if chave not in _explicadores:
+        _explicadores[chave] = joblib.load(caminho)
+    return _explicadores[chave]
+
+
+def _valores_bloco(caminho_explicador, X):
+    """(valores SHAP, valor base por linha) de um bloco de linhas"""
+    explicador = _abrir_explicador(caminho_explicador)
+    if isinstance(explicador, shap.TreeExplainer):
+        valores = explicador.shap_values(X, check_additivity=False)
+        base = np.full(len(X), np.ravel(explicador.expected_value)[0])
+    else:
+        explicacao = explicador(X)
+        valores, base = explicacao.values, np.ravel(explicacao.base_values)
+    return np.asarray(valores, dtype=np.float32), base.astype(np.float32)
+
+
+def calcular_valores_shap(caminho_explicador, X, tamanho_bloco=TAMANHO_BLOCO_SHAP, n_jobs=-1):
+    """
+    Valores SHAP de todas as linhas de X, em blocos distribuídos entre
+    processos. Cada processo carrega o explicador do disco uma única vez.
+    Retorna (valores [n_linhas x n_features], valor_base [n_linhas]).
+    """
+    _exigir_shap()
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    blocos = Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(_valores_bloco)(str(caminho_explicador), X[inicio:inicio + tamanho_bloco])
+        for inicio in range(0, len(X), tamanho_bloco)
+    )
+    if not blocos:
+        return np.empty((0, X.shape[1]), dtype=np.float32), np.empty(0, dtype=np.float32)
+    return np.concatenate([valores for valores, _ in blocos]), np.concatenate([base for _, base in blocos])
+
+
+def explicar_modelo(nome, dados, versao=None, diretorio=None, tamanho_bloco=TAMANHO_BLOCO_SHAP,
+                    n_jobs=-1, colunas_chave=('estacao', 'data')):
+    """
+    Calcula os valores SHAP de todas as linhas de `dados` (que precisam ter
+    as features do modelo) e grava a matriz ao lado do artefato, junto com as
+    colunas de identificação (estação, data) presentes. Retorna o caminho.
+    """
+    modelo = obter_modelo(nome, versao, diretorio)
+    X = dados[modelo.features].to_numpy(dtype=np.float64)
+
+    aleatorio = np.random.default_rng(42)
+    fundo = X[aleatorio.choice(len(X), min(AMOSTRA_FUNDO, len(X)), replace=False)]
+    caminho_explicador = obter_explicador(nome, modelo.versao, diretorio, fundo)
+
+    valores, base = calcular_valores_shap(caminho_explicador, X, tamanho_bloco, n_jobs)
+
+    chaves = [coluna for coluna in colunas_chave if coluna in dados.columns]
+    resultado = pd.concat([
+        dados[chaves].reset_index(drop=True),
+        pd.DataFrame(valores, columns=modelo.features),
+        pd.DataFrame({COLUNA_VALOR_BASE: base}),
+    ], axis=1)
+
+    destino = modelo.diretorio_versao / ARQUIVO_VALORES_SHAP
+    escrever_cache(resultado, destino, {
+        'modelo': modelo.nome,
+        'versao': str(modelo.versao),
+        'linhas': str(len(resultado)),
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+    })
+    return destino
+
+
+def ler_valores_shap(nome, versao=None, diretorio=None):
+    """Matriz SHAP persistida (memory-mapped), ou None se ainda não foi calculada"""
+    caminho = obter_modelo(nome, versao, diretorio).diretorio_versao / ARQUIVO_VALORES_SHAP
+    if not Path(caminho).exists():
+        return None
+    return ler_cache(caminho).reset_index(drop=True)
+
+
+def importancia_global(valores, features):
+    """Importância global: média do |SHAP| de cada feature, em ordem decrescente"""
+    return pd.DataFrame({
+        'Feature': list(features),
+        'SHAP_Importância': np.abs(valores[list(features)].to_numpy()).mean(axis=0),
+    }).sort_values('SHAP_Importância', ascending=False).reset_index(drop=True)
+
+
+def criar_explicador_lime(X_treino, features, random_state=42):
+    """LimeTabularExplainer de regressão com as estatísticas (quartis, médias) do treino"""
+    _exigir_lime()
+    return LimeTabularExplainer(
+        np.asarray(X_treino, dtype=np.float64),
+        mode='regression',
+        feature_names=list(features),
+        discretize_continuous=True,
+        random_state=random_state,
+    )
+
+
+def obter_treino_lime(nome, X_treino=None, versao=None, diretorio=None, recriar=False):
+    """
+    Caminho da amostra de treino (.npy) de onde o LIME tira suas estatísticas,
+    salva junto ao artefato do modelo registrado. O LimeTabularExplainer não
+    é serializável (o discretizador guarda lambdas), então cada processo o
+    reconstrói a partir deste arquivo uma única vez.
+    """
+    modelo = obter_modelo(nome, versao, diretorio)
+    caminho = modelo.diretorio_versao / ARQUIVO_TREINO_LIME
+    if recriar or not caminho.exists():
+        if X_treino is None:
+            raise ValueError('X_treino é necessário para criar as estatísticas do LIME')
+        X_treino = np.asarray(X_treino, dtype=np.float64)
+        if len(X_treino) > AMOSTRA_TREINO_LIME:
+            aleatorio = np.random.default_rng(42)
+            X_treino = X_treino[np.sort(aleatorio.choice(len(X_treino), AMOSTRA_TREINO_LIME, replace=False))]
+        temporario = caminho.with_suffix(f'.{os.getpid()}.tmp.npy')
+        np.save(temporario, X_treino)
+        os.replace(temporario, caminho)
+    return caminho
+
+
+def _abrir_explicador_lime(caminho_treino, features):
+    chave = (str(caminho_treino), os.stat(caminho_treino).st_mtime_ns, tuple(features))
+    if chave not in _explicadores:
+        _explicadores[chave] = criar_explicador_lime(np.load(caminho_treino), features)
+    return _explicadores[chave]
+
+
+def _lime_bloco(nome, versao, diretorio, X, indices, num_features, num_samples, semente):
+    """Explicações LIME de um bloco de instâncias, em formato longo"""
+    modelo = obter_modelo(nome, versao, diretorio)
+    features = modelo.features
+    explicador = _abrir_explicador_lime(modelo.diretorio_versao / ARQUIVO_TREINO_LIME, features)
+    estimador = modelo.modelo
+    linhas = []
+    with warnings.catch_warnings():
+        # o modelo recebe as perturbações como arrays numpy; o aviso de nomes de features é esperado
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        for indice, instancia in zip(indices, X):
+            # semente por instância: resultado independe da divisão em blocos
+            estado = np.random.RandomState(semente + int(indice))
+            explicador.random_state = explicador.base.random_state = estado
+            if explicador.discretizer is not None:
+                explicador.discretizer.random_state = estado
+            explicacao = explicador.explain_instance(
+                instancia, estimador.predict, num_features=num_features, num_samples=num_samples
+            )
+            # em regressão o LIME guarda os pesos no rótulo 1 (o rótulo 0 é o negativo)
+            mapeador = explicacao.domain_mapper
+            condicoes = mapeador.discretized_feature_names or mapeador.exp_feature_names
+            for posicao, (feature, peso) in enumerate(explicacao.local_exp[1]):
+                linhas.append({
+                    'instancia': indice,
+                    'rank': posicao + 1,
+                    'feature': features[feature],
+                    'condicao': condicoes[feature],
+                    'peso': float(peso),
+                    'intercepto': float(explicacao.intercept[1]),
+                    'previsao_local': float(np.ravel(explicacao.local_pred)[0]),
+                    'previsao_modelo': float(explicacao.predicted_value),
+                    'score': float(explicacao.score),
+                })
+    return linhas
+
+
+def explicar_lime_lote(nome, X, versao=None, diretorio=None, indices=None, num_features=10,
+                       num_samples=5000, n_jobs=-1, semente=42):
+    """
+    Explicações LIME de todas as linhas de X, divididas entre processos.
+
+    `nome`/`versao` identificam o modelo registrado, que precisa ter a amostra
+    de treino salva por obter_treino_lime. Cada processo abre o modelo pelo
+    registro (obter_modelo), em vez de recebê-lo serializado a cada bloco.
+    Retorna uma tabela longa: uma linha por (instância, feature) com o peso local.
+    """
+    _exigir_lime()
+    modelo = obter_modelo(nome, versao, diretorio)
+    obter_treino_lime(nome, versao=modelo.versao, diretorio=diretorio)
+    if isinstance(X, pd.DataFrame):
+        X = X[modelo.features]
+    X = np.asarray(X, dtype=np.float64)
+    indices = np.arange(len(X)) if indices is None else np.asarray(indices)
+    diretorio = str(diretorio) if diretorio is not None else None
+
+    n_blocos = min(len(X), 4 * joblib.effective_n_jobs(n_jobs)) or 1
+    blocos = [bloco for bloco in np.array_split(np.arange(len(X)), n_blocos) if len(bloco)]
+    resultados = Parallel(n_jobs=n_jobs, backend='loky')(
+        delayed(_lime_bloco)(nome, modelo.versao, diretorio, X[bloco], indices[bloco],
+                             num_features, num_samples, semente)
+        for bloco in blocos
+    )
+    colunas = ['instancia', 'rank', 'feature', 'condicao', 'peso', 'intercepto',
+               'previsao_local', 'previsao_modelo', 'score']
+    return pd.DataFrame([linha for bloco in resultados for linha in bloco], columns=colunas)
@@ -0,0 +1,338 @@
+"""
+Engenharia de Features
+Lag features vetorizadas (uma única alocação) e sensíveis à estação
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Especificação usada em dados_climaticos_com_lags.csv
+VARIAVEIS_LAG = [
+    'temp_media', 'temp_minima', 'temp_maxima',
+    'umidade_relativa_media', 'pressao_atm_media'
+]
+LAGS_PADRAO = [1, 2, 3, 7]
+FORMATO_NOME_LAG = '{variavel}_lag{lag}'
+
+
+def nomes_lags(variaveis=VARIAVEIS_LAG, lags=LAGS_PADRAO, formato=FORMATO_NOME_LAG):
+    """Nomes das colunas de lag, na ordem variável x lag"""
+    return [formato.format(variavel=variavel, lag=lag) for variavel in variaveis for lag in lags]
+
+
+def _inicio_grupos(grupos):
+    """
+    Para cada linha, o índice da primeira linha do seu grupo.
+    Os grupos precisam estar contíguos (dados ordenados por estação).
+    """
+    grupos = np.asarray(grupos)
+    n = len(grupos)
+    if n == 0:
+        return np.zeros(0, dtype=np.intp)
+
+    mudou = np.empty(n, dtype=bool)
+    mudou[0] = True
+    mudou[1:] = grupos[1:] != grupos[:-1]
+    return np.maximum.accumulate(np.where(mudou, np.arange(n), 0))
+
+
+def matriz_lags(valores, lags=LAGS_PADRAO, grupos=None, dtype=None):
+    """
+    Calcula a matriz de lags de um array (n_linhas x n_variaveis).
+
+    Usa uma janela deslizante (stride tricks) sobre os valores com NaN à
+    esquerda e copia só os lags pedidos, numa única alocação de saída
+    (n_linhas x n_variaveis * n_lags). Com `grupos`, lags que cruzariam a
+    fronteira entre grupos viram NaN.
+    """
+    valores = np.asarray(valores)
+    if valores.ndim == 1:
+        valores = valores[:, None]
+    dtype = np.dtype(dtype or np.result_type(valores.dtype, np.float32))
+    lags = np.asarray(lags, dtype=np.intp)
+    n, n_variaveis = valores.shape
+    lag_max = int(lags.max())
+
+    preenchido = np.full((n + lag_max, n_variaveis), np.nan, dtype=dtype)
+    preenchido[lag_max:] = valores
+
+    # janelas[i, v, k] = valor da variável v na linha i - lag_max + k
+    janelas = sliding_window_view(preenchido, lag_max + 1, axis=0)[:n]
+    resultado = janelas[:, :, lag_max - lags]
+
+    if grupos is not None:
+        posicao = np.arange(n) - _inicio_grupos(grupos)
+        sem_historico = posicao[:, None] < lags[None, :]
+        np.copyto(resultado, np.nan, where=sem_historico[:, None, :])
+
+    return resultado.reshape(n, n_variaveis * len(lags))
+
+
+def criar_lag_features(df, variaveis=VARIAVEIS_LAG, lags=LAGS_PADRAO, grupo=None,
+                       dtype=None, formato=FORMATO_NOME_LAG, dropna=True):
+    """
+    Adiciona as lag features ao DataFrame.
+
+    - grupo: coluna ou nível do índice com a estação; os lags não cruzam
+      estações (as linhas de cada estação devem estar contíguas e ordenadas
+      pela data, como em carregar_estacoes)
+    - dtype: tipo da matriz de lags (ex.: np.float32)
+    - dropna: remove as linhas sem histórico suficiente
+    """
+    grupos = None
+    if grupo is not None:
+        grupos = df[grupo] if grupo in df.columns else df.index.get_level_values(grupo)
+
+    lags_df = pd.DataFrame(
+        matriz_lags(df[variaveis].to_numpy(), lags, grupos, dtype),
+        index=df.index,
+        columns=nomes_lags(variaveis, lags, formato)
+    )
+    df_com_lag = pd.concat([df, lags_df], axis=1)
+
+    if dropna:
+        df_com_lag = df_com_lag.dropna()
+    return df_com_lag
+
+
+# ---------------------------------------------------------------------------
+# Janelas móveis, médias exponenciais e calendário
+# ---------------------------------------------------------------------------
+
+JANELAS_PADRAO = [3, 7, 14, 30]
+SPANS_PADRAO = [7, 30]
+TEMP_BASE_GRAUS_DIA = 10.0
+
+# Estação do ano (hemisfério sul) indexada pelo mês
+_ESTACAO_POR_MES = np.array([
+    None, 'Verão', 'Verão', 'Outono', 'Outono', 'Outono', 'Inverno',
+    'Inverno', 'Inverno', 'Primavera', 'Primavera', 'Primavera', 'Verão'
+], dtype=object)
+
+
+def estacao_do_ano(datas):
+    """Estação do ano de cada data (hemisfério sul), sem apply linha a linha"""
+    return _ESTACAO_POR_MES[pd.DatetimeIndex(datas).month]
+
+
+def categoria_precipitacao(precipitacao):
+    """Categoriza a precipitação diária em Nenhuma/Leve/Moderada/Pesada (NaN sem medição)"""
+    precipitacao = np.asarray(precipitacao, dtype=np.float64)
+    categorias = np.select(
+        [precipitacao == 0, precipitacao <= 2.5, precipitacao <= 10],
+        ['Nenhuma', 'Leve', 'Moderada'],
+        default='Pesada'
+    ).astype(object)
+    categorias[np.isnan(precipitacao)] = np.nan
+    return categorias
+
+
+def _datas(df):
+    """Datas do DataFrame, seja da coluna 'data' ou do índice"""
+    if 'data' in df.columns:
+        return pd.DatetimeIndex(df['data'])
+    return pd.DatetimeIndex(df.index.get_level_values('data'))
+
+
+def _grupos(df, grupo):
+    """Rótulos de grupo (estação) da coluna ou do nível do índice"""
+    if grupo is None:
+        return None
+    return np.asarray(df[grupo] if grupo in df.columns else df.index.get_level_values(grupo))
+
+
+def _maximo_movel(valores, janela):
+    """
+    Máximo em janela móvel em O(n) (van Herk/Gil-Werman): máximos de
+    prefixo e sufixo dentro de blocos do tamanho da janela.
+    """
+    n, n_variaveis = valores.shape
+    resultado = np.full((n, n_variaveis), -np.inf)
+    if n < janela:
+        return resultado
+
+    tamanho = -(-n // janela) * janela
+    blocos = np.full((tamanho, n_variaveis), -np.inf)
+    blocos[:n] = valores
+    blocos = blocos.reshape(-1, janela, n_variaveis)
+    prefixo = np.maximum.accumulate(blocos, axis=1).reshape(tamanho, n_variaveis)
+    sufixo = np.maximum.accumulate(blocos[:, ::-1], axis=1)[:, ::-1].reshape(tamanho, n_variaveis)
+
+    # janela [i - janela + 1, i] = sufixo do bloco inicial + prefixo do bloco final
+    resultado[janela - 1:] = np.maximum(sufixo[:n - janela + 1], prefixo[janela - 1:n])
+    return resultado
+
+
+def estatisticas_moveis(valores, janela, grupos=None):
+    """
+    Média, mínimo, máximo e desvio padrão em janela móvel completa.
+
+    Somas e somas de quadrados vêm de somas de prefixo (O(n), independente
+    do tamanho da janela); NaNs são ignorados dentro da janela. Com `grupos`,
+    janelas que cruzariam a fronteira entre estações viram NaN.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    if valores.ndim == 1:
+        valores = valores[:, None]
+    n, n_variaveis = valores.shape
+    validos = np.isfinite(valores)
+
+    # Centralizar reduz o cancelamento numérico na variância
+    centro = np.nanmean(valores, axis=0) if n else np.zeros(n_variaveis)
+    centro = np.where(np.isfinite(centro), centro, 0.0)
+    centrados = np.where(validos, valores - centro, 0.0)
+
+    def soma_movel(x):
+        prefixo = np.zeros((n + 1, n_variaveis))
+        np.cumsum(x, axis=0, out=prefixo[1:])
+        soma = np.full((n, n_variaveis), np.nan)
+        soma[janela - 1:] = prefixo[janela:] - prefixo[:n - janela + 1]
+        return soma
+
+    contagem = soma_movel(validos.astype(np.float64))
+    soma = soma_movel(centrados)
+    soma_quadrados = soma_movel(centrados ** 2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = soma / contagem
+        variancia = (soma_quadrados - soma * media) / (contagem - 1)
+    desvio = np.sqrt(np.clip(variancia, 0, None))
+    media = media + centro
+
+    maximo = _maximo_movel(np.where(validos, valores, -np.inf), janela)
+    minimo = -_maximo_movel(np.where(validos, -valores, -np.inf), janela)
+
+    invalido = ~(contagem > 0)
+    if grupos is not None:
+        posicao = np.arange(n) - _inicio_grupos(grupos)
+        invalido |= (posicao < janela - 1)[:, None]
+    for estatistica in (media, minimo, maximo, desvio):
+        estatistica[invalido] = np.nan
+    desvio[contagem < 2] = np.nan
+
+    return media, minimo, maximo, desvio
+
+
+def _nomes_moveis(variavel, janela):
+    """Nomes das colunas de estatísticas móveis de uma variável"""
+    return [f'{variavel}_{estatistica}_{janela}d' for estatistica in ('media', 'min', 'max', 'std')]
+
+
+def _media_exponencial(df, variaveis, span, grupo):
+    """Média móvel exponencial (adjust=False), reiniciada a cada estação"""
+    valores = df[variaveis]
+    if grupo is None:
+        return valores.ewm(span=span, adjust=False).mean()
+    chave = df[grupo] if grupo in df.columns else df.index.get_level_values(grupo)
+    return valores.groupby(np.asarray(chave), sort=False).transform(
+        lambda serie: serie.ewm(span=span, adjust=False).mean()
+    )
+
+
+def features_temporais(df, variaveis=VARIAVEIS_LAG, janelas=JANELAS_PADRAO, spans=SPANS_PADRAO,
+                       temp_base=TEMP_BASE_GRAUS_DIA, grupo=None, dtype=np.float32):
+    """
+    Calcula as features de janela móvel e de calendário do DataFrame.
+
+    - {variavel}_{media,min,max,std}_{janela}d: estatísticas em janelas móveis
+    - {variavel}_mme_{span}d: média móvel exponencial
+    - graus_dia / graus_dia_acumulados: graus-dia acima de `temp_base`
+      (acumulados por ano civil)
+    - dia_ano_sen / dia_ano_cos: codificação cíclica do dia do ano
+
+    As linhas de cada estação (`grupo`) devem estar contíguas e ordenadas pela data.
+    """
+    datas = _datas(df)
+    grupos = _grupos(df, grupo)
+    valores = df[variaveis].to_numpy(dtype=np.float64)
+
+    colunas = {}
+    for janela in janelas:
+        estatisticas = estatisticas_moveis(valores, janela, grupos)
+        for i, variavel in enumerate(variaveis):
+            for nome, estatistica in zip(_nomes_moveis(variavel, janela), estatisticas):
+                colunas[nome] = estatistica[:, i]
+
+    for span in spans:
+        mme = _media_exponencial(df, variaveis, span, grupo)
+        for variavel in variaveis:
+            colunas[f'{variavel}_mme_{span}d'] = mme[variavel].to_numpy()
+
+    # Graus-dia pela média das extremas; acumulado reinicia a cada ano e estação
+    temp_dia = (df['temp_maxima'].to_numpy(np.float64) + df['temp_minima'].to_numpy(np.float64)) / 2
+    graus_dia = np.clip(temp_dia - temp_base, 0, None)
+    chave_acumulado = [datas.year] if grupos is None else [grupos, datas.year]
+    colunas['graus_dia'] = graus_dia
+    colunas['graus_dia_acumulados'] = (
+        pd.Series(np.nan_to_num(graus_dia)).groupby(chave_acumulado, sort=False).cumsum().to_numpy()
+    )
+
+    angulo = 2 * np.pi * (datas.dayofyear.to_numpy() - 1) / 365.25
+    colunas['dia_ano_sen'] = np.sin(angulo)
+    colunas['dia_ano_cos'] = np.cos(angulo)
+
+    return pd.DataFrame(colunas, index=df.index).astype(dtype)
+
+
+def adicionar_features_temporais(df, **parametros):
+    """Adiciona as features de features_temporais ao DataFrame"""
+    return pd.concat([df, features_temporais(df, **parametros)], axis=1)
+
+
+def estender_features_temporais(df_features, novos, variaveis=VARIAVEIS_LAG, janelas=JANELAS_PADRAO,
+                                spans=SPANS_PADRAO, temp_base=TEMP_BASE_GRAUS_DIA, grupo=None,
+                                dtype=np.float32):
+    """
+    Estende features já calculadas com novas linhas diárias, sem recalcular o histórico.
+
+    Usa apenas a cauda de cada estação (janela máxima - 1 linhas) para as
+    janelas móveis, e o último valor das médias exponenciais e dos graus-dia
+    acumulados como estado inicial.
+    """
+    parametros = dict(variaveis=variaveis, janelas=janelas, spans=[],
+                      temp_base=temp_base, dtype=np.float64)
+    cauda_max = max(janelas) - 1 if janelas else 0
+    colunas_brutas = list(novos.columns)
+
+    if grupo is None:
+        partes = [(None, df_features, novos)]
+    else:
+        grupos_hist = _grupos(df_features, grupo)
+        grupos_novos = _grupos(novos, grupo)
+        partes = [
+            (codigo, df_features[grupos_hist == codigo], novos[grupos_novos == codigo])
+            for codigo in pd.unique(grupos_novos)
+        ]
+
+    estendidos = []
+    for _, historico, novos_grupo in partes:
+        cauda = historico[colunas_brutas].iloc[len(historico) - cauda_max:] if cauda_max else historico[colunas_brutas].iloc[:0]
+        bloco = pd.concat([cauda, novos_grupo])
+        extensao = features_temporais(bloco, **parametros).iloc[len(cauda):]
+
+        # Médias exponenciais: a última média conhecida é o estado inicial
+        for span in spans:
+            for variavel in variaveis:
+                nome = f'{variavel}_mme_{span}d'
+                serie = novos_grupo[variavel].astype(np.float64)
+                if len(historico):
+                    estado = pd.Series([historico[nome].iloc[-1]])
+                    serie = pd.concat([estado, serie], ignore_index=True)
+                mme = serie.ewm(span=span, adjust=False).mean().to_numpy()
+                extensao[nome] = mme[-len(novos_grupo):]
+
+        # Graus-dia acumulados continuam do último valor se o ano não mudou
+        anos = _datas(novos_grupo).year
+        acumulados = extensao['graus_dia'].fillna(0).groupby(anos, sort=False).cumsum().to_numpy(copy=True)
+        if len(historico):
+            mesmo_ano = anos == _datas(historico)[-1].year
+            acumulados[mesmo_ano] += historico['graus_dia_acumulados'].iloc[-1]
+        extensao['graus_dia_acumulados'] = acumulados
+
+        estendidos.append(pd.concat([novos_grupo, extensao.astype(dtype)], axis=1))
+
+    resultado = pd.concat([df_features] + estendidos)
+    if grupo is not None:
+        resultado = resultado.iloc[np.argsort(_grupos(resultado, grupo), kind='stable')]
+    return resultado[df_features.columns]
@@ -0,0 +1,286 @@
+"""
+Treino Fora da Memória
+Para bases maiores que a RAM: as features saem em blocos do armazenamento
+colunar (partes Arrow mapeadas em memória) para matrizes em disco (np.memmap)
+ordenadas pela data. Modelos com partial_fit treinam bloco a bloco; o Hist
+Gradient Boosting lê a matriz mapeada direto. Os resultados têm o formato de
+comparacao.executar_comparacao e entram na mesma tabela de comparação
+"""
+
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.linear_model import SGDRegressor
+from sklearn.pipeline import Pipeline, make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from .comparacao import TIPOS_CONJUNTO, divisao_aleatoria
+from .incremental import _caminho_parte, ler_estado
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # sem armazenamento colunar não há o que ler em blocos
+    pa = None
+
+TAMANHO_BLOCO = 100_000
+# Passadas do partial_fit sobre o treino (a ordem dos blocos é embaralhada a cada uma)
+EPOCAS = 5
+DIRETORIO_MATRIZES = 'matrizes'
+SUFIXO_FORA_DA_MEMORIA = ' (fora da memória)'
+
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise ImportError("O pacote 'pyarrow' é necessário para ler o armazenamento em blocos (pip install pyarrow)")
+
+
+def criar_modelos_fora_da_memoria(random_state=42):
+    """
+    Modelos treinados sem carregar a base: SGD via partial_fit (o
+    StandardScaler também aprende em blocos) e Hist Gradient Boosting sobre
+    a matriz mapeada, que ele reduz a bins de 1 byte por valor. Qualquer
+    Pipeline cujos passos tenham partial_fit (ex.: MLPRegressor) também serve.
+    """
+    return {
+        'SGD' + SUFIXO_FORA_DA_MEMORIA: make_pipeline(
+            StandardScaler(), SGDRegressor(alpha=1e-5, random_state=random_state)
+        ),
+        'Hist Gradient Boosting' + SUFIXO_FORA_DA_MEMORIA: HistGradientBoostingRegressor(
+            early_stopping=False, random_state=random_state
+        ),
+    }
+
+
+def blocos_armazenamento(diretorio, colunas, tamanho_bloco=TAMANHO_BLOCO, estado=None):
+    """
+    DataFrames de até `tamanho_bloco` linhas, só com `colunas`, de cada parte
+    do armazenamento incremental (na ordem do estado). Só o bloco corrente é
+    convertido; o resto das partes continua mapeado em disco.
+    """
+    _exigir_pyarrow()
+    estado = estado or ler_estado(diretorio)
+    if estado is None:
+        raise FileNotFoundError(f"Nenhum armazenamento incremental em {diretorio}")
+
+    for numero in estado['partes']:
+        with pa.memory_map(str(_caminho_parte(diretorio, numero)), 'r') as origem:
+            leitor = pa.ipc.open_file(origem)
+            for i in range(leitor.num_record_batches):
+                lote = leitor.get_batch(i).select(colunas)
+                for inicio in range(0, lote.num_rows, tamanho_bloco):
+                    yield lote.slice(inicio, tamanho_bloco).to_pandas()
+
+
+def _nome_arquivo(tipo):
+    return '_'.join(TIPOS_CONJUNTO.get(tipo, tipo).lower().split())
+
+
+def materializar_conjunto(diretorio, features, target, destino, tamanho_bloco=TAMANHO_BLOCO, estado=None):
+    """
+    Grava X (float64) e y do armazenamento em arquivos .npy mapeados, só com
+    as linhas completas e em ordem cronológica, em duas passadas em blocos:
+    a primeira lê apenas datas e validade, a segunda espalha cada bloco na
+    sua posição final. float64 é o dtype do Hist Gradient Boosting, que
+    assim usa a matriz mapeada sem convertê-la para a RAM.
+
+    Retorna (X, y, datas); só as datas (8 bytes por linha) ficam na memória.
+    """
+    estado = estado or ler_estado(diretorio)
+    colunas = list(features) + [target]
+    datas = []
+    for bloco in blocos_armazenamento(diretorio, ['data'] + colunas, tamanho_bloco, estado):
+        completas = bloco[colunas].notna().all(axis=1).to_numpy()
+        datas.append(bloco['data'].to_numpy(dtype='datetime64[ns]')[completas])
+    datas = np.concatenate(datas) if datas else np.zeros(0, dtype='datetime64[ns]')
+
+    # posição de cada linha válida (na ordem de leitura) na matriz ordenada
+    ordem = np.argsort(datas, kind='stable')
+    posicoes = np.empty(len(ordem), dtype=np.intp)
+    posicoes[ordem] = np.arange(len(ordem))
+
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    X = np.lib.format.open_memmap(destino / 'X.npy', mode='w+', dtype=np.float64, shape=(len(ordem), len(features)))
+    y = np.lib.format.open_memmap(destino / 'y.npy', mode='w+', dtype=np.float64, shape=(len(ordem),))
+
+    gravadas = 0
+    for bloco in blocos_armazenamento(diretorio, colunas, tamanho_bloco, estado):
+        valores = bloco.to_numpy(dtype=np.float64)
+        valores = valores[~np.isnan(valores).any(axis=1)]
+        alvo = posicoes[gravadas:gravadas + len(valores)]
+        X[alvo] = valores[:, :-1]
+        y[alvo] = valores[:, -1]
+        gravadas += len(valores)
+    X.flush()
+    y.flush()
+    return X, y, pd.DatetimeIndex(datas[ordem], name='data')
+
+
+def preparar_matrizes(diretorio, conjuntos, tamanho_bloco=TAMANHO_BLOCO, destino=None):
+    """
+    Materializa cada conjunto {tipo: (features, target)} do armazenamento
+    (padrão: em <armazenamento>/matrizes/<tipo>). Retorna {tipo: (X, y, datas)}.
+    """
+    estado = ler_estado(diretorio)
+    destino = Path(destino) if destino is not None else Path(diretorio) / DIRETORIO_MATRIZES
+    return {
+        tipo: materializar_conjunto(diretorio, features, target, destino / _nome_arquivo(tipo),
+                                    tamanho_bloco, estado)
+        for tipo, (features, target) in conjuntos.items()
+    }
+
+
+def _fatias(indices, tamanho_bloco):
+    """Divide um slice (ou vetor de índices) em pedaços de até tamanho_bloco linhas"""
+    if isinstance(indices, slice):
+        return [slice(inicio, min(inicio + tamanho_bloco, indices.stop))
+                for inicio in range(indices.start or 0, indices.stop, tamanho_bloco)]
+    indices = np.sort(np.asarray(indices))
+    return [indices[inicio:inicio + tamanho_bloco] for inicio in range(0, len(indices), tamanho_bloco)]
+
+
+def _copiar_linhas(X, y, indices, destino, tamanho_bloco=TAMANHO_BLOCO):
+    """X[indices] e y[indices] (índices em ordem crescente) gravados bloco a bloco em .npy mapeados"""
+    blocos = _fatias(indices, tamanho_bloco)
+    n = sum(len(bloco) for bloco in blocos)
+    X_copia = np.lib.format.open_memmap(Path(destino) / 'X.npy', mode='w+', dtype=X.dtype, shape=(n, X.shape[1]))
+    y_copia = np.lib.format.open_memmap(Path(destino) / 'y.npy', mode='w+', dtype=y.dtype, shape=(n,))
+    inicio = 0
+    for bloco in blocos:
+        X_copia[inicio:inicio + len(bloco)] = X[bloco]
+        y_copia[inicio:inicio + len(bloco)] = y[bloco]
+        inicio += len(bloco)
+    return X_copia, y_copia
+
+
+def treinar_em_blocos(modelo, X, y, treino=None, tamanho_bloco=TAMANHO_BLOCO, epocas=EPOCAS, random_state=42):
+    """
+    Treina `modelo` (já clonado) nas linhas `treino` de X/y sem copiá-las
+    inteiras: num Pipeline com partial_fit em todos os passos, cada
+    transformador faz uma passada e o estimador final `epocas` passadas,
+    bloco a bloco. Modelos sem partial_fit recebem a fatia mapeada em fit;
+    com índices (divisão aleatória), as linhas vão antes, em ordem e bloco a
+    bloco, para uma cópia mapeada temporária (X[indices] iria para a RAM).
+    """
+    if treino is None:
+        treino = slice(0, len(y))
+    passos = [passo for _, passo in modelo.steps] if isinstance(modelo, Pipeline) else [modelo]
+    if not all(hasattr(passo, 'partial_fit') for passo in passos):
+        if isinstance(treino, slice):
+            return modelo.fit(X[treino], y[treino])
+        # a cópia fica ao lado da matriz (mesmo disco), não no /tmp
+        base = Path(X.filename).parent if getattr(X, 'filename', None) else None
+        with tempfile.TemporaryDirectory(dir=base) as temporario:
+            return modelo.fit(*_copiar_linhas(X, y, treino, temporario, tamanho_bloco))
+
+    *transformadores, estimador = passos
+    blocos = _fatias(treino, tamanho_bloco)
+
+    def transformar(bloco, n_passos):
+        X_bloco = X[bloco]
+        for transformador in transformadores[:n_passos]:
+            X_bloco = transformador.transform(X_bloco)
+        return X_bloco
+
+    for i, transformador in enumerate(transformadores):
+        for bloco in blocos:
+            transformador.partial_fit(transformar(bloco, i))
+
+    aleatorio = np.random.default_rng(random_state)
+    for _ in range(epocas):
+        for j in aleatorio.permutation(len(blocos)):
+            estimador.partial_fit(transformar(blocos[j], len(transformadores)), y[blocos[j]])
+    return modelo
+
+
+def avaliar_em_blocos(modelo, X, y, teste, tamanho_bloco=TAMANHO_BLOCO):
+    """RMSE, MAE e R² acumulados bloco a bloco (somas em float64)"""
+    n = 0
+    soma_quadrados = soma_absolutos = soma_y = soma_y2 = 0.0
+    for bloco in _fatias(teste, tamanho_bloco):
+        y_bloco = np.asarray(y[bloco])
+        erro = y_bloco - modelo.predict(X[bloco])
+        n += len(y_bloco)
+        soma_quadrados += float(erro @ erro)
+        soma_absolutos += float(np.abs(erro).sum())
+        soma_y += float(y_bloco.sum())
+        soma_y2 += float(y_bloco @ y_bloco)
+    total = soma_y2 - soma_y ** 2 / n
+    return {
+        'RMSE': np.sqrt(soma_quadrados / n),
+        'MAE': soma_absolutos / n,
+        'R2': 1 - soma_quadrados / total if total > 0 else np.nan,
+    }
+
+
+def _tamanho(indices):
+    return indices.stop - (indices.start or 0) if isinstance(indices, slice) else len(indices)
+
+
+def executar_comparacao_fora_da_memoria(matrizes, modelos=None, divisor=divisao_aleatoria,
+                                        tamanho_bloco=TAMANHO_BLOCO, epocas=EPOCAS, verbose=0):
+    """
+    Mesma grade de comparacao.executar_comparacao (modelo x conjunto x
+    divisão) sobre as matrizes de preparar_matrizes. As tarefas rodam em
+    sequência: em paralelo, cada uma somaria seus blocos à memória.
+
+    Retorna um DataFrame com uma linha por tarefa, nas colunas de
+    executar_comparacao (concatenável com ele para tabela_comparacao).
+    """
+    if modelos is None:
+        modelos = criar_modelos_fora_da_memoria()
+
+    linhas = []
+    for tipo, (X, y, datas) in matrizes.items():
+        for divisao, (treino, teste) in enumerate(divisor(len(y), datas=datas)):
+            datas_teste = datas[teste]
+            for nome_modelo, modelo in modelos.items():
+                inicio = time.perf_counter()
+                modelo = treinar_em_blocos(clone(modelo), X, y, treino, tamanho_bloco, epocas)
+                tempo_treino = time.perf_counter() - inicio
+
+                inicio = time.perf_counter()
+                metricas = avaliar_em_blocos(modelo, X, y, teste, tamanho_bloco)
+                tempo_predicao = time.perf_counter() - inicio
+
+                linhas.append({
+                    'Modelo': nome_modelo,
+                    'Tipo': tipo,
+                    'Divisao': divisao,
+                    **metricas,
+                    'Tempo_Treino_s': tempo_treino,
+                    'Tempo_Predicao_s': tempo_predicao,
+                    'N_Treino': _tamanho(treino),
+                    'N_Teste': _tamanho(teste),
+                    'Inicio_Teste': datas_teste.min(),
+                    'Fim_Teste': datas_teste.max(),
+                })
+                if verbose:
+                    print(f"{nome_modelo} | {tipo} | fold {divisao}: RMSE {metricas['RMSE']:.4f} "
+                          f"({tempo_treino:.1f}s)")
+    return pd.DataFrame(linhas)
+
+
+def treinar_melhor_fora_da_memoria(resultados, matrizes, modelos=None, metrica='RMSE',
+                                   tamanho_bloco=TAMANHO_BLOCO, epocas=EPOCAS):
+    """
+    Equivalente a comparacao.treinar_melhor_modelo para os modelos fora da
+    memória: retreina o melhor em todas as linhas da matriz mapeada.
+    Retorna (nome_modelo, tipo, modelo_treinado, metricas_medias).
+    """
+    if modelos is None:
+        modelos = criar_modelos_fora_da_memoria()
+
+    resultados = resultados[resultados['Modelo'].isin(list(modelos))]
+    medias = resultados.groupby(['Modelo', 'Tipo'], sort=False)[['RMSE', 'MAE', 'R2']].mean()
+    nome_modelo, tipo = medias[metrica].idxmax() if metrica == 'R2' else medias[metrica].idxmin()
+
+    X, y, _ = matrizes[tipo]
+    modelo = treinar_em_blocos(clone(modelos[nome_modelo]), X, y, tamanho_bloco=tamanho_bloco, epocas=epocas)
+    return nome_modelo, tipo, modelo, medias.loc[(nome_modelo, tipo)].to_dict()
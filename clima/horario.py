@@ -0,0 +1,140 @@
+"""
+Dados Horários
+Formato compacto dos exports horários do INMET (float32, estação categórica,
+hora como int32 desde 1970) e reamostragem diária vetorizada por reduceat
+"""
+
+import numpy as np
+import pandas as pd
+
+COLUNA_HORA = 'hora_epoca'
+# Os exports horários do INMET vêm em UTC; o dia civil em Brasília começa às 03 UTC
+FUSO_PADRAO = -3
+# Dias com menos horas válidas que isso ficam sem valor na variável
+HORAS_MINIMAS = 18
+
+# Coluna diária -> (coluna horária, redução), na ordem de COLUNAS_INMET
+REGRAS_DIARIAS = {
+    'precipitacao_total': ('precipitacao_total', 'sum'),
+    'pressao_atm_media': ('pressao_atm', 'mean'),
+    'temp_orvalho_media': ('temp_orvalho', 'mean'),
+    'temp_maxima': ('temp_maxima', 'max'),
+    'temp_media': ('temp_ar', 'mean'),
+    'temp_minima': ('temp_minima', 'min'),
+    'umidade_relativa_media': ('umidade_relativa', 'mean'),
+    'umidade_relativa_minima': ('umidade_relativa_minima', 'min'),
+    'umidade_relativa_maxima': ('umidade_relativa_maxima', 'max'),
+    'vento_vel_media': ('vento_vel', 'mean'),
+}
+
+_EPOCA = np.datetime64('1970-01-01T00', 'h')
+
+
+def horas_epoca(datas):
+    """Horas inteiras desde 1970-01-01 (int32 cobre até o ano 246 mil)"""
+    horas = pd.DatetimeIndex(datas).to_numpy().astype('datetime64[h]')
+    return (horas - _EPOCA).astype(np.int32)
+
+
+def datas_horas(horas):
+    """Inverso de horas_epoca"""
+    return pd.DatetimeIndex(_EPOCA + np.asarray(horas, dtype='timedelta64[h]'), name='data')
+
+
+def com_horas(df):
+    """DataFrame horário indexado pela data -> COLUNA_HORA int32 + medições float32 (RangeIndex)"""
+    compacto = df.astype(np.float32).reset_index(drop=True)
+    compacto.insert(0, COLUNA_HORA, horas_epoca(df.index))
+    return compacto
+
+
+def compactar_horario(partes, estacoes=None):
+    """
+    Junta DataFrames horários (um por arquivo) num único DataFrame compacto
+    ordenado por (estacao, hora): 'estacao' categórica, COLUNA_HORA int32 e
+    medições float32. Cada parte é indexada pela data ou já vem de com_horas.
+
+    `partes` é um dict {codigo: df} ou uma lista de (codigo, df).
+    """
+    partes = list(partes.items()) if isinstance(partes, dict) else list(partes)
+    partes = [(codigo, df if COLUNA_HORA in df.columns else com_horas(df)) for codigo, df in partes]
+    categorias = sorted({codigo for codigo, _ in partes}) if estacoes is None else list(estacoes)
+    posicao = {codigo: i for i, codigo in enumerate(categorias)}
+
+    codigos = np.concatenate([np.full(len(df), posicao[codigo], dtype=np.int16) for codigo, df in partes])
+    horas = np.concatenate([df[COLUNA_HORA].to_numpy() for _, df in partes])
+    # ordenação estável: a mesma hora em dois arquivos da estação fica na ordem das partes
+    ordem = np.lexsort((horas, codigos))
+    codigos, horas = codigos[ordem], horas[ordem]
+    # ... e vale a última ocorrência
+    manter = np.r_[(codigos[1:] != codigos[:-1]) | (horas[1:] != horas[:-1]), True]
+    ordem = ordem[manter]
+
+    medicoes = pd.concat([df.drop(columns=COLUNA_HORA) for _, df in partes], ignore_index=True)
+    compacto = medicoes.iloc[ordem].reset_index(drop=True)
+    compacto.insert(0, COLUNA_HORA, horas[manter])
+    compacto.insert(0, 'estacao', pd.Categorical.from_codes(codigos[manter], categories=categorias))
+    return compacto
+
+
+def _reduzir(valores, inicios, reducao):
+    """Redução de cada grupo [inicios[i], inicios[i+1]) ignorando NaN; retorna (resultado, contagem)"""
+    validos = ~np.isnan(valores)
+    contagem = np.add.reduceat(validos.view(np.int8), inicios, dtype=np.int32)
+    if reducao in ('sum', 'mean'):
+        # float32 basta para somar as 24 horas de um dia
+        resultado = np.add.reduceat(np.where(validos, valores, valores.dtype.type(0)), inicios)
+        if reducao == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                resultado = resultado / contagem
+    elif reducao == 'max':
+        resultado = np.fmax.reduceat(valores, inicios)
+    elif reducao == 'min':
+        resultado = np.fmin.reduceat(valores, inicios)
+    else:
+        raise ValueError(f"Redução desconhecida: {reducao!r}")
+    return resultado, contagem
+
+
+def reamostrar_diario(horario, regras=REGRAS_DIARIAS, fuso=FUSO_PADRAO, horas_minimas=HORAS_MINIMAS):
+    """
+    Dados diários com as colunas de `regras` (as de carregar_estacoes)
+    a partir do formato compacto de compactar_horario, sem groupby: as
+    fronteiras (estação, dia) saem de uma diferença sobre os dados já
+    ordenados e cada variável é reduzida com um único ufunc.reduceat.
+
+    Retorna DataFrame indexado por (estacao, data), em float32.
+    """
+    estacoes = horario['estacao']
+    if not isinstance(estacoes.dtype, pd.CategoricalDtype):
+        estacoes = estacoes.astype('category')
+    codigos = estacoes.cat.codes.to_numpy()
+    dias = (horario[COLUNA_HORA].to_numpy(dtype=np.int64) + fuso) // 24
+
+    passo_estacao, passo_dia = np.diff(codigos), np.diff(dias)
+    if not np.all((passo_estacao > 0) | ((passo_estacao == 0) & (passo_dia >= 0))):
+        raise ValueError("Os dados horários precisam estar ordenados por (estacao, hora)")
+
+    if not len(dias):
+        indice = pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=['estacao', 'data'])
+        return pd.DataFrame(index=indice, columns=list(regras), dtype=np.float32)
+
+    mudou = np.r_[True, (codigos[1:] != codigos[:-1]) | (dias[1:] != dias[:-1])]
+    inicios = np.flatnonzero(mudou)
+
+    colunas = {}
+    for coluna_diaria, (coluna_horaria, reducao) in regras.items():
+        if coluna_horaria not in horario.columns:
+            colunas[coluna_diaria] = np.full(len(inicios), np.nan, dtype=np.float32)
+            continue
+        valores = horario[coluna_horaria].to_numpy()
+        if valores.dtype.kind != 'f':
+            valores = valores.astype(np.float32)
+        resultado, contagem = _reduzir(valores, inicios, reducao)
+        colunas[coluna_diaria] = np.where(contagem >= max(horas_minimas, 1), resultado, np.nan).astype(np.float32)
+
+    indice = pd.MultiIndex.from_arrays(
+        [estacoes.cat.categories[codigos[inicios]], pd.DatetimeIndex(dias[inicios].astype('datetime64[D]'), name='data')],
+        names=['estacao', 'data'],
+    )
+    return pd.DataFrame(colunas, index=indice)
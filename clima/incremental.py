@@ -0,0 +1,448 @@
+"""
+Pipeline Incremental
+Ingestão diária por marca d'água: só os bytes novos de cada export são lidos,
+as linhas novas ganham lags e janelas móveis a partir da cauda do histórico e
+são anexadas ao armazenamento colunar como uma nova parte. O retreino
+completo fica para o agendamento ou para quando o erro recente passa do limiar
+"""
+
+import io
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .features import (
+    JANELAS_PADRAO,
+    LAGS_PADRAO,
+    VARIAVEIS_LAG,
+    criar_lag_features,
+    estender_features_temporais,
+    features_temporais,
+)
+from .horario import COLUNA_HORA, FUSO_PADRAO, com_horas
+from .ingestao import (
+    COLUNAS_SEM_INTERPOLACAO,
+    DIRETORIO_CACHE,
+    LINHAS_METADADOS,
+    _eh_horario,
+    _opcoes_leitura,
+    _preparar_dados,
+    carregar_estacoes,
+    diarios_de_horario,
+    escrever_cache,
+    interpolar_no_tempo,
+    ler_cache,
+    ler_metadados_inmet,
+    listar_arquivos_inmet,
+)
+
+VERSAO_INCREMENTAL = '3'
+ARQUIVO_ESTADO = 'estado.json'
+ARQUIVO_CAUDA = 'cauda.arrow'
+DIRETORIO_PARTES = 'partes'
+MAX_PARTES = 30
+# Linhas de histórico por estação necessárias para estender lags e janelas móveis
+LINHAS_CAUDA = max(max(LAGS_PADRAO), max(JANELAS_PADRAO) - 1)
+_BYTES_FIM = 4096
+
+
+def diretorio_incremental(origem, diretorio=None):
+    """Diretório do armazenamento incremental (padrão: .cache/incremental ao lado dos exports)"""
+    if diretorio is not None:
+        return Path(diretorio)
+    base = Path(listar_arquivos_inmet(origem)[0]).parent
+    return base / DIRETORIO_CACHE / 'incremental'
+
+
+def ler_estado(diretorio):
+    """Estado gravado (marcas d'água, partes, drift), ou None se não houver armazenamento"""
+    caminho = Path(diretorio) / ARQUIVO_ESTADO
+    if not caminho.exists():
+        return None
+    with open(caminho, encoding='utf-8') as arquivo:
+        estado = json.load(arquivo)
+    return estado if estado.get('versao') == VERSAO_INCREMENTAL else None
+
+
+def gravar_estado(diretorio, estado):
+    """Grava o estado com escrita atômica (é ele que decide quais partes valem)"""
+    caminho = Path(diretorio) / ARQUIVO_ESTADO
+    temporario = caminho.with_suffix(f'.{os.getpid()}.tmp')
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(estado, arquivo, ensure_ascii=False, indent=2, default=str)
+    os.replace(temporario, caminho)
+
+
+def _ultima_linha(caminho, tamanho):
+    """Última linha (com a quebra) dos primeiros `tamanho` bytes do arquivo"""
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(max(tamanho - _BYTES_FIM, 0))
+        fim = arquivo.read(tamanho - arquivo.tell())
+    linhas = fim.splitlines(keepends=True)
+    return linhas[-1].decode('latin1') if linhas else ''
+
+
+def _marca_arquivo(caminho, estacao, tamanho=None):
+    """Marca d'água do arquivo: bytes já lidos e a última linha lida (para detectar reescritas)"""
+    tamanho = os.stat(caminho).st_size if tamanho is None else tamanho
+    return {'estacao': estacao, 'bytes': tamanho, 'ultima_linha': _ultima_linha(caminho, tamanho)}
+
+
+def _bytes_novos(caminho, marca):
+    """
+    Linhas completas acrescentadas ao arquivo desde a marca, ou None se o
+    arquivo foi reescrito (menor, ou com a última linha conhecida alterada).
+    Uma linha ainda sem quebra no fim fica para a próxima leitura.
+    """
+    tamanho = os.stat(caminho).st_size
+    ultima = marca['ultima_linha'].encode('latin1')
+    if tamanho < marca['bytes']:
+        return None
+    with open(caminho, 'rb') as arquivo:
+        arquivo.seek(marca['bytes'] - len(ultima))
+        if arquivo.read(len(ultima)) != ultima:
+            return None
+        conteudo = arquivo.read()
+    return conteudo[:conteudo.rfind(b'\n') + 1]
+
+
+def _ler_linhas(conteudo, metadados):
+    """Linhas de dados (bytes, sem cabeçalho) do export em float32 indexadas pela data"""
+    opcoes = {**_opcoes_leitura(metadados), 'skiprows': 0}
+    if conteudo.strip():
+        bruto = pd.read_csv(io.StringIO(conteudo.decode(opcoes.pop('encoding'))), **opcoes)
+    else:
+        bruto = pd.DataFrame(columns=opcoes['names'])
+    return _preparar_dados(bruto, _eh_horario(metadados))
+
+
+def _linhas_novas(caminho, marca):
+    """(linhas novas do export diário em float32 indexadas pela data, nova marca), ou None se ele foi reescrito"""
+    conteudo = _bytes_novos(caminho, marca)
+    if conteudo is None:
+        return None
+    nova_marca = _marca_arquivo(caminho, marca['estacao'], marca['bytes'] + len(conteudo))
+    return _ler_linhas(conteudo, ler_metadados_inmet(caminho)), nova_marca
+
+
+def _linhas_horarias(caminho, marca):
+    """
+    Linhas completas do export horário desde a marca (sem marca, desde o
+    início dos dados): (byte inicial, linhas em com_horas, byte final de cada
+    linha), ou None se o arquivo foi reescrito
+    """
+    if marca is None:
+        with open(caminho, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        inicio = 0
+        for _ in range(LINHAS_METADADOS):
+            inicio = conteudo.find(b'\n', inicio) + 1 or len(conteudo)
+        conteudo = conteudo[inicio:conteudo.rfind(b'\n') + 1]
+    else:
+        conteudo = _bytes_novos(caminho, marca)
+        if conteudo is None:
+            return None
+        inicio = marca['bytes']
+
+    # read_csv pula as linhas em branco: o fim de cada linha lida vem só das preenchidas
+    linhas = conteudo.splitlines(keepends=True)
+    fins = inicio + np.cumsum([len(linha) for linha in linhas], dtype=np.int64)
+    fins = fins[[bool(linha.strip()) for linha in linhas]] if linhas else fins
+    return inicio, com_horas(_ler_linhas(conteudo, ler_metadados_inmet(caminho))), fins
+
+
+def _dias_completos(lidos):
+    """
+    Dias locais das linhas horárias lidas, reamostrados por estação
+    (diarios_de_horario, sem interpolação), e a nova marca de cada arquivo.
+
+    O último dia local de cada estação fica retido enquanto a sua última hora
+    não chega: a marca para no começo dele e as suas linhas são relidas na
+    próxima atualização (inclusive quando o resto do dia vem no export do
+    ano seguinte). Um dia gravado nunca é revisto, então não pode ser parcial.
+
+    `lidos`: lista de (caminho, estacao, byte inicial, linhas, fins) de _linhas_horarias.
+    Retorna ({estacao: DataFrame diário}, {chave do arquivo: marca}).
+    """
+    retido = {}
+    for _, estacao, _, linhas, _ in lidos:
+        if len(linhas):
+            retido[estacao] = max(retido.get(estacao, -np.inf), int(linhas[COLUNA_HORA].max()) + FUSO_PADRAO)
+    # hora local 23 fecha o dia; antes dela, o dia da última hora fica retido
+    retido = {estacao: hora // 24 if hora % 24 != 23 else np.inf for estacao, hora in retido.items()}
+
+    partes, marcas = [], {}
+    for caminho, estacao, inicio, linhas, fins in lidos:
+        # linhas em ordem cronológica: as do dia retido estão no fim do arquivo
+        dias = (linhas[COLUNA_HORA].to_numpy(dtype=np.int64) + FUSO_PADRAO) // 24
+        completas = int(np.count_nonzero(dias < retido.get(estacao, np.inf)))
+        if completas:
+            partes.append((estacao, linhas.iloc[:completas]))
+        fim = int(fins[completas - 1]) if completas else inicio
+        marcas[str(Path(caminho).resolve())] = _marca_arquivo(caminho, estacao, fim)
+
+    diarios = dict(diarios_de_horario(partes, interpolar=False)) if partes else {}
+    return diarios, marcas
+
+
+def calcular_features(dados):
+    """Lags (sem descartar linhas) e janelas móveis de um DataFrame longo ordenado por (estacao, data)"""
+    com_lags = criar_lag_features(dados, grupo='estacao', dropna=False)
+    return pd.concat([com_lags, features_temporais(com_lags, grupo='estacao')], axis=1)
+
+
+def _cauda(df):
+    return df.groupby('estacao', sort=False).tail(LINHAS_CAUDA).reset_index(drop=True)
+
+
+def _caminho_parte(diretorio, numero):
+    return Path(diretorio) / DIRETORIO_PARTES / f'{numero:05d}.arrow'
+
+
+def _anexar_parte(diretorio, estado, df):
+    """Grava df como uma parte nova (numerada acima de qualquer arquivo já existente) e a lista no estado"""
+    existentes = [int(parte.stem) for parte in (Path(diretorio) / DIRETORIO_PARTES).glob('*.arrow')]
+    numero = max(existentes + estado['partes'], default=-1) + 1
+    escrever_cache(df.reset_index(drop=True), _caminho_parte(diretorio, numero),
+                   {'versao': VERSAO_INCREMENTAL, 'linhas': str(len(df))})
+    estado['partes'].append(numero)
+
+
+def ler_armazenamento(diretorio, estado=None):
+    """Todas as linhas do armazenamento (partes listadas no estado), ordenadas por (estacao, data)"""
+    estado = estado or ler_estado(diretorio)
+    if estado is None:
+        raise FileNotFoundError(f"Nenhum armazenamento incremental em {diretorio}")
+    partes = [ler_cache(_caminho_parte(diretorio, numero)).reset_index(drop=True) for numero in estado['partes']]
+    dados = pd.concat(partes, ignore_index=True)
+    return dados.sort_values(['estacao', 'data'], kind='stable', ignore_index=True)
+
+
+def compactar(diretorio, estado):
+    """Junta todas as partes numa só (chamado quando passam de MAX_PARTES)"""
+    dados = ler_armazenamento(diretorio, estado)
+    antigas = list(estado['partes'])
+    estado['partes'] = []
+    _anexar_parte(diretorio, estado, dados)
+    gravar_estado(diretorio, estado)
+    for numero in antigas:
+        _caminho_parte(diretorio, numero).unlink(missing_ok=True)
+
+
+def construir_armazenamento(origem, diretorio=None):
+    """Carga completa: lê todos os exports, calcula as features e grava a primeira parte"""
+    diretorio = diretorio_incremental(origem, diretorio)
+    arquivos = [(caminho, ler_metadados_inmet(caminho)) for caminho in listar_arquivos_inmet(origem)]
+    diarios = [(caminho, metadados['estacao']) for caminho, metadados in arquivos if not _eh_horario(metadados)]
+    horarios = [(caminho, metadados['estacao']) for caminho, metadados in arquivos if _eh_horario(metadados)]
+
+    # marcas antes da leitura: o que for anexado no meio é relido (e deduplicado pela data) depois
+    marcas = {str(Path(caminho).resolve()): _marca_arquivo(caminho, estacao) for caminho, estacao in diarios}
+    partes = [carregar_estacoes([caminho for caminho, _ in diarios])[0]] if diarios else []
+    if horarios:
+        # horários pelo mesmo caminho da atualização: a marca para no começo do dia local ainda parcial
+        dias, marcas_horarios = _dias_completos(
+            [(caminho, estacao, *_linhas_horarias(caminho, None)) for caminho, estacao in horarios])
+        marcas.update(marcas_horarios)
+        if dias:
+            partes.append(pd.concat([interpolar_no_tempo(df, COLUNAS_SEM_INTERPOLACAO) for df in dias.values()],
+                                    keys=list(dias), names=['estacao', 'data']))
+    dados = pd.concat(partes)
+    dados = dados[~dados.index.duplicated(keep='last')].sort_index()
+    dados = calcular_features(dados.reset_index())
+
+    # as partes antigas só somem depois que o estado novo estiver gravado;
+    # agendamento e drift do modelo sobrevivem à reconstrução
+    antigas = list((Path(diretorio) / DIRETORIO_PARTES).glob('*.arrow'))
+    anterior = ler_estado(diretorio) or {}
+    estado = {
+        'versao': VERSAO_INCREMENTAL,
+        'origem': str(origem),
+        # as falhas são sempre interpoladas no tempo (carga completa e extensões)
+        'interpolacao': True,
+        'partes': [],
+        'arquivos': marcas,
+        'construido_em': datetime.now().isoformat(timespec='seconds'),
+        'ultimo_retreino': anterior.get('ultimo_retreino'),
+        'drift': anterior.get('drift', {}),
+    }
+    _anexar_parte(diretorio, estado, dados)
+    escrever_cache(_cauda(dados), Path(diretorio) / ARQUIVO_CAUDA, {'versao': VERSAO_INCREMENTAL})
+    gravar_estado(diretorio, estado)
+    for antiga in antigas:
+        antiga.unlink(missing_ok=True)
+    return dados, estado
+
+
+def _estender_estacao(cauda, novos, estacao, exceto=()):
+    """
+    Features das linhas novas de uma estação a partir da cauda do seu histórico
+    (`exceto`: colunas não interpoladas, as de COLUNAS_SEM_INTERPOLACAO nos dias
+    reamostrados de exports horários)
+    """
+    if len(cauda):
+        novos = novos[novos.index > cauda['data'].iloc[-1]]
+    if not len(novos):
+        return None
+
+    # interpolação ancorada no último valor conhecido (valores já gravados não são revistos)
+    brutos = novos.columns.tolist()
+    if len(cauda):
+        ancora = cauda[['data'] + brutos].set_index('data').astype(np.float32)
+        novos = interpolar_no_tempo(pd.concat([ancora.iloc[-1:], novos]), exceto).iloc[1:]
+    else:
+        novos = interpolar_no_tempo(novos, exceto)
+    novos = novos.reset_index()
+    novos.insert(0, 'estacao', estacao)
+
+    # lags: a cauda fornece o histórico; janelas e médias exponenciais continuam do estado da cauda
+    colunas_lag = [coluna for coluna in cauda.columns if '_lag' in coluna]
+    bloco = criar_lag_features(pd.concat([cauda[['estacao', 'data'] + brutos], novos], ignore_index=True),
+                               grupo='estacao', dropna=False)
+    novos = bloco.iloc[len(cauda):].reset_index(drop=True)
+    if not len(cauda):
+        return calcular_features(novos.drop(columns=colunas_lag, errors='ignore'))[cauda.columns]
+    estendido = estender_features_temporais(cauda, novos[['estacao', 'data'] + brutos + colunas_lag], grupo='estacao')
+    return estendido.iloc[len(cauda):].reset_index(drop=True)
+
+
+def atualizar(origem, diretorio=None, reconstruir=False):
+    """
+    Anexa ao armazenamento as linhas novas de cada export desde a última
+    marca d'água. Faz a carga completa quando não há armazenamento, quando
+    `reconstruir=True` ou quando algum export foi reescrito (não só anexado).
+
+    Retorna (linhas novas com features, estado, reconstruido).
+    """
+    diretorio = diretorio_incremental(origem, diretorio)
+    estado = None if reconstruir else ler_estado(diretorio)
+    if estado is None:
+        dados, estado = construir_armazenamento(origem, diretorio)
+        return dados, estado, True
+
+    cauda = ler_cache(Path(diretorio) / ARQUIVO_CAUDA).reset_index(drop=True)
+    novos_por_estacao = {}
+    marcas = {}
+    horarios = []
+    for caminho in listar_arquivos_inmet(origem):
+        chave = str(Path(caminho).resolve())
+        marca = estado['arquivos'].get(chave)
+        metadados = ler_metadados_inmet(caminho)
+        estacao = marca['estacao'] if marca else metadados['estacao']
+        if _eh_horario(metadados):
+            # horários: reamostrados por estação depois de ler todos os arquivos
+            lido = _linhas_horarias(caminho, marca)
+            if lido is not None:
+                horarios.append((caminho, estacao, *lido))
+        elif marca is None:
+            # export novo (outra estação ou outro período): lido por inteiro
+            marcas[chave] = _marca_arquivo(caminho, estacao)
+            lido = carregar_estacoes(caminho, n_processos=1)[0].loc[estacao]
+            novos_por_estacao.setdefault(estacao, []).append(lido)
+        else:
+            lido = _linhas_novas(caminho, marca)
+            if lido is not None:
+                novos, marcas[chave] = lido
+                novos_por_estacao.setdefault(estacao, []).append(novos)
+        if lido is None:
+            print(f"Aviso: {caminho} foi reescrito; reconstruindo o armazenamento")
+            dados, estado = construir_armazenamento(origem, diretorio)
+            return dados, estado, True
+
+    dias = {}
+    if horarios:
+        dias, marcas_horarios = _dias_completos(horarios)
+        marcas.update(marcas_horarios)
+        for estacao, novos in dias.items():
+            novos_por_estacao.setdefault(estacao, []).append(novos)
+
+    partes = []
+    for estacao, blocos in novos_por_estacao.items():
+        novos = pd.concat(blocos).sort_index()
+        novos = novos[~novos.index.duplicated(keep='last')]
+        exceto = COLUNAS_SEM_INTERPOLACAO if estacao in dias else ()
+        estendido = _estender_estacao(cauda[cauda['estacao'] == estacao].reset_index(drop=True), novos, estacao,
+                                      exceto)
+        if estendido is not None:
+            partes.append(estendido)
+
+    novas = pd.concat(partes, ignore_index=True) if partes else cauda.iloc[:0]
+    if len(novas):
+        _anexar_parte(diretorio, estado, novas)
+        cauda = _cauda(pd.concat([cauda, novas], ignore_index=True)
+                       .sort_values(['estacao', 'data'], kind='stable'))
+        escrever_cache(cauda, Path(diretorio) / ARQUIVO_CAUDA, {'versao': VERSAO_INCREMENTAL})
+    estado['arquivos'].update(marcas)
+    estado['atualizado_em'] = datetime.now().isoformat(timespec='seconds')
+    gravar_estado(diretorio, estado)
+
+    if len(estado['partes']) > MAX_PARTES:
+        compactar(diretorio, estado)
+    return novas, estado, False
+
+
+def anexar_csv(caminho_csv, novas, estacao=None):
+    """
+    Acrescenta as linhas novas a um CSV derivado (ex.: dados_climaticos_com_lags.csv)
+    nas colunas do seu cabeçalho. Linhas sem alguma dessas colunas são
+    descartadas, como na geração original. Retorna as linhas gravadas.
+    """
+    colunas = pd.read_csv(caminho_csv, nrows=0).columns.tolist()
+    if estacao is not None:
+        novas = novas[novas['estacao'] == estacao]
+    novas = novas[colunas].dropna()
+    if len(novas):
+        saida = novas.copy()
+        if 'data' in saida.columns:
+            saida['data'] = pd.to_datetime(saida['data']).dt.strftime('%Y-%m-%d')
+        with open(caminho_csv, 'a', encoding='utf-8', newline='') as arquivo:
+            saida.to_csv(arquivo, header=False, index=False, float_format='%.6g')
+    return novas
+
+
+def registrar_erros(estado, modelo, novas):
+    """
+    Acumula no estado o erro quadrático do modelo registrado nas linhas
+    novas com alvo conhecido. Zera o acumulado quando a versão muda.
+    """
+    alvo = modelo.metadados.get('target', 'temp_media')
+    validas = novas.dropna(subset=list(modelo.features) + [alvo])
+    drift = estado['drift'].get(modelo.nome)
+    if drift is None or drift['versao'] != modelo.versao:
+        drift = {'versao': modelo.versao, 'n': 0, 'soma_quadrados': 0.0,
+                 'rmse_referencia': modelo.metadados.get('metricas', {}).get('RMSE')}
+    if len(validas):
+        erros = modelo.predict(validas) - validas[alvo].to_numpy()
+        drift['n'] += int(len(validas))
+        drift['soma_quadrados'] += float(np.sum(erros ** 2))
+    estado['drift'][modelo.nome] = drift
+    return drift
+
+
+def precisa_retreinar(estado, nome_modelo=None, intervalo_dias=30, limiar_drift=0.25,
+                      minimo_amostras=14, agora=None):
+    """
+    (decisão, motivo): retreina quando o último retreino passou de
+    `intervalo_dias` ou quando o RMSE das linhas novas supera o RMSE de
+    referência do modelo em mais de `limiar_drift` (com ao menos `minimo_amostras`).
+    """
+    agora = agora or datetime.now()
+    ultimo = estado.get('ultimo_retreino') or estado.get('construido_em')
+    if ultimo and (agora - datetime.fromisoformat(ultimo)).days >= intervalo_dias:
+        return True, f'agendado (último retreino em {ultimo[:10]})'
+
+    drift = estado['drift'].get(nome_modelo) if nome_modelo else None
+    if drift and drift['n'] >= minimo_amostras and drift.get('rmse_referencia'):
+        rmse = float(np.sqrt(drift['soma_quadrados'] / drift['n']))
+        if rmse > (1 + limiar_drift) * drift['rmse_referencia']:
+            return True, f"drift (RMSE recente {rmse:.3f} vs {drift['rmse_referencia']:.3f} no treino)"
+    return False, None
+
+
+def marcar_retreino(estado, agora=None):
+    estado['ultimo_retreino'] = (agora or datetime.now()).isoformat(timespec='seconds')
+    estado['drift'] = {}
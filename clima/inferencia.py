@@ -0,0 +1,200 @@
+"""
+Inferência em Lote
+Previsões de um modelo registrado sobre CSVs do INMET lidos em blocos
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .features import FORMATO_NOME_LAG, criar_lag_features
+from .ingestao import (
+    _eh_horario,
+    caminho_cache,
+    carregar_estacoes,
+    ler_cache_em_blocos,
+    ler_csv_inmet_em_blocos,
+    ler_metadados_inmet,
+    listar_arquivos_inmet,
+)
+from .registro import obter_modelo
+
+TAMANHO_BLOCO = 50_000
+
+
+def blocos_inmet(caminho_csv, tamanho_bloco=TAMANHO_BLOCO, usar_cache=True, interpolar=True):
+    """
+    Blocos de dados diários de um export do INMET: fatias do cache colunar
+    quando ele está válido, senão leitura do CSV em blocos. Com
+    interpolar=False as falhas ficam NaN (cache e leitura sem interpolação).
+    Exports horários são reamostrados para o dia (ver blocos_estacao).
+    """
+    if _eh_horario(ler_metadados_inmet(caminho_csv)):
+        return blocos_estacao([caminho_csv], tamanho_bloco, usar_cache, interpolar)
+    if usar_cache:
+        blocos = ler_cache_em_blocos(caminho_cache(caminho_csv, interpolar=interpolar), caminho_csv, tamanho_bloco)
+        if blocos is not None:
+            return blocos
+    return ler_csv_inmet_em_blocos(caminho_csv, tamanho_bloco, interpolar)
+
+
+def blocos_estacao(arquivos, tamanho_bloco=TAMANHO_BLOCO, usar_cache=True, interpolar=True):
+    """
+    Blocos diários de todos os exports de uma estação, em ordem de data e sem
+    datas repetidas, para os lags atravessarem a fronteira entre arquivos.
+
+    Os diários são lidos em blocos, arquivo a arquivo. Os horários são
+    reamostrados juntos (carregar_estacoes), porque o dia da virada de ano
+    tem horas nos dois arquivos; a memória é a do histórico diário da estação.
+    """
+    horarios = [arquivo for arquivo in arquivos if _eh_horario(ler_metadados_inmet(arquivo))]
+    diarios = [arquivo for arquivo in arquivos if arquivo not in horarios]
+    ultima = None
+
+    fontes = [blocos_inmet(arquivo, tamanho_bloco, usar_cache, interpolar) for arquivo in diarios]
+    if horarios:
+        dados = carregar_estacoes(horarios, n_processos=1, usar_cache=usar_cache, interpolar=interpolar)[0]
+        dados = dados.droplevel('estacao')
+        fontes.append(dados.iloc[inicio:inicio + tamanho_bloco] for inicio in range(0, len(dados), tamanho_bloco))
+
+    for blocos in fontes:
+        for bloco in blocos:
+            if ultima is not None:
+                bloco = bloco[bloco.index > ultima]
+            if len(bloco):
+                ultima = bloco.index[-1]
+                yield bloco
+
+
+def montar_features(modelo, dados, grupo=None):
+    """
+    Acrescenta a `dados` as lag features que o modelo registrado espera
+    (sem cruzar grupos, ex.: estações) e descarta linhas sem features completas.
+    """
+    lags = modelo.metadados.get('lags')
+    if lags:
+        dados = criar_lag_features(
+            dados, variaveis=lags['variaveis'], lags=lags['lags'],
+            formato=lags.get('formato', FORMATO_NOME_LAG), grupo=grupo, dropna=False
+        )
+    return dados.dropna(subset=modelo.features)
+
+
+def prever_em_blocos(modelo, blocos, estacao=None):
+    """
+    Aplica o modelo registrado a cada bloco e gera DataFrames de previsões.
+
+    As lag features são montadas com a cauda do bloco anterior, então a
+    fronteira entre blocos não perde histórico. Em modelos treinados com
+    dados interpolados, linhas sem features completas recebem previsão NaN;
+    os treinados sem interpolação (metadado 'interpolacao' falso) tratam as
+    falhas sozinhos (imputação ou NaN nativo) e preveem todas as linhas.
+    """
+    lags = modelo.metadados.get('lags')
+    exigir_completas = modelo.metadados.get('interpolacao', True)
+    target = modelo.metadados.get('target', 'temp_media')
+    lag_max = max(lags['lags']) if lags else 0
+    cauda = None
+
+    for bloco in blocos:
+        if lags:
+            completo = pd.concat([cauda, bloco]) if cauda is not None else bloco
+            inicio = len(completo) - len(bloco)
+            features = criar_lag_features(
+                completo, variaveis=lags['variaveis'], lags=lags['lags'],
+                formato=lags.get('formato', FORMATO_NOME_LAG), dropna=False
+            ).iloc[inicio:]
+            cauda = completo.iloc[len(completo) - lag_max:]
+        else:
+            features = bloco
+
+        X = features[modelo.features]
+        completas = X.notna().all(axis=1).to_numpy() if exigir_completas else np.ones(len(X), dtype=bool)
+        previsao = np.full(len(X), np.nan, dtype=np.float32)
+        if completas.any():
+            previsao[completas] = modelo.predict(X[completas])
+
+        resultado = pd.DataFrame({'data': bloco.index, f'previsao_{target}': previsao})
+        if target in bloco.columns:
+            resultado[target] = bloco[target].to_numpy()
+        if estacao is not None:
+            resultado.insert(0, 'estacao', estacao)
+        yield resultado
+
+
+class _EscritorPrevisoes:
+    """Grava blocos de previsões em Parquet (ParquetWriter) ou CSV, em modo incremental"""
+
+    def __init__(self, destino):
+        self.destino = Path(destino)
+        self.parquet = self.destino.suffix.lower() == '.parquet'
+        self._escritor = None
+        self._cabecalho = True
+        self.destino.parent.mkdir(parents=True, exist_ok=True)
+        if not self.parquet and self.destino.exists():
+            self.destino.unlink()
+
+    def escrever(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            tabela = pa.Table.from_pandas(df, preserve_index=False)
+            if self._escritor is None:
+                self._escritor = pq.ParquetWriter(str(self.destino), tabela.schema)
+            self._escritor.write_table(tabela)
+        else:
+            df.to_csv(self.destino, mode='a', header=self._cabecalho, index=False)
+            self._cabecalho = False
+
+    def fechar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+
+
+def prever_arquivos(origem, nome_modelo, destino, versao=None, tamanho_bloco=TAMANHO_BLOCO,
+                    usar_cache=True, verbose=True):
+    """
+    Gera previsões para um CSV, diretório ou glob de exports do INMET.
+
+    Os arquivos são agrupados por estação (em ordem de período) e lidos em
+    blocos de `tamanho_bloco` linhas, então os lags continuam de um arquivo
+    para o seguinte. As previsões são gravadas incrementalmente em `destino`
+    (.parquet ou .csv), com memória limitada a um bloco (exports horários:
+    ver blocos_estacao). Os dados são interpolados ou não conforme o modelo
+    foi treinado (metadado 'interpolacao'). Retorna estatísticas de vazão.
+    """
+    modelo = obter_modelo(nome_modelo, versao)
+    interpolar = modelo.metadados.get('interpolacao', True)
+    escritor = _EscritorPrevisoes(destino)
+    total_linhas = 0
+    inicio = time.perf_counter()
+
+    por_estacao = {}
+    for caminho_csv in listar_arquivos_inmet(origem):
+        metadados = ler_metadados_inmet(caminho_csv)
+        por_estacao.setdefault(metadados.get('estacao'), []).append((metadados.get('data_inicial') or '', caminho_csv))
+
+    try:
+        for estacao, arquivos in por_estacao.items():
+            blocos = blocos_estacao([caminho for _, caminho in sorted(arquivos)], tamanho_bloco, usar_cache, interpolar)
+            for previsoes in prever_em_blocos(modelo, blocos, estacao):
+                escritor.escrever(previsoes)
+                total_linhas += len(previsoes)
+                if verbose:
+                    decorrido = time.perf_counter() - inicio
+                    print(f"{estacao}: {total_linhas:,} linhas ({total_linhas / decorrido:,.0f} linhas/s)")
+    finally:
+        escritor.fechar()
+
+    duracao = time.perf_counter() - inicio
+    return {
+        'linhas': total_linhas,
+        'segundos': duracao,
+        'linhas_por_segundo': total_linhas / duracao if duracao > 0 else float('nan'),
+        'modelo': modelo.nome,
+        'versao': modelo.versao,
+        'destino': str(destino),
+    }
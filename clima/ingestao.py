@@ -0,0 +1,486 @@
+"""
+Ingestão dos Dados INMET
+Leitura dos CSVs das estações (diários ou horários) com cache colunar (Arrow)
+memory-mapped e carga paralela de várias estações
+"""
+
+import glob
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .horario import com_horas, compactar_horario, reamostrar_diario
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # cache desativado, leitura direta do CSV
+    pa = None
+
+# Colunas do export diário do INMET (após as 11 linhas de metadados)
+COLUNAS_INMET = [
+    'data', 'precipitacao_total', 'pressao_atm_media',
+    'temp_orvalho_media', 'temp_maxima', 'temp_media',
+    'temp_minima', 'umidade_relativa_media',
+    'umidade_relativa_minima', 'umidade_relativa_maxima',
+    'vento_vel_media'
+]
+
+# Colunas do export horário do INMET (data e hora vêm em colunas separadas)
+COLUNAS_INMET_HORARIO = [
+    'data', 'hora', 'precipitacao_total', 'pressao_atm',
+    'pressao_atm_maxima', 'pressao_atm_minima', 'radiacao_global',
+    'temp_ar', 'temp_orvalho', 'temp_maxima', 'temp_minima',
+    'temp_orvalho_maxima', 'temp_orvalho_minima',
+    'umidade_relativa_maxima', 'umidade_relativa_minima',
+    'umidade_relativa', 'vento_direcao', 'vento_rajada_maxima',
+    'vento_vel'
+]
+
+# Rótulos do cabeçalho de metadados -> campos da tabela de estações
+CAMPOS_METADADOS = {
+    'Nome': 'nome',
+    'Codigo Estacao': 'estacao',
+    'Latitude': 'latitude',
+    'Longitude': 'longitude',
+    'Altitude': 'altitude',
+    'Situacao': 'situacao',
+    'Data Inicial': 'data_inicial',
+    'Data Final': 'data_final',
+    'Periodicidade da Medicao': 'periodicidade',
+}
+
+LINHAS_METADADOS = 11
+DIRETORIO_CACHE = '.cache'
+VERSAO_CACHE = '3'
+# Na reamostragem horário -> diário, a chuva dos dias sem horas suficientes
+# não é estimada a partir dos dias vizinhos
+COLUNAS_SEM_INTERPOLACAO = ['precipitacao_total']
+
+_TAMANHO_BLOCO_HASH = 1 << 20
+
+
+def ler_metadados_inmet(caminho_csv):
+    """
+    Lê o cabeçalho de metadados do CSV do INMET (nome, código, coordenadas,
+    período e periodicidade da estação).
+    """
+    metadados = {}
+    with open(caminho_csv, encoding='latin1') as arquivo:
+        linhas = [linha for _, linha in zip(range(LINHAS_METADADOS - 1), arquivo)]
+
+    # Os exports completam as linhas de metadados com separadores vazios
+    separador = ';' if linhas and ';' in linhas[0] else ','
+    for linha in linhas:
+        rotulo, _, valor = linha.partition(':')
+        campo = CAMPOS_METADADOS.get(rotulo.strip())
+        if campo is not None:
+            metadados[campo] = valor.split(separador)[0].strip()
+
+    for campo in ('latitude', 'longitude', 'altitude'):
+        valor = metadados.get(campo)
+        if isinstance(valor, str):
+            valor = valor.replace(',', '.')
+        metadados[campo] = pd.to_numeric(valor, errors='coerce')
+    metadados['separador'] = separador
+    metadados['arquivo'] = str(caminho_csv)
+    return metadados
+
+
+def _eh_horario(metadados):
+    """Indica se o export é horário a partir da periodicidade informada"""
+    return metadados.get('periodicidade', '').lower().startswith('hor')
+
+
+def _opcoes_leitura(metadados):
+    """Argumentos do read_csv para o formato (diário/horário, separador) do arquivo"""
+    colunas = COLUNAS_INMET_HORARIO if _eh_horario(metadados) else COLUNAS_INMET
+    return dict(
+        sep=metadados['separador'],
+        decimal=',' if metadados['separador'] == ';' else '.',
+        encoding='latin1',
+        skiprows=LINHAS_METADADOS,
+        header=None,
+        names=colunas,
+        usecols=range(len(colunas)),
+        na_values=['null']
+    )
+
+
+def _preparar_dados(df, horario):
+    """Monta o índice de datas e converte as medições para float32"""
+    # Hora no formato HHMM (ex.: 0000, 1300)
+    data = pd.to_datetime(df.pop('data'))
+    if horario:
+        hora = pd.to_numeric(df.pop('hora').astype(str).str[:4], errors='coerce') // 100
+        data = data + pd.to_timedelta(hora, unit='h')
+    df.index = pd.DatetimeIndex(data, name='data')
+
+    # Conversão numérica de todas as colunas de uma vez
+    return df.apply(pd.to_numeric, errors='coerce').astype(np.float32)
+
+
+def interpolar_no_tempo(df, exceto=(), **opcoes):
+    """interpolate(method='time') em todas as colunas, menos as de `exceto`"""
+    colunas = [coluna for coluna in df.columns if coluna not in exceto]
+    resultado = df.copy()
+    resultado[colunas] = df[colunas].interpolate(method='time', **opcoes)
+    return resultado
+
+
+def ler_csv_inmet(caminho_csv, interpolar=True):
+    """
+    Lê o CSV do INMET, converte as colunas para float32 e interpola no tempo
+    (com interpolar=False as falhas ficam NaN, para modelos que as tratam).
+    Retorna um DataFrame indexado pela data (data e hora nos exports horários).
+    """
+    metadados = ler_metadados_inmet(caminho_csv)
+    df = pd.read_csv(caminho_csv, **_opcoes_leitura(metadados))
+    df = _preparar_dados(df, _eh_horario(metadados))
+    return interpolar_no_tempo(df) if interpolar else df
+
+
+def ler_csv_inmet_em_blocos(caminho_csv, tamanho_bloco, interpolar=True):
+    """
+    Lê o CSV do INMET em blocos de até `tamanho_bloco` linhas, com o mesmo
+    tratamento de ler_csv_inmet e memória limitada ao bloco.
+
+    A interpolação no tempo é local: linhas finais com falhas ficam retidas
+    até o próximo bloco trazer um valor válido, e a última linha emitida
+    serve de âncora, então o resultado é igual ao da leitura completa
+    (exceto em falhas mais longas que um bloco).
+    """
+    metadados = ler_metadados_inmet(caminho_csv)
+    horario = _eh_horario(metadados)
+    ancora = None
+    pendentes = None
+
+    with pd.read_csv(caminho_csv, chunksize=tamanho_bloco, **_opcoes_leitura(metadados)) as leitor:
+        for bruto in leitor:
+            bloco = _preparar_dados(bruto, horario)
+            if not interpolar:
+                yield bloco
+                continue
+            partes = [parte for parte in (ancora, pendentes, bloco) if parte is not None]
+            bloco = pd.concat(partes) if len(partes) > 1 else bloco
+            inicio = len(ancora) if ancora is not None else 0
+            bloco = interpolar_no_tempo(bloco, limit_area='inside')
+
+            # Retém as linhas após o último valor válido de alguma coluna
+            # (no máximo um bloco, para a memória continuar limitada)
+            validos = bloco.notna().to_numpy()
+            ultimo_valido = len(bloco) - 1 - np.argmax(validos[::-1], axis=0)
+            ultimo_valido[~validos.any(axis=0)] = -1
+            corte = max(int(ultimo_valido.min()) + 1, inicio, len(bloco) - tamanho_bloco)
+            pendentes = bloco.iloc[corte:]
+            if corte > inicio:
+                yield bloco.iloc[inicio:corte]
+                ancora = bloco.iloc[corte - 1:corte]
+
+    if pendentes is not None and len(pendentes):
+        partes = [parte for parte in (ancora, pendentes) if parte is not None]
+        bloco = interpolar_no_tempo(pd.concat(partes))
+        yield bloco.iloc[len(partes[0]) if ancora is not None else 0:]
+
+
+def hash_arquivo(caminho):
+    """Calcula o SHA-256 do arquivo em blocos"""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(_TAMANHO_BLOCO_HASH), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def caminho_cache(caminho_csv, diretorio_cache=None, interpolar=True):
+    """Retorna o caminho do arquivo Arrow correspondente ao CSV (interpolado ou bruto)"""
+    caminho_csv = Path(caminho_csv)
+    if diretorio_cache is None:
+        diretorio_cache = caminho_csv.parent / DIRETORIO_CACHE
+    return Path(diretorio_cache) / f'{caminho_csv.stem}{"" if interpolar else ".bruto"}.arrow'
+
+
+def _metadados_origem(caminho_csv):
+    """Metadados que identificam a versão do CSV de origem"""
+    stat = os.stat(caminho_csv)
+    return {
+        'versao': VERSAO_CACHE,
+        'mtime_ns': str(stat.st_mtime_ns),
+        'tamanho': str(stat.st_size),
+        'sha256': hash_arquivo(caminho_csv),
+    }
+
+
+def _cache_valido(metadados_cache, caminho_csv):
+    """
+    O cache é válido se mtime e tamanho coincidirem; se só o mtime mudou,
+    o hash do conteúdo decide.
+    """
+    if metadados_cache.get('versao') != VERSAO_CACHE:
+        return False
+
+    stat = os.stat(caminho_csv)
+    if metadados_cache.get('tamanho') != str(stat.st_size):
+        return False
+    if metadados_cache.get('mtime_ns') == str(stat.st_mtime_ns):
+        return True
+    return metadados_cache.get('sha256') == hash_arquivo(caminho_csv)
+
+
+def escrever_cache(df, arquivo_cache, metadados):
+    """Grava o DataFrame em formato Arrow IPC sem compressão (mapeável em memória)"""
+    arquivo_cache = Path(arquivo_cache)
+    arquivo_cache.parent.mkdir(parents=True, exist_ok=True)
+
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    tabela = tabela.replace_schema_metadata({
+        **(tabela.schema.metadata or {}),
+        **{f'clima.{chave}'.encode(): valor.encode() for chave, valor in metadados.items()}
+    })
+
+    # Escrita atômica para não deixar cache corrompido entre processos
+    temporario = arquivo_cache.with_suffix(f'.{os.getpid()}.tmp')
+    with pa.OSFile(str(temporario), 'wb') as destino:
+        with pa.ipc.new_file(destino, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+    os.replace(temporario, arquivo_cache)
+
+
+def _decodificar_metadados(schema):
+    """Extrai os metadados do cache gravados no schema Arrow"""
+    return {
+        chave.decode()[len('clima.'):]: valor.decode()
+        for chave, valor in (schema.metadata or {}).items()
+        if chave.startswith(b'clima.')
+    }
+
+
+def ler_metadados_cache(arquivo_cache):
+    """Metadados gravados com o cache, sem ler as colunas"""
+    with pa.memory_map(str(arquivo_cache), 'r') as origem:
+        return _decodificar_metadados(pa.ipc.open_file(origem).schema)
+
+
+def ler_cache(arquivo_cache, caminho_csv=None, gravavel=False):
+    """
+    Abre o cache Arrow via memory-map, sem copiar as colunas numéricas: os
+    arrays do DataFrame são somente leitura (escritas pelo pandas com
+    copy-on-write copiam a coluna; escritas diretas no numpy falham). Com
+    gravavel=True, lê o arquivo sem memory-map para arrays próprios e graváveis.
+    Se caminho_csv for informado, retorna None quando o cache estiver desatualizado.
+    """
+    abrir = pa.OSFile if gravavel else pa.memory_map
+    with abrir(str(arquivo_cache), 'r') as origem:
+        leitor = pa.ipc.open_file(origem)
+        if caminho_csv is not None and not _cache_valido(_decodificar_metadados(leitor.schema), caminho_csv):
+            return None
+        tabela = leitor.read_all()
+
+    return tabela.to_pandas() if gravavel else tabela.to_pandas(split_blocks=True)
+
+
+def ler_cache_em_blocos(arquivo_cache, caminho_csv, tamanho_bloco):
+    """
+    Fatias de até `tamanho_bloco` linhas do cache Arrow (memory-mapped, sem
+    cópia até a conversão de cada fatia). Retorna None se o cache não existir
+    ou estiver desatualizado em relação ao CSV.
+    """
+    if pa is None or not Path(arquivo_cache).exists():
+        return None
+    try:
+        with pa.memory_map(str(arquivo_cache), 'r') as origem:
+            if not _cache_valido(_decodificar_metadados(pa.ipc.open_file(origem).schema), caminho_csv):
+                return None
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    def blocos():
+        with pa.memory_map(str(arquivo_cache), 'r') as origem:
+            tabela = pa.ipc.open_file(origem).read_all()
+            for inicio in range(0, tabela.num_rows, tamanho_bloco):
+                yield tabela.slice(inicio, tamanho_bloco).to_pandas(split_blocks=True)
+
+    return blocos()
+
+
+def carregar_inmet(caminho_csv, usar_cache=True, diretorio_cache=None, interpolar=True, gravavel=False):
+    """
+    Carrega os dados de um export do INMET (diário ou horário).
+
+    Na primeira execução o CSV é processado e salvo como cache colunar;
+    nas seguintes o cache é mapeado em memória enquanto o CSV não mudar
+    (mtime/tamanho, com hash SHA-256 como desempate). A versão sem
+    interpolação (interpolar=False) tem o seu próprio cache.
+
+    Com cache, o DataFrame vem do memory-map nas duas situações (primeira
+    leitura ou não), com arrays somente leitura (ver ler_cache); use
+    gravavel=True para arrays próprios, ao custo de uma cópia.
+    """
+    if not usar_cache or pa is None:
+        return ler_csv_inmet(caminho_csv, interpolar)
+
+    arquivo_cache = caminho_cache(caminho_csv, diretorio_cache, interpolar)
+    if arquivo_cache.exists():
+        try:
+            df = ler_cache(arquivo_cache, caminho_csv, gravavel=gravavel)
+            if df is not None:
+                return df
+        except (OSError, pa.ArrowInvalid):
+            pass  # cache corrompido ou ilegível: reconstruir
+
+    df = ler_csv_inmet(caminho_csv, interpolar)
+    try:
+        escrever_cache(df, arquivo_cache, _metadados_origem(caminho_csv))
+    except OSError as e:
+        print(f"Aviso: não foi possível gravar o cache em {arquivo_cache}: {e}")
+        return df
+    # o mesmo DataFrame de uma leitura com cache, para o comportamento não depender de qual veio primeiro
+    return df if gravavel else ler_cache(arquivo_cache)
+
+
+def listar_arquivos_inmet(origem):
+    """Expande um arquivo, diretório, padrão glob (ou lista de arquivos) na lista ordenada de CSVs"""
+    if isinstance(origem, (list, tuple)):
+        return sorted(str(arquivo) for arquivo in origem)
+    origem = str(origem)
+    if os.path.isdir(origem):
+        arquivos = glob.glob(os.path.join(origem, '*.csv'))
+    elif glob.has_magic(origem):
+        arquivos = glob.glob(origem, recursive=True)
+    else:
+        arquivos = [origem]
+
+    arquivos = sorted(arquivos)
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum CSV do INMET encontrado em: {origem}")
+    return arquivos
+
+
+def versao_origem(origem):
+    """
+    Identificador da versão de um conjunto de exports (caminho, mtime e
+    tamanho de cada arquivo): muda sempre que algum CSV é alterado,
+    adicionado ou removido, sem ler o conteúdo.
+    """
+    sha = hashlib.sha256()
+    for arquivo in listar_arquivos_inmet(origem):
+        stat = os.stat(arquivo)
+        sha.update(f'{os.path.abspath(arquivo)}|{stat.st_mtime_ns}|{stat.st_size}\n'.encode())
+    return sha.hexdigest()[:16]
+
+
+def _carregar_arquivo(argumentos):
+    """
+    Carrega um CSV no processo de trabalho (metadados + dados). Exports
+    horários voltam com a hora em int32 (com_horas), para trafegar e juntar
+    sem o índice de datas; com `diario=True` vêm sem interpolação, para a
+    reamostragem por estação em diarios_de_horario.
+    """
+    caminho_csv, usar_cache, diretorio_cache, diario, interpolar = argumentos
+    metadados = ler_metadados_inmet(caminho_csv)
+    horario = _eh_horario(metadados)
+    df = carregar_inmet(caminho_csv, usar_cache=usar_cache, diretorio_cache=diretorio_cache,
+                        interpolar=interpolar and not (horario and diario))
+    return metadados, com_horas(df) if horario else df
+
+
+def diarios_de_horario(partes, interpolar=True):
+    """
+    Dados horários sem interpolação (lista de (codigo, df), como em
+    compactar_horario) reamostrados para o dia local, juntando os arquivos de
+    cada estação: o dia da virada entre dois exports anuais tem horas nos
+    dois. Dias com menos de HORAS_MINIMAS horas válidas ficam NaN (e a chuva
+    é a soma só das horas medidas); a interpolação, se pedida, vem depois,
+    já no diário, e não toca na precipitação.
+
+    Retorna lista de (codigo, DataFrame diário com um registro por dia do período).
+    """
+    diario = reamostrar_diario(compactar_horario(partes))
+    resultado = []
+    for codigo, df in diario.groupby(level='estacao', sort=False):
+        df = df.droplevel('estacao').asfreq('D')
+        resultado.append((codigo, interpolar_no_tempo(df, COLUNAS_SEM_INTERPOLACAO) if interpolar else df))
+    return resultado
+
+
+def _carregar_arquivos(arquivos, n_processos, usar_cache, diretorio_cache, diario, interpolar=True):
+    argumentos = [(arquivo, usar_cache, diretorio_cache, diario, interpolar) for arquivo in arquivos]
+
+    if n_processos is None:
+        n_processos = os.cpu_count() or 1
+    n_processos = min(n_processos, len(arquivos))
+
+    if n_processos > 1:
+        with ProcessPoolExecutor(max_workers=n_processos) as executor:
+            return list(executor.map(
+                _carregar_arquivo, argumentos,
+                chunksize=max(1, len(argumentos) // (4 * n_processos))
+            ))
+    return [_carregar_arquivo(arg) for arg in argumentos]
+
+
+def _tabela_estacoes(arquivos_estacoes):
+    return arquivos_estacoes.groupby('estacao').agg(
+        nome=('nome', 'last'),
+        latitude=('latitude', 'last'),
+        longitude=('longitude', 'last'),
+        altitude=('altitude', 'last'),
+        situacao=('situacao', 'last'),
+        periodicidade=('periodicidade', 'last'),
+        data_inicial=('data_inicial', 'min'),
+        data_final=('data_final', 'max'),
+        n_arquivos=('arquivo', 'size'),
+    )
+
+
+def carregar_estacoes(origem, n_processos=None, usar_cache=True, diretorio_cache=None, interpolar=True):
+    """
+    Carrega vários exports do INMET (arquivo, diretório ou glob) em paralelo.
+    Exports horários entram reamostrados para o dia (diarios_de_horario,
+    juntando os arquivos de cada estação), com as mesmas colunas dos diários. Com interpolar=False as falhas
+    ficam NaN (entrada para modelos com tratamento nativo de NaN).
+
+    Retorna (dados, estacoes):
+    - dados: DataFrame longo indexado por (estacao, data)
+    - estacoes: tabela indexada pelo código com nome, coordenadas, período e periodicidade
+    """
+    arquivos = listar_arquivos_inmet(origem)
+    resultados = _carregar_arquivos(arquivos, n_processos, usar_cache, diretorio_cache, diario=True,
+                                    interpolar=interpolar)
+
+    arquivos_estacoes = pd.DataFrame([metadados for metadados, _ in resultados])
+    partes = [(metadados['estacao'], df) for metadados, df in resultados if not _eh_horario(metadados)]
+    horarios = [(metadados['estacao'], df) for metadados, df in resultados if _eh_horario(metadados)]
+    if horarios:
+        partes += diarios_de_horario(horarios, interpolar=interpolar)
+
+    # Uma estação pode vir dividida em vários arquivos (um por ano)
+    dados = pd.concat(
+        [df for _, df in partes],
+        keys=[codigo for codigo, _ in partes],
+        names=['estacao', 'data']
+    )
+    dados = dados[~dados.index.duplicated(keep='last')].sort_index()
+    return dados, _tabela_estacoes(arquivos_estacoes)
+
+
+def carregar_horario(origem, n_processos=None, usar_cache=True, diretorio_cache=None):
+    """
+    Carrega exports horários do INMET em paralelo no formato compacto de
+    compactar_horario (estação categórica, hora int32, medições float32),
+    ordenado por (estacao, hora). Exports diários da origem são ignorados.
+
+    Retorna (horario, estacoes).
+    """
+    arquivos = [arquivo for arquivo in listar_arquivos_inmet(origem) if _eh_horario(ler_metadados_inmet(arquivo))]
+    if not arquivos:
+        raise FileNotFoundError(f"Nenhum export horário do INMET encontrado em: {origem}")
+    resultados = _carregar_arquivos(arquivos, n_processos, usar_cache, diretorio_cache, diario=False)
+
+    arquivos_estacoes = pd.DataFrame([metadados for metadados, _ in resultados])
+    horario = compactar_horario([(metadados['estacao'], df) for metadados, df in resultados])
+    return horario, _tabela_estacoes(arquivos_estacoes)
@@ -0,0 +1,351 @@
+"""
+Arquivo Histórico Jaschke (FCT/UNESP, 1968-2008)
+Conversão das planilhas .xls legadas (grades ano × mês/dia) para o esquema
+diário do INMET, indexado por (estacao, data), lidas em paralelo uma única
+vez e gravadas no cache colunar (Arrow)
+"""
+
+import hashlib
+import os
+import re
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .ingestao import COLUNAS_INMET, DIRETORIO_CACHE, escrever_cache, ler_cache, ler_metadados_cache
+
+try:
+    import xlrd
+except ImportError:  # conversão indisponível; o cache já gerado continua legível
+    xlrd = None
+
+DIRETORIO_JASCHKE = Path(__file__).resolve().parent.parent / 'dados' / 'dados_historicos_Jaschke'
+ARQUIVO_CACHE_JASCHKE = 'jaschke.arrow'
+VERSAO_JASCHKE = '2'
+
+ESTACAO_JASCHKE = 'FCT_UNESP'
+METADADOS_ESTACAO = {
+    'estacao': ESTACAO_JASCHKE,
+    'nome': 'PRESIDENTE PRUDENTE (FCT/UNESP)',
+    'latitude': -22.1167,
+    'longitude': -51.3833,
+    'altitude': 435.55,
+    'periodicidade': 'Diaria',
+}
+
+# A pressão das planilhas é reduzida ao nível do mar; a do INMET é medida na
+# estação. Fator da atmosfera padrão para a altitude da estação (~0,95)
+FATOR_PRESSAO_ESTACAO = (1 - 0.0065 * METADADOS_ESTACAO['altitude'] / 288.15) ** 5.255
+
+# Rótulos de coluna (cabeçalhos do tipo lista) -> (variável do INMET, fator de conversão)
+ROTULOS_COLUNA = {
+    'tmax': ('temp_maxima', 1.0),
+    'tmin': ('temp_minima', 1.0),
+    'tmed': ('temp_media', 1.0),
+    'tmedia': ('temp_media', 1.0),
+    'pr med': ('pressao_atm_media', FATOR_PRESSAO_ESTACAO),
+    'v med': ('vento_vel_media', 1 / 3.6),  # km/h -> m/s
+}
+
+# Títulos das grades dia × mês (ou nome do arquivo) -> variável do INMET
+TITULOS_GRADE = {
+    'ur media': 'umidade_relativa_media',
+    'ur maxima': 'umidade_relativa_maxima',
+    'ur minima': 'umidade_relativa_minima',
+    'umidade': 'umidade_relativa_media',
+    'precipit': 'precipitacao_total',
+}
+
+# Faixas plausíveis: planilhas-modelo vêm preenchidas com zeros e há erros de digitação
+LIMITES = {
+    'precipitacao_total': (0.0, 400.0),
+    'pressao_atm_media': (900.0, 1000.0),
+    'temp_maxima': (-5.0, 50.0),
+    'temp_media': (-5.0, 45.0),
+    'temp_minima': (-10.0, 40.0),
+    'umidade_relativa_media': (1.0, 100.0),
+    'umidade_relativa_maxima': (1.0, 100.0),
+    'umidade_relativa_minima': (1.0, 100.0),
+    'vento_vel_media': (0.0, 30.0),
+}
+
+MESES = {
+    'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6,
+    'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12,
+}
+# DADOS_GPS / 'matriz dadoa GPS': estação automática, outro instrumento e outra série
+ARQUIVOS_IGNORADOS = ('gps',)
+
+_NOME_ABA_ANO = re.compile(r'^(\d{2}|\d{4})(-b)?$', re.IGNORECASE)
+# distância máxima (linhas) entre o cabeçalho e o mês/título de um bloco
+_LINHAS_ACIMA = 4
+
+
+def _exigir_xlrd():
+    if xlrd is None:
+        raise ImportError("O pacote 'xlrd' é necessário para ler as planilhas .xls (pip install xlrd)")
+
+
+def normalizar_texto(valor):
+    """Texto em minúsculas, sem acentos, pontos nem espaços repetidos"""
+    texto = unicodedata.normalize('NFKD', str(valor)).encode('ascii', 'ignore').decode()
+    return ' '.join(texto.lower().replace('.', ' ').replace(':', ' ').split())
+
+
+def ano_da_aba(nome):
+    """Ano de uma aba ('68-b' -> 1968, '01' -> 2001, '2000-b' -> 2000), ou None"""
+    encontrado = _NOME_ABA_ANO.match(nome.strip())
+    if encontrado is None:
+        return None
+    ano = int(encontrado[1])
+    if ano < 100:
+        ano += 1900 if ano >= 60 else 2000
+    return ano
+
+
+def _mes(texto):
+    """Número do mês de 'JAN', 'fevereiro', 'set '..., ou None"""
+    return MESES.get(texto[:3]) if len(texto) >= 3 and texto.isalpha() else None
+
+
+def _numero(valor):
+    if isinstance(valor, float):
+        return valor
+    try:
+        return float(str(valor).replace(',', '.'))
+    except ValueError:
+        return np.nan
+
+
+def _dia(valor):
+    """Dia do mês (1-31) de uma célula, ou None"""
+    numero = _numero(valor)
+    return int(numero) if numero == numero and numero == int(numero) and 1 <= numero <= 31 else None
+
+
+def _titulo(texto):
+    for prefixo, variavel in TITULOS_GRADE.items():
+        if texto.startswith(prefixo):
+            return variavel
+    return None
+
+
+def _blocos_rotulados(celulas, textos):
+    """
+    Colunas com rótulo conhecido (Tmax, v med...). O dia vem da coluna 'dia'
+    mais próxima à esquerda (ou da primeira coluna); o mês, da coluna 'MES'
+    do cabeçalho ou do nome de mês mais próximo acima, à esquerda do rótulo.
+    """
+    registros = []
+    n_linhas, n_colunas = textos.shape
+    for linha, coluna in zip(*np.nonzero(np.isin(textos, list(ROTULOS_COLUNA)))):
+        variavel, fator = ROTULOS_COLUNA[textos[linha, coluna]]
+        vizinhas = textos[max(linha - 1, 0):linha + 1, :coluna + 1]
+        colunas_dia = np.nonzero((vizinhas == 'dia').any(axis=0))[0]
+        coluna_dia = colunas_dia[-1] if len(colunas_dia) else 0
+        colunas_mes = np.nonzero(textos[linha, :coluna] == 'mes')[0]
+
+        mes_fixo = None
+        if not len(colunas_mes):
+            for acima in range(linha, max(linha - _LINHAS_ACIMA, -1), -1):
+                meses = [(c, _mes(textos[acima, c])) for c in range(coluna, coluna_dia, -1)]
+                meses = [(c, m) for c, m in meses if m]
+                if meses:
+                    mes_fixo = meses[0][1]
+                    break
+            if mes_fixo is None:
+                continue
+
+        anterior = 0
+        for i in range(linha + 1, n_linhas):
+            dia = _dia(celulas[i, coluna_dia])
+            if dia is None:
+                if anterior:
+                    break
+                continue  # linhas de unidades logo abaixo do cabeçalho
+            mes = mes_fixo if mes_fixo else _dia(celulas[i, colunas_mes[0]])
+            if mes_fixo and dia <= anterior:
+                break
+            anterior = dia
+            if mes is not None and mes <= 12:
+                registros.append((variavel, mes, dia, _numero(celulas[i, coluna]) * fator))
+    return registros
+
+
+def _grades(celulas, textos, titulo_arquivo):
+    """
+    Grades com os 12 meses lado a lado no cabeçalho e os dias na primeira
+    coluna. Basta reconhecer 11 dos 12 meses na ordem: o que falta (ex.:
+    '83.0' no lugar de 'jan' na precipitação de 1983) vale pela posição.
+    """
+    registros = []
+    n_linhas, n_colunas = textos.shape
+    if n_colunas < 12:
+        return registros
+    for linha in range(n_linhas):
+        meses = np.array([_mes(texto) or 0 for texto in textos[linha]])
+        acertos = [np.count_nonzero(meses[inicio:inicio + 12] == np.arange(1, 13)) for inicio in range(n_colunas - 11)]
+        inicio = int(np.argmax(acertos))
+        if acertos[inicio] < 11:
+            continue
+
+        variavel = None
+        for acima in range(linha - 1, max(linha - _LINHAS_ACIMA, -1), -1):
+            variavel = next(filter(None, map(_titulo, textos[acima])), None)
+            if variavel:
+                break
+        variavel = variavel or titulo_arquivo
+        if variavel is None:
+            continue
+
+        anterior = 0
+        for i in range(linha + 1, n_linhas):
+            dia = _dia(celulas[i, 0])
+            if dia is None or dia <= anterior:
+                break
+            anterior = dia
+            for mes in range(1, 13):
+                registros.append((variavel, mes, dia, _numero(celulas[i, inicio + mes - 1])))
+    return registros
+
+
+def converter_planilha(caminho):
+    """
+    Registros (variavel, data, valor) de todas as abas de ano de um .xls.
+    Abas sem ano no nome (resumos, matrizes, tabelas de divulgação) são ignoradas.
+    """
+    _exigir_xlrd()
+    titulo_arquivo = _titulo(normalizar_texto(Path(caminho).stem.replace('_', ' ')))
+    partes = []
+    vazias = []
+    # logfile: o xlrd avisa sobre cada planilha antiga com cabeçalho inconsistente
+    with open(os.devnull, 'w') as avisos, xlrd.open_workbook(caminho, on_demand=True, logfile=avisos) as livro:
+        for nome in livro.sheet_names():
+            ano = ano_da_aba(nome)
+            if ano is None:
+                continue
+            aba = livro.sheet_by_name(nome)
+            if not aba.nrows:
+                continue
+            celulas = np.array([aba.row_values(i) for i in range(aba.nrows)], dtype=object)
+            textos = np.vectorize(normalizar_texto, otypes=[object])(celulas)
+            registros = _blocos_rotulados(celulas, textos) + _grades(celulas, textos, titulo_arquivo)
+            if registros:
+                tabela = pd.DataFrame(registros, columns=['variavel', 'mes', 'dia', 'valor'])
+                tabela['ano'] = ano
+                partes.append(tabela)
+            else:
+                vazias.append(nome)
+            livro.unload_sheet(nome)
+
+    if vazias:
+        arquivo = Path(caminho)
+        print(f"Aviso: {arquivo.parent.name}/{arquivo.name}: {len(vazias)} aba(s) de ano "
+              f"sem bloco ou grade reconhecido ({', '.join(vazias)})")
+    if not partes:
+        return pd.DataFrame({'variavel': [], 'data': pd.DatetimeIndex([]), 'valor': []})
+    tabela = pd.concat(partes, ignore_index=True)
+    # dias inexistentes (30/02, 31/04...) das grades viram NaT e saem
+    componentes = tabela[['ano', 'mes', 'dia']].set_axis(['year', 'month', 'day'], axis=1)
+    tabela['data'] = pd.to_datetime(componentes, errors='coerce')
+    tabela = tabela.dropna(subset=['data', 'valor'])
+    minimos = tabela['variavel'].map({v: faixa[0] for v, faixa in LIMITES.items()})
+    maximos = tabela['variavel'].map({v: faixa[1] for v, faixa in LIMITES.items()})
+    tabela = tabela[tabela['valor'].between(minimos, maximos)]
+    return tabela[['variavel', 'data', 'valor']].reset_index(drop=True)
+
+
+def listar_planilhas(origem=DIRETORIO_JASCHKE):
+    """Planilhas .xls do arquivo histórico (busca recursiva), em ordem de caminho"""
+    origem = Path(origem)
+    if origem.is_file():
+        return [origem]
+    planilhas = sorted(
+        p for p in origem.rglob('*')
+        if p.suffix.lower() == '.xls' and not any(termo in p.name.lower() for termo in ARQUIVOS_IGNORADOS)
+    )
+    if not planilhas:
+        raise FileNotFoundError(f"Nenhuma planilha .xls encontrada em: {origem}")
+    return planilhas
+
+
+def _assinatura(planilhas):
+    """Versão do conjunto de planilhas (caminho, mtime e tamanho de cada uma)"""
+    sha = hashlib.sha256()
+    for planilha in planilhas:
+        stat = os.stat(planilha)
+        sha.update(f'{os.path.abspath(planilha)}|{stat.st_mtime_ns}|{stat.st_size}\n'.encode())
+    return sha.hexdigest()
+
+
+def converter_jaschke(origem=DIRETORIO_JASCHKE, n_processos=None):
+    """
+    Converte todas as planilhas em paralelo para o esquema do INMET: DataFrame
+    indexado por (estacao, data) com as colunas de COLUNAS_INMET em float32.
+
+    Várias planilhas repetem os mesmos anos (TABELAS 2006, TABELAS GERAIS...);
+    para cada (data, variável) vale a mediana das cópias, que descarta um erro
+    de digitação presente em só uma delas.
+    """
+    _exigir_xlrd()
+    planilhas = listar_planilhas(origem)
+    if n_processos is None:
+        n_processos = os.cpu_count() or 1
+    n_processos = min(n_processos, len(planilhas))
+
+    if n_processos > 1:
+        with ProcessPoolExecutor(max_workers=n_processos) as executor:
+            tabelas = list(executor.map(converter_planilha, planilhas))
+    else:
+        tabelas = [converter_planilha(planilha) for planilha in planilhas]
+
+    longo = pd.concat(tabelas, ignore_index=True)
+    dados = longo.groupby(['data', 'variavel'], sort=True)['valor'].median().unstack('variavel')
+    dados = dados.reindex(columns=COLUNAS_INMET[1:]).astype(np.float32).rename_axis(columns=None)
+    dados.index = pd.MultiIndex.from_arrays(
+        [np.full(len(dados), ESTACAO_JASCHKE), dados.index], names=['estacao', 'data']
+    )
+    return dados
+
+
+def caminho_cache_jaschke(origem=DIRETORIO_JASCHKE):
+    origem = Path(origem)
+    base = origem.parent if origem.is_file() else origem
+    return base / DIRETORIO_CACHE / ARQUIVO_CACHE_JASCHKE
+
+
+def carregar_jaschke(origem=DIRETORIO_JASCHKE, usar_cache=True, n_processos=None):
+    """
+    Série histórica no mesmo formato de carregar_estacoes: (dados, estacoes).
+    As planilhas só são lidas quando o cache Arrow não existe ou o conjunto
+    de arquivos mudou; sem o xlrd, um cache existente é usado mesmo assim.
+    """
+    planilhas = listar_planilhas(origem)
+    assinatura = _assinatura(planilhas)
+    arquivo_cache = caminho_cache_jaschke(origem)
+    dados = None
+    if usar_cache and arquivo_cache.exists():
+        metadados = ler_metadados_cache(arquivo_cache)
+        if metadados.get('versao') == VERSAO_JASCHKE and (xlrd is None or metadados.get('assinatura') == assinatura):
+            dados = ler_cache(arquivo_cache).set_index(['estacao', 'data'])
+
+    if dados is None:
+        dados = converter_jaschke(origem, n_processos)
+        if usar_cache:
+            try:
+                escrever_cache(dados.reset_index(), arquivo_cache, {'versao': VERSAO_JASCHKE, 'assinatura': assinatura})
+            except OSError as e:
+                print(f"Aviso: não foi possível gravar o cache em {arquivo_cache}: {e}")
+
+    datas = dados.index.get_level_values('data')
+    estacoes = pd.DataFrame([{
+        **METADADOS_ESTACAO,
+        'situacao': 'Historica',
+        'data_inicial': datas.min(),
+        'data_final': datas.max(),
+        'n_arquivos': len(planilhas),
+    }]).set_index('estacao')
+    return dados, estacoes
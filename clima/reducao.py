@@ -0,0 +1,169 @@
+"""
+Redução de Séries para Gráficos
+Downsampling LTTB (Largest-Triangle-Three-Buckets) e mín/máx por faixa, com
+uma pirâmide de resoluções pré-calculada para servir qualquer janela de zoom
+com alguns milhares de pontos
+"""
+
+import numpy as np
+import pandas as pd
+
+METODOS = ('lttb', 'minmax')
+PONTOS_POR_PIXEL = 2
+LARGURA_PADRAO = 1_200
+FATOR_PIRAMIDE = 4
+PONTOS_MINIMOS = 500
+
+
+def pontos_para_largura(largura_px=LARGURA_PADRAO, pontos_por_px=PONTOS_POR_PIXEL):
+    """Número de pontos que o gráfico consegue mostrar na largura dada"""
+    return max(int(largura_px * pontos_por_px), 3)
+
+
+def _como_numero(x):
+    """Eixo x como float64 (datas viram inteiros na própria unidade, desde a época)"""
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.view(np.int64)
+    return x.astype(np.float64)
+
+
+def _bordas(inicio, fim, n_faixas):
+    """Limites de `n_faixas` faixas contíguas (quase) iguais em [inicio, fim)"""
+    return np.linspace(inicio, fim, n_faixas + 1).astype(np.int64)
+
+
+def indices_lttb(x, y, n_pontos):
+    """
+    Índices dos pontos escolhidos pelo LTTB: primeiro e último sempre, e um
+    por faixa no meio, o que forma o maior triângulo com o ponto escolhido na
+    faixa anterior e a média da faixa seguinte. Preserva picos e a forma da
+    curva melhor que pegar um ponto a cada k.
+    """
+    x, y = _como_numero(x), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_pontos >= n or n <= 2:
+        return np.arange(n)
+    n_pontos = max(n_pontos, 3)
+
+    bordas = _bordas(1, n - 1, n_pontos - 2)
+    inicios, fins = bordas[:-1], bordas[1:]
+    tamanhos = fins - inicios
+    # média de cada faixa; o "próximo" da última faixa é o último ponto
+    media_x = np.append(np.add.reduceat(x[1:n - 1], inicios - 1) / tamanhos, x[-1])
+    media_y = np.append(np.add.reduceat(y[1:n - 1], inicios - 1) / tamanhos, y[-1])
+
+    escolhidos = np.empty(n_pontos, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for i, (inicio, fim) in enumerate(zip(inicios, fins)):
+        ax, ay = x[anterior], y[anterior]
+        cx, cy = media_x[i + 1], media_y[i + 1]
+        areas = np.abs((ax - cx) * (y[inicio:fim] - ay) - (ax - x[inicio:fim]) * (cy - ay))
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[i + 1] = anterior
+    return escolhidos
+
+
+def indices_minmax(x, y, n_pontos):
+    """
+    Índices do mínimo e do máximo de cada faixa (n_pontos / 2 faixas), em
+    ordem. Mantém todos os extremos visíveis: bom para precipitação e picos.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_pontos >= n or n <= 2:
+        return np.arange(n)
+
+    n_faixas = max(n_pontos // 2, 1)
+    faixa = np.repeat(np.arange(n_faixas), np.diff(_bordas(0, n, n_faixas)))
+    # ordenado por (faixa, valor): o primeiro de cada faixa é o mínimo e o último o máximo
+    ordem = np.lexsort((y, faixa))
+    fins = np.cumsum(np.bincount(faixa, minlength=n_faixas))
+    fins = fins[fins > 0]
+    inicios = np.append(0, fins[:-1])
+    return np.unique(np.concatenate([ordem[inicios], ordem[fins - 1]]))
+
+
+def reduzir(x, y, n_pontos, metodo='lttb'):
+    """
+    Índices (em relação a x/y) de uma versão de até `n_pontos` pontos da
+    série. Valores ausentes são descartados antes da redução.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de redução desconhecido: {metodo!r} (use {', '.join(METODOS)})")
+    validos = np.flatnonzero(~np.isnan(np.asarray(y, dtype=np.float64)))
+    x, y = np.asarray(x)[validos], np.asarray(y)[validos]
+    funcao = indices_lttb if metodo == 'lttb' else indices_minmax
+    return validos[funcao(x, y, n_pontos)]
+
+
+def reduzir_df(df, coluna_x, coluna_y, n_pontos, metodo='lttb'):
+    """Linhas de `df` que representam a série coluna_y x coluna_x com até `n_pontos`"""
+    return df.iloc[reduzir(df[coluna_x].to_numpy(), df[coluna_y].to_numpy(), n_pontos, metodo)]
+
+
+class Piramide:
+    """
+    Níveis de resolução de uma série (ordenada por x): o nível 0 é a série
+    completa e cada nível seguinte tem ~1/FATOR_PIRAMIDE dos pontos do anterior,
+    até PONTOS_MINIMOS. Uma janela de zoom é servida pelo nível mais fino que
+    cabe no orçamento de pontos, com uma fatia por busca binária.
+    """
+
+    def __init__(self, x, y, metodo='lttb', fator=FATOR_PIRAMIDE, pontos_minimos=PONTOS_MINIMOS):
+        x = np.asarray(x)
+        y = np.asarray(y, dtype=np.float64)
+        validos = ~np.isnan(y)
+        self.metodo = metodo
+        self.niveis = [(x[validos], y[validos])]
+        while len(self.niveis[-1][1]) > pontos_minimos:
+            nx, ny = self.niveis[-1]
+            indices = reduzir(nx, ny, max(len(ny) // fator, pontos_minimos), metodo)
+            self.niveis.append((nx[indices], ny[indices]))
+        self._chaves = [_como_numero(nx) for nx, _ in self.niveis]
+        self._tipo_x = x.dtype
+
+    def __len__(self):
+        return len(self.niveis[0][1])
+
+    def _limite(self, valor):
+        """Borda da janela na escala das chaves (datas aceitam str/Timestamp/date)"""
+        if valor is None:
+            return None
+        if np.issubdtype(self._tipo_x, np.datetime64):
+            valor = np.array([pd.Timestamp(valor).to_datetime64()]).astype(self._tipo_x)
+            return _como_numero(valor)[0]
+        return float(valor)
+
+    def _fatia(self, nivel, inicio, fim):
+        # um ponto além de cada borda, para a linha chegar até a margem do gráfico
+        chaves = self._chaves[nivel]
+        esquerda = 0 if inicio is None else max(np.searchsorted(chaves, inicio, side='left') - 1, 0)
+        direita = len(chaves) if fim is None else np.searchsorted(chaves, fim, side='right') + 1
+        return slice(esquerda, direita)
+
+    def recorte(self, inicio=None, fim=None, n_pontos=None):
+        """
+        (nível, início, fim da fatia, reduzir) que janela() usa: zooms que caem
+        nos mesmos pontos têm o mesmo recorte (serve de chave de cache).
+        `reduzir` é o orçamento quando nem o nível mais grosso cabe nele.
+        """
+        n_pontos = n_pontos or pontos_para_largura()
+        inicio, fim = self._limite(inicio), self._limite(fim)
+        for nivel in range(len(self.niveis)):
+            fatia = self._fatia(nivel, inicio, fim)
+            if fatia.stop - fatia.start <= n_pontos:
+                return nivel, int(fatia.start), int(fatia.stop), None
+        return nivel, int(fatia.start), int(fatia.stop), n_pontos
+
+    def janela(self, inicio=None, fim=None, n_pontos=None):
+        """(x, y) da janela [inicio, fim] com no máximo ~n_pontos pontos"""
+        nivel, esquerda, direita, reduzir_para = self.recorte(inicio, fim, n_pontos)
+        nx, ny = self.niveis[nivel]
+        nx, ny = nx[esquerda:direita], ny[esquerda:direita]
+        if reduzir_para is None:
+            return nx, ny
+        # nem o nível mais grosso cabe (orçamento menor que PONTOS_MINIMOS): reduz a fatia na hora
+        indices = reduzir(nx, ny, reduzir_para, self.metodo)
+        return nx[indices], ny[indices]
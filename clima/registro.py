@@ -0,0 +1,195 @@
+"""
+Registro de Modelos
+Artefatos joblib versionados com metadados e carga preguiçosa via memory-map
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import pandas as pd
+import sklearn
+
+DIRETORIO_MODELOS = Path(__file__).resolve().parent.parent / 'modelos'
+ARQUIVO_MODELO = 'modelo.joblib'
+ARQUIVO_METADADOS = 'metadados.json'
+
+_PADRAO_VERSAO = re.compile(r'^v(\d+)$')
+
+
+def _diretorio_modelo(nome, diretorio=None):
+    """Diretório com as versões de um modelo registrado"""
+    return Path(diretorio or DIRETORIO_MODELOS) / nome
+
+
+def _versoes(nome, diretorio=None):
+    """Versões existentes de um modelo, em ordem crescente"""
+    base = _diretorio_modelo(nome, diretorio)
+    if not base.is_dir():
+        return []
+    return sorted(
+        int(correspondencia.group(1))
+        for correspondencia in (_PADRAO_VERSAO.match(item.name) for item in base.iterdir())
+        if correspondencia and (base / correspondencia.group(0) / ARQUIVO_METADADOS).exists()
+    )
+
+
+def _serializavel(valor):
+    """Converte datas e tipos numpy para JSON"""
+    if isinstance(valor, (pd.Timestamp, datetime)):
+        return valor.isoformat()
+    if hasattr(valor, 'tolist'):
+        return valor.tolist()
+    return str(valor)
+
+
+def registrar_modelo(modelo, nome, features, lags=None, janela_treino=None, metricas=None,
+                     diretorio=None, **extras):
+    """
+    Salva um pipeline treinado como nova versão de `nome` no registro.
+
+    - features: nomes das colunas de entrada, na ordem usada no treino
+    - lags: especificação das lag features, ex.: {'variaveis': [...], 'lags': [1, 2, 3, 7]}
+    - janela_treino: (data_inicial, data_final) dos dados de treino
+    - metricas: ex.: {'RMSE': ..., 'R2': ...}
+
+    O artefato é gravado sem compressão para poder ser mapeado em memória.
+    Retorna os metadados gravados.
+    """
+    versoes = _versoes(nome, diretorio)
+    versao = versoes[-1] + 1 if versoes else 1
+    destino = _diretorio_modelo(nome, diretorio) / f'v{versao}'
+    destino.mkdir(parents=True, exist_ok=False)
+
+    metadados = {
+        'nome': nome,
+        'versao': versao,
+        'classe': type(modelo).__name__,
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+        'sklearn': sklearn.__version__,
+        'features': list(features),
+        'lags': lags,
+        'janela_treino': list(janela_treino) if janela_treino is not None else None,
+        'metricas': metricas or {},
+        **extras,
+    }
+
+    joblib.dump(modelo, destino / ARQUIVO_MODELO, compress=0)
+    with open(destino / ARQUIVO_METADADOS, 'w', encoding='utf-8') as arquivo:
+        json.dump(metadados, arquivo, ensure_ascii=False, indent=2, default=_serializavel)
+    return metadados
+
+
+def ler_metadados(nome, versao=None, diretorio=None):
+    """Metadados de uma versão do modelo (a mais recente por padrão)"""
+    if versao is None:
+        versoes = _versoes(nome, diretorio)
+        if not versoes:
+            raise FileNotFoundError(f"Modelo '{nome}' não encontrado no registro")
+        versao = versoes[-1]
+
+    caminho = _diretorio_modelo(nome, diretorio) / f'v{versao}' / ARQUIVO_METADADOS
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def listar_modelos(diretorio=None):
+    """Tabela com todas as versões registradas e suas métricas"""
+    base = Path(diretorio or DIRETORIO_MODELOS)
+    linhas = []
+    if base.is_dir():
+        for item in sorted(base.iterdir()):
+            for versao in _versoes(item.name, base):
+                metadados = ler_metadados(item.name, versao, base)
+                linhas.append({
+                    'nome': metadados['nome'],
+                    'versao': metadados['versao'],
+                    'classe': metadados['classe'],
+                    'criado_em': metadados['criado_em'],
+                    'n_features': len(metadados['features']),
+                    **metadados.get('metricas', {}),
+                })
+    return pd.DataFrame(linhas)
+
+
+def carregar_modelo(nome, versao=None, diretorio=None, mmap_mode='r'):
+    """
+    Carrega o artefato com joblib.load(mmap_mode='r'). Só atributos que são
+    arrays numpy simples (coef_, support_vectors_, componentes do Nystroem...)
+    ficam mapeados no page cache do SO, compartilhados entre processos; as
+    árvores dos ensembles (Random Forest, Gradient Boosting) são reconstruídas
+    no unpickle e ocupam memória própria em cada processo.
+    Retorna (modelo, metadados).
+    """
+    metadados = ler_metadados(nome, versao, diretorio)
+    caminho = _diretorio_modelo(nome, diretorio) / f"v{metadados['versao']}" / ARQUIVO_MODELO
+    return joblib.load(caminho, mmap_mode=mmap_mode), metadados
+
+
+class ModeloRegistrado:
+    """
+    Referência preguiçosa a um modelo do registro: só os metadados são
+    lidos na criação; o artefato é carregado no primeiro uso.
+    """
+
+    def __init__(self, nome, versao=None, diretorio=None, mmap_mode='r'):
+        self.metadados = ler_metadados(nome, versao, diretorio)
+        self.nome = nome
+        self.versao = self.metadados['versao']
+        self.features = self.metadados['features']
+        self._diretorio = diretorio
+        self._mmap_mode = mmap_mode
+        self._modelo = None
+        self._trava = threading.Lock()
+
+    @property
+    def diretorio_versao(self):
+        """Diretório do artefato desta versão (onde ficam também os derivados, ex.: explicador SHAP)"""
+        return _diretorio_modelo(self.nome, self._diretorio) / f'v{self.versao}'
+
+    @property
+    def carregado(self):
+        return self._modelo is not None
+
+    @property
+    def modelo(self):
+        if self._modelo is None:
+            with self._trava:
+                if self._modelo is None:
+                    self._modelo, _ = carregar_modelo(
+                        self.nome, self.versao, self._diretorio, self._mmap_mode
+                    )
+        return self._modelo
+
+    def predict(self, X):
+        """Prevê com as colunas na ordem registrada quando X é um DataFrame"""
+        modelo = self.modelo
+        if isinstance(X, pd.DataFrame):
+            X = X[self.features]
+            if not hasattr(modelo, 'feature_names_in_'):
+                X = X.to_numpy()
+        return modelo.predict(X)
+
+    def __repr__(self):
+        estado = 'carregado' if self.carregado else 'não carregado'
+        return f"ModeloRegistrado({self.nome!r}, versao={self.versao}, {estado})"
+
+
+_modelos_abertos = {}
+_trava_modelos = threading.Lock()
+
+
+def obter_modelo(nome, versao=None, diretorio=None):
+    """
+    Referência preguiçosa compartilhada por processo: chamadas repetidas
+    devolvem o mesmo ModeloRegistrado (e o mesmo artefato carregado).
+    """
+    chave = (nome, versao, str(diretorio or DIRETORIO_MODELOS), os.getpid())
+    with _trava_modelos:
+        if chave not in _modelos_abertos:
+            _modelos_abertos[chave] = ModeloRegistrado(nome, versao, diretorio)
+        return _modelos_abertos[chave]
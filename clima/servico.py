@@ -0,0 +1,391 @@
+"""
+Serviço de Previsão
+Servidor HTTP (biblioteca padrão) com modelo residente em memória, micro-lotes
+de predição e previsão do dia seguinte a partir de um buffer circular
+"""
+
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from .features import FORMATO_NOME_LAG
+from .registro import listar_modelos, obter_modelo
+
+MODELOS_PREVISAO_PADRAO = {
+    'temp_media': 'previsao_temp_media',
+    'temp_maxima': 'previsao_temp_maxima',
+}
+
+
+class HistoricoIncompleto(LookupError):
+    """Falta no buffer a observação de uma data exigida pelos lags (HTTP 422)"""
+
+
+def modelo_padrao(diretorio=None):
+    """
+    Modelo de /predict quando nenhum é informado: o de menor RMSE registrado
+    (ou o mais recente, se nenhum tiver métricas), fora os de previsão do
+    dia seguinte. Falha com mensagem clara se o registro estiver vazio.
+    """
+    modelos = listar_modelos(diretorio)
+    if len(modelos):
+        modelos = modelos[~modelos['nome'].isin(list(MODELOS_PREVISAO_PADRAO.values()))]
+    if not len(modelos):
+        raise FileNotFoundError(
+            "Nenhum modelo no registro: rode scripts/gerar_comparacao_lag_features.py "
+            "ou informe --modelo"
+        )
+    if 'RMSE' in modelos and modelos['RMSE'].notna().any():
+        return modelos.loc[modelos['RMSE'].idxmin(), 'nome']
+    return modelos.sort_values('criado_em')['nome'].iloc[-1]
+
+
+def _predicao_serial(modelo):
+    """
+    Fixa n_jobs=1 (inclusive dentro de pipelines): em lotes pequenos o
+    despacho para várias threads custa mais que a própria predição.
+    """
+    if hasattr(modelo, 'get_params'):
+        parametros = [nome for nome in modelo.get_params() if nome.split('__')[-1] == 'n_jobs']
+        if parametros:
+            modelo.set_params(**{nome: 1 for nome in parametros})
+    return modelo
+
+
+class AnelObservacoes:
+    """
+    Buffer circular das observações diárias de uma estação, endereçado pela
+    data: o dia d ocupa a posição d % capacidade. Uma data repetida
+    sobrescreve a anterior, dias pulados ficam vazios e observações fora de
+    ordem caem na sua própria posição (ou são descartadas, se já mais antigas
+    que a janela).
+    """
+
+    def __init__(self, variaveis, capacidade):
+        self.variaveis = list(variaveis)
+        self.capacidade = capacidade
+        self._valores = np.full((capacidade, len(self.variaveis)), np.nan)
+        self._datas = np.full(capacidade, np.datetime64('NaT'), dtype='datetime64[D]')
+        self._ultima = None
+        self._trava = threading.Lock()
+
+    def adicionar(self, data, valores):
+        """Grava a observação do dia (dict variável -> valor) na posição da sua data"""
+        dia = np.datetime64(pd.Timestamp(data).date(), 'D')
+        linha = [valores.get(variavel, np.nan) for variavel in self.variaveis]
+        with self._trava:
+            if self._ultima is not None and dia <= self._ultima - self.capacidade:
+                return  # mais antiga que a janela: nenhum lag a usaria
+            posicao = dia.astype(np.int64) % self.capacidade
+            self._valores[posicao] = linha
+            self._datas[posicao] = dia
+            if self._ultima is None or dia > self._ultima:
+                self._ultima = dia
+
+    def valores(self, data):
+        """Observação (array na ordem de `variaveis`) da data, ou None se ela não estiver no buffer"""
+        dia = np.datetime64(pd.Timestamp(data).date(), 'D')
+        posicao = dia.astype(np.int64) % self.capacidade
+        with self._trava:
+            if self._datas[posicao] != dia:
+                return None
+            return self._valores[posicao].copy()
+
+    def ultima_data(self):
+        with self._trava:
+            return None if self._ultima is None else pd.Timestamp(self._ultima)
+
+    def ultimas(self):
+        """(datas, valores) presentes no buffer, do mais antigo ao mais recente"""
+        with self._trava:
+            presentes = ~np.isnat(self._datas)
+            ordem = np.flatnonzero(presentes)[np.argsort(self._datas[presentes])]
+            return self._datas[ordem].copy(), self._valores[ordem].copy()
+
+    def __len__(self):
+        with self._trava:
+            return int((~np.isnat(self._datas)).sum())
+
+
+class MicroLote:
+    """
+    Agrupa pedidos concorrentes numa única chamada de model.predict.
+
+    Cada pedido entra numa fila; uma thread junta o que chegou em até
+    `espera_max` segundos (ou `linhas_max` linhas), prevê tudo de uma vez e
+    devolve a fatia de cada pedido pelo seu Future.
+    """
+
+    def __init__(self, modelo, espera_max=0.002, linhas_max=4096):
+        self.modelo = modelo
+        self.espera_max = espera_max
+        self.linhas_max = linhas_max
+        self.chamadas_predict = 0
+        self._fila = deque()
+        self._condicao = threading.Condition()
+        self._thread = threading.Thread(target=self._executar, daemon=True)
+        self._thread.start()
+
+    def prever(self, X):
+        """Prevê as linhas de X (array 2D, colunas na ordem do modelo), aguardando o lote"""
+        futuro = Future()
+        with self._condicao:
+            self._fila.append((np.asarray(X, dtype=np.float64), futuro))
+            self._condicao.notify()
+        return futuro.result()
+
+    def _executar(self):
+        while True:
+            with self._condicao:
+                while not self._fila:
+                    self._condicao.wait()
+            time.sleep(self.espera_max)
+
+            with self._condicao:
+                pedidos = []
+                linhas = 0
+                while self._fila and (not pedidos or linhas + len(self._fila[0][0]) <= self.linhas_max):
+                    X, futuro = self._fila.popleft()
+                    pedidos.append((X, futuro))
+                    linhas += len(X)
+
+            try:
+                previsoes = self.modelo.predict(np.vstack([X for X, _ in pedidos]))
+                self.chamadas_predict += 1
+            except Exception as erro:
+                for _, futuro in pedidos:
+                    futuro.set_exception(erro)
+                continue
+
+            inicio = 0
+            for X, futuro in pedidos:
+                futuro.set_result(previsoes[inicio:inicio + len(X)])
+                inicio += len(X)
+
+
+class Latencias:
+    """Latências recentes por rota, para p50/p99"""
+
+    def __init__(self, janela=10_000):
+        self._amostras = {}
+        self._contagem = {}
+        self._janela = janela
+        self._trava = threading.Lock()
+
+    def registrar(self, rota, segundos):
+        with self._trava:
+            self._amostras.setdefault(rota, deque(maxlen=self._janela)).append(segundos)
+            self._contagem[rota] = self._contagem.get(rota, 0) + 1
+
+    def resumo(self):
+        with self._trava:
+            copia = {rota: np.array(amostras) for rota, amostras in self._amostras.items()}
+            contagem = dict(self._contagem)
+        return {
+            rota: {
+                'requisicoes': contagem[rota],
+                'p50_ms': float(np.percentile(amostras, 50) * 1000),
+                'p99_ms': float(np.percentile(amostras, 99) * 1000),
+            }
+            for rota, amostras in copia.items()
+        }
+
+
+class ServicoPrevisao:
+    """
+    Modelos registrados mantidos carregados, buffers de observações por
+    estação e contadores de latência. Independente do HTTP, para uso direto.
+    """
+
+    def __init__(self, nome_modelo=None, modelos_previsao=None, espera_max=0.002):
+        self.modelo = obter_modelo(nome_modelo or modelo_padrao())
+        self.lote = MicroLote(_predicao_serial(self.modelo.modelo), espera_max)
+
+        self.modelos_previsao = {}
+        for target, nome in (modelos_previsao or {}).items():
+            modelo = obter_modelo(nome)
+            if not modelo.metadados.get('lags'):
+                raise ValueError(f"Modelo de previsão '{nome}' precisa de lag features")
+            self.modelos_previsao[target] = (modelo, MicroLote(_predicao_serial(modelo.modelo), espera_max))
+
+        especificacoes = [modelo.metadados['lags'] for modelo, _ in self.modelos_previsao.values()]
+        self.variaveis_buffer = sorted({variavel for lags in especificacoes for variavel in lags['variaveis']})
+        self.capacidade_buffer = max((max(lags['lags']) for lags in especificacoes), default=1)
+        self.estacoes = {}
+        self._trava_estacoes = threading.Lock()
+        self.latencias = Latencias()
+
+    def aquecer(self):
+        """Força a carga dos artefatos e uma predição de cada modelo"""
+        self.lote.prever(np.zeros((1, len(self.modelo.features))))
+        for modelo, lote in self.modelos_previsao.values():
+            lote.prever(np.zeros((1, len(modelo.features))))
+
+    def _anel(self, estacao, criar=False):
+        with self._trava_estacoes:
+            if estacao not in self.estacoes and criar:
+                self.estacoes[estacao] = AnelObservacoes(self.variaveis_buffer, self.capacidade_buffer)
+            return self.estacoes.get(estacao)
+
+    def carregar_historico(self, dados):
+        """Preenche os buffers com as últimas linhas de cada estação (índice estacao, data)"""
+        for estacao, df_estacao in dados.groupby(level='estacao', sort=False):
+            anel = self._anel(estacao, criar=True)
+            cauda = df_estacao.droplevel('estacao').iloc[-self.capacidade_buffer:]
+            for data, linha in cauda.iterrows():
+                anel.adicionar(data, linha.to_dict())
+
+    def registrar_observacao(self, estacao, data, valores):
+        """Acrescenta a observação diária de uma estação ao seu buffer"""
+        self._anel(estacao, criar=True).adicionar(data, valores)
+
+    def prever(self, linhas):
+        """Prevê uma lista de dicts feature -> valor com o modelo principal"""
+        X = pd.DataFrame(linhas, columns=self.modelo.features).to_numpy(dtype=np.float64)
+        if np.isnan(X).any():
+            faltantes = [f for f, nulo in zip(self.modelo.features, np.isnan(X).any(axis=0)) if nulo]
+            raise ValueError(f"Features ausentes: {', '.join(faltantes)}")
+        return self.lote.prever(X).tolist()
+
+    def previsao_amanha(self, estacao):
+        """Previsão do dia seguinte à última observação no buffer da estação"""
+        anel = self._anel(estacao)
+        if anel is None or len(anel) == 0:
+            raise KeyError(f"Sem observações para a estação {estacao}")
+        amanha = anel.ultima_data() + pd.Timedelta(days=1)
+
+        resposta = {'estacao': estacao, 'data': amanha.strftime('%Y-%m-%d')}
+        for target, (modelo, lote) in self.modelos_previsao.items():
+            lags = modelo.metadados['lags']
+            formato = lags.get('formato', FORMATO_NOME_LAG)
+            # lag k para amanhã = observação da data amanhã - k dias
+            disponiveis = {}
+            for lag in lags['lags']:
+                data = amanha - pd.Timedelta(days=lag)
+                observacao = anel.valores(data)
+                if observacao is None:
+                    raise HistoricoIncompleto(
+                        f"Sem observação de {estacao} em {data:%Y-%m-%d} (lag {lag} para prever {target})"
+                    )
+                for variavel in lags['variaveis']:
+                    disponiveis[formato.format(variavel=variavel, lag=lag)] = \
+                        observacao[self.variaveis_buffer.index(variavel)]
+            X = np.array([[disponiveis.get(feature, np.nan) for feature in modelo.features]])
+            if np.isnan(X).any():
+                faltantes = [f for f, valor in zip(modelo.features, X[0]) if np.isnan(valor)]
+                raise HistoricoIncompleto(f"Valores ausentes para prever {target} em {estacao}: {', '.join(faltantes)}")
+            resposta[target] = float(lote.prever(X)[0])
+        return resposta
+
+    def metricas(self):
+        return {
+            'modelo': {'nome': self.modelo.nome, 'versao': self.modelo.versao},
+            'chamadas_predict': self.lote.chamadas_predict,
+            'estacoes': len(self.estacoes),
+            'latencias': self.latencias.resumo(),
+        }
+
+
+class _Manipulador(BaseHTTPRequestHandler):
+    servico = None
+
+    def log_message(self, formato, *args):
+        pass
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _ler_json(self):
+        tamanho = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(tamanho) or b'{}')
+
+    def _atender(self, rota, funcao):
+        inicio = time.perf_counter()
+        try:
+            status, corpo = 200, funcao()
+        except HistoricoIncompleto as erro:
+            status, corpo = 422, {'erro': str(erro.args[0] if erro.args else erro)}
+        except KeyError as erro:
+            status, corpo = 404, {'erro': str(erro.args[0] if erro.args else erro)}
+        except (ValueError, TypeError, json.JSONDecodeError) as erro:
+            status, corpo = 400, {'erro': str(erro)}
+        self._responder(status, corpo)
+        self.servico.latencias.registrar(rota, time.perf_counter() - inicio)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parametros = parse_qs(url.query)
+        if url.path == '/forecast':
+            estacao = parametros.get('station', [None])[0]
+            if not estacao:
+                return self._responder(400, {'erro': "Parâmetro 'station' obrigatório"})
+            self._atender(url.path, lambda: self.servico.previsao_amanha(estacao))
+        elif url.path == '/metrics':
+            self._responder(200, self.servico.metricas())
+        elif url.path == '/health':
+            self._responder(200, {'status': 'ok'})
+        else:
+            self._responder(404, {'erro': f'Rota não encontrada: {url.path}'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/predict':
+            def prever():
+                corpo = self._ler_json()
+                if not isinstance(corpo, dict):
+                    raise ValueError("O corpo deve ser um objeto JSON ({\"rows\": [...]} ou uma linha)")
+                linhas = corpo['rows'] if 'rows' in corpo else [corpo.get('features', corpo)]
+                if not isinstance(linhas, list) or not all(isinstance(linha, dict) for linha in linhas):
+                    raise ValueError("'rows' deve ser uma lista de objetos {feature: valor}")
+                return {
+                    'predictions': self.servico.prever(linhas),
+                    'modelo': self.servico.modelo.nome,
+                    'versao': self.servico.modelo.versao,
+                }
+            self._atender(url.path, prever)
+        elif url.path == '/observations':
+            def observar():
+                corpo = self._ler_json()
+                if not isinstance(corpo, dict) or not isinstance(corpo.get('valores'), dict):
+                    raise ValueError("O corpo deve ser {\"station\": ..., \"data\": ..., \"valores\": {...}}")
+                faltantes = [campo for campo in ('station', 'data') if corpo.get(campo) in (None, '')]
+                if faltantes:
+                    raise ValueError(f"Campos obrigatórios ausentes: {', '.join(faltantes)}")
+                self.servico.registrar_observacao(corpo['station'], corpo['data'], corpo['valores'])
+                return {'status': 'ok'}
+            self._atender(url.path, observar)
+        else:
+            self._responder(404, {'erro': f'Rota não encontrada: {url.path}'})
+
+
+class _Servidor(ThreadingHTTPServer):
+    # fila de conexões maior que o padrão (5) para rajadas de chamadas concorrentes
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def criar_servidor(servico, host='127.0.0.1', porta=8000):
+    """
+    Cria o servidor HTTP (uma thread por conexão) para o serviço.
+
+    Rotas:
+    - POST /predict       {"rows": [{feature: valor, ...}, ...]} ou uma linha única
+    - GET  /forecast?station=A707  previsão de temp_media/temp_maxima para amanhã
+      (422 se faltar no buffer a observação de alguma data exigida pelos lags)
+    - POST /observations  {"station": ..., "data": ..., "valores": {...}}
+    - GET  /metrics       contadores e latências p50/p99 por rota
+    """
+    manipulador = type('Manipulador', (_Manipulador,), {'servico': servico})
+    return _Servidor((host, porta), manipulador)
@@ -0,0 +1,114 @@
+"""
+Tendências Lineares
+Ajustes de mínimos quadrados em forma fechada a partir de somas acumuladas
+(n, Σx, Σy, Σxy, Σx², Σy²): qualquer janela de datas, par de variáveis e
+estação do ano sai em O(1), sem refazer o ajuste a cada renderização
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .consulta import IndiceDatas
+
+TEMPO = 'tempo'
+
+Ajuste = namedtuple('Ajuste', ['inclinacao', 'intercepto', 'r2', 'n'])
+
+
+def _ajuste(n, sx, sy, sxy, sxx, syy):
+    """Ajuste y = a*x + b a partir das somas; inclinação NaN com menos de 2 pontos ou x constante"""
+    if n < 2:
+        return Ajuste(np.nan, np.nan, np.nan, int(n))
+    sxx_c = sxx - sx * sx / n
+    syy_c = syy - sy * sy / n
+    sxy_c = sxy - sx * sy / n
+    if sxx_c <= 0:
+        return Ajuste(np.nan, sy / n, np.nan, int(n))
+    inclinacao = sxy_c / sxx_c
+    r2 = sxy_c * sxy_c / (sxx_c * syy_c) if syy_c > 0 else np.nan
+    return Ajuste(inclinacao, (sy - inclinacao * sx) / n, r2, int(n))
+
+
+def ajuste_linear(x, y):
+    """Ajuste linear de y em x ignorando os pares com valor ausente (x e y alinhados)"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    validos = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[validos], y[validos]
+    return _ajuste(len(x), x.sum(), y.sum(), (x * y).sum(), (x * x).sum(), (y * y).sum())
+
+
+def valores_ajuste(ajuste, x):
+    """Valores da reta ajustada em x"""
+    return ajuste.intercepto + ajuste.inclinacao * np.asarray(x, dtype=np.float64)
+
+
+class SomasAcumuladas:
+    """
+    Somas acumuladas de um par (x, y) em ordem de data. Pares com algum
+    valor ausente (ou fora da `mascara`) contribuem zero. As somas de
+    qualquer intervalo de posições [a, b) são diferenças de dois prefixos.
+    """
+
+    def __init__(self, x, y, mascara=None):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        validos = ~(np.isnan(x) | np.isnan(y))
+        if mascara is not None:
+            validos &= np.asarray(mascara, dtype=bool)
+        x, y = np.where(validos, x, 0.0), np.where(validos, y, 0.0)
+        termos = np.stack([validos.astype(np.float64), x, y, x * y, x * x, y * y])
+        # coluna 0 é o prefixo vazio: somas de [a, b) = prefixo[b] - prefixo[a]
+        self.prefixos = np.zeros((6, len(x) + 1))
+        np.cumsum(termos, axis=1, out=self.prefixos[:, 1:])
+
+    def ajuste(self, inicio=0, fim=None):
+        """Ajuste linear das posições [inicio, fim)"""
+        fim = self.prefixos.shape[1] - 1 if fim is None else fim
+        return _ajuste(*(self.prefixos[:, fim] - self.prefixos[:, inicio]))
+
+
+class MotorTendencias:
+    """
+    Tendências e regressões entre variáveis de uma série diária ordenada.
+
+    O eixo TEMPO é medido em dias desde a primeira data (valores pequenos
+    mantêm a precisão das somas). Somas acumuladas são criadas na primeira
+    consulta de cada (x, y, estação do ano) e reaproveitadas; a janela de
+    datas vira posições por busca binária no IndiceDatas.
+    """
+
+    def __init__(self, dados, coluna_data='data', grupo=None, coluna_estacao='estacao_ano'):
+        self.indice = dados if isinstance(dados, IndiceDatas) else IndiceDatas(dados, coluna_data, grupo)
+        self.coluna_estacao = coluna_estacao
+        datas = self.indice.datas
+        self.origem = datas[0] if len(datas) else pd.Timestamp(0)
+        self._dias = ((datas - self.origem) / pd.Timedelta(days=1)).to_numpy(dtype=np.float64)
+        self._somas = {}
+
+    def _valores(self, variavel):
+        return self._dias if variavel == TEMPO else self.indice.df[variavel].to_numpy(dtype=np.float64)
+
+    def somas(self, y, x=TEMPO, estacao_ano=None):
+        chave = (x, y, estacao_ano)
+        if chave not in self._somas:
+            mascara = None
+            if estacao_ano is not None:
+                mascara = self.indice.df[self.coluna_estacao].to_numpy() == estacao_ano
+            self._somas[chave] = SomasAcumuladas(self._valores(x), self._valores(y), mascara)
+        return self._somas[chave]
+
+    def tendencia(self, y, x=TEMPO, inicio=None, fim=None, estacao_ano=None, grupo=None):
+        """Ajuste de y em x (TEMPO: por dia) na janela [inicio, fim] e, opcionalmente, numa estação do ano"""
+        posicoes = self.indice.posicoes(inicio, fim, grupo)
+        return self.somas(y, x, estacao_ano).ajuste(posicoes.start, posicoes.stop)
+
+    def dias(self, datas):
+        """Datas convertidas para o eixo TEMPO do motor"""
+        return ((pd.DatetimeIndex(datas) - self.origem) / pd.Timedelta(days=1)).to_numpy(dtype=np.float64)
+
+    def linha_tempo(self, ajuste, datas):
+        """Valores da tendência temporal nas datas dadas"""
+        return valores_ajuste(ajuste, self.dias(datas))
@@ -0,0 +1,68 @@
+"""
+Validação Temporal
+Divisões walk-forward (janela expansível ou deslizante) como fatias contíguas
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def ordenar_por_data(X, y, datas):
+    """
+    Ordena X, y e datas pela data (ordenação estável) numa única cópia
+    contígua, para que os folds temporais sejam fatias (views) sem cópia.
+    """
+    datas = pd.DatetimeIndex(datas)
+    ordem = np.argsort(datas.asi8, kind='stable')
+    if np.all(ordem[1:] > ordem[:-1]):
+        return np.ascontiguousarray(X), np.ascontiguousarray(y), datas
+    return (
+        np.ascontiguousarray(np.asarray(X)[ordem]),
+        np.ascontiguousarray(np.asarray(y)[ordem]),
+        datas[ordem],
+    )
+
+
+def divisao_temporal(n_amostras, datas=None, n_folds=5, tamanho_teste=None,
+                     janela_treino=None, intervalo=0):
+    """
+    Divisões walk-forward sobre amostras em ordem cronológica.
+
+    - n_folds: número de blocos de teste consecutivos no fim da série
+    - tamanho_teste: tamanho de cada bloco (padrão: n // (n_folds + 1))
+    - janela_treino: se informado, o treino é uma janela deslizante desse
+      tamanho; senão a janela é expansível desde o início
+    - intervalo: amostras descartadas entre treino e teste (evita que lags
+      do teste vejam o fim do treino)
+
+    Com `datas` (ordenadas), tamanhos são contados em dias distintos e as
+    fronteiras nunca separam linhas da mesma data (várias estações).
+    Retorna uma lista de (slice_treino, slice_teste).
+    """
+    if datas is not None:
+        datas = pd.DatetimeIndex(datas)
+        dias = datas.unique()
+        posicoes = np.searchsorted(datas.asi8, dias.asi8, side='left')
+        posicoes = np.append(posicoes, n_amostras)
+        n_unidades = len(dias)
+    else:
+        posicoes = np.arange(n_amostras + 1)
+        n_unidades = n_amostras
+
+    if tamanho_teste is None:
+        tamanho_teste = n_unidades // (n_folds + 1)
+    if tamanho_teste < 1 or n_unidades - n_folds * tamanho_teste - intervalo < 1:
+        raise ValueError(
+            f"Série curta demais para {n_folds} folds de teste com {tamanho_teste} amostras"
+        )
+
+    divisoes = []
+    for fold in range(n_folds):
+        inicio_teste = n_unidades - (n_folds - fold) * tamanho_teste
+        fim_treino = inicio_teste - intervalo
+        inicio_treino = 0 if janela_treino is None else max(0, fim_treino - janela_treino)
+        divisoes.append((
+            slice(int(posicoes[inicio_treino]), int(posicoes[fim_treino])),
+            slice(int(posicoes[inicio_teste]), int(posicoes[inicio_teste + tamanho_teste])),
+        ))
+    return divisoes
@@ -16,6 +16,23 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 import io
 import base64
+import sys
+import time
+from pathlib import Path
+from flask import jsonify
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.features import categoria_precipitacao, criar_lag_features, estacao_do_ano
+from clima.cache_figuras import CacheFiguras
+from clima.consulta import TAMANHO_PAGINA, IndiceDatas, consultar_pagina
+from clima.ingestao import carregar_estacoes, versao_origem
+from clima.reducao import Piramide, pontos_para_largura
+from clima.tendencias import MotorTendencias, valores_ajuste
+
+# Figuras serializadas por (aba, entradas, versão dos dados); o diretório é
+# compartilhado entre os processos que servem o dashboard
+DIRETORIO_CACHE_FIGURAS = Path(__file__).resolve().parent / '.cache' / 'figuras'
+cache_figuras = CacheFiguras(diretorio=DIRETORIO_CACHE_FIGURAS)
 
 # Configuração de cores e estilo
 COLORS = {
@@ -34,52 +51,36 @@ COLORS = {
 class ClimateDataProcessor:
     """Classe para processamento dos dados climáticos"""
     
-    def __init__(self):
+    def __init__(self, origem_inmet=None, estacao=None):
+        # CSV, diretório ou glob de exports do INMET
+        self.origem_inmet = origem_inmet or "/home/iioulos/Documents/IC_Danilo-Cotozika/Dados do INEP que eu solicitei/dados_A707_D_2014-01-01_2025-05-01.csv"
+        self.estacao = estacao
+        self.estacoes = None
+        self.df_estacoes = None
         self.df_original = None
         self.df_with_lags = None
         self.model_results = None
         self.comparison_results = None
         self.improvements = None
+        self.piramides = {}
+        self.indice = None
+        self.tendencias = None
+        self.versao = None
         
     def load_data(self):
         """Carrega todos os datasets necessários"""
         try:
-            # Dados originais do INMET
-            inmet_path = "/home/iioulos/Documents/IC_Danilo-Cotozika/Dados do INEP que eu solicitei/dados_A707_D_2014-01-01_2025-05-01.csv"
+            # Dados originais do INMET (todas as estações, com cache colunar)
+            self.versao = versao_origem(self.origem_inmet)
+            self.df_estacoes, self.estacoes = carregar_estacoes(self.origem_inmet)
             
-            # Definir colunas
-            colunas = [
-                'data', 'precipitacao_total', 'pressao_atm_media', 
-                'temp_orvalho_media', 'temp_maxima', 'temp_media', 
-                'temp_minima', 'umidade_relativa_media', 
-                'umidade_relativa_minima', 'umidade_relativa_maxima', 
-                'vento_vel_media'
-            ]
-            
-            # Carregar dados originais (pulando metadados)
-            self.df_original = pd.read_csv(
-                inmet_path,
-                sep=',', 
-                encoding='latin1',
-                skiprows=11,
-                header=None,
-                names=colunas
-            )
+            # Estação exibida no dashboard (primeira disponível por padrão)
+            if self.estacao is None:
+                self.estacao = self.estacoes.index[0]
+            self.df_original = self.df_estacoes.loc[self.estacao].reset_index()
             
-            # Converter data e limpar dados
-            self.df_original['data'] = pd.to_datetime(self.df_original['data'])
-            for col in self.df_original.columns:
-                if col != 'data':
-                    self.df_original[col] = pd.to_numeric(self.df_original[col], errors='coerce')
-            
-            # Interpolação de valores faltantes
-            self.df_original = self.df_original.set_index('data')
-            self.df_original = self.df_original.interpolate(method='time')
-            self.df_original = self.df_original.reset_index()
-            
-            # Carregar dados com lag features
-            self.df_with_lags = pd.read_csv("/home/iioulos/Documents/IC_Danilo-Cotozika/dados_climaticos_com_lags.csv")
-            self.df_with_lags['data'] = pd.to_datetime(self.df_with_lags['data'])
+            # Lag features geradas a partir dos dados originais
+            self.df_with_lags = criar_lag_features(self.df_original)
             
             # Carregar resultados dos modelos
             self.model_results = pd.read_csv("/home/iioulos/Documents/IC_Danilo-Cotozika/model_comparison_results.csv", index_col=0)
@@ -97,39 +98,32 @@ class ClimateDataProcessor:
             print(f"Erro ao carregar dados: {e}")
             return False
     
+    def piramide(self, variavel):
+        """Pirâmide de resoluções da variável (construída no primeiro uso)"""
+        if variavel not in self.piramides:
+            self.piramides[variavel] = Piramide(self.df_original['data'].to_numpy(), self.df_original[variavel].to_numpy())
+        return self.piramides[variavel]
+    
+    def figura(self, aba, nome, construir, *entradas):
+        """Figura em cache para esta estação e versão dos dados (construída só na primeira vez)"""
+        return cache_figuras.figura(aba, [nome, self.estacao, *entradas], self.versao, construir)
+    
     def add_derived_features(self):
         """Adiciona features derivadas aos dados"""
-        # Adicionar estação do ano
-        def get_season(month):
-            if month in [12, 1, 2]:
-                return 'Verão'
-            elif month in [3, 4, 5]:
-                return 'Outono'
-            elif month in [6, 7, 8]:
-                return 'Inverno'
-            else:
-                return 'Primavera'
-        
-        self.df_original['estacao'] = self.df_original['data'].dt.month.apply(get_season)
-        
-        # Categorias de precipitação
-        def categorize_precipitation(precip):
-            if precip == 0:
-                return 'Nenhuma'
-            elif precip <= 2.5:
-                return 'Leve'
-            elif precip <= 10:
-                return 'Moderada'
-            else:
-                return 'Pesada'
-        
-        self.df_original['categoria_precipitacao'] = self.df_original['precipitacao_total'].apply(categorize_precipitation)
+        # Estação do ano e categorias de precipitação (vetorizado)
+        self.df_original['estacao'] = estacao_do_ano(self.df_original['data'])
+        self.df_original['categoria_precipitacao'] = categoria_precipitacao(self.df_original['precipitacao_total'])
         
         # Extremos de temperatura
         self.df_original['temp_extrema'] = (
             (self.df_original['temp_maxima'] > self.df_original['temp_maxima'].quantile(0.95)) |
             (self.df_original['temp_minima'] < self.df_original['temp_minima'].quantile(0.05))
         )
+        
+        # Recortes de período por busca binária (a coluna 'estacao' aqui já é a estação do ano)
+        self.indice = IndiceDatas(self.df_original, colunas_calendario=False)
+        self.df_original = self.indice.df
+        self.tendencias = MotorTendencias(self.indice, coluna_estacao='estacao')
 
 # Inicializar processador de dados
 processor = ClimateDataProcessor()
@@ -141,9 +135,25 @@ else:
     print("Falha ao carregar dados. Verificar caminhos dos arquivos.")
 
 # Inicializar app Dash
-app = dash.Dash(__name__)
+# As abas são montadas sob demanda: os componentes dos callbacks não estão no layout inicial
+app = dash.Dash(__name__, suppress_callback_exceptions=True)
 app.title = "Dashboard Climático - Análise INMET"
 
+# Aplicação WSGI (Flask) para servidores multi-processo: gunicorn -c gunicorn.conf.py wsgi:server
+server = app.server
+
+@server.route('/health')
+def health():
+    """Estado do worker: dados carregados, versão dos dados e uso do cache de figuras"""
+    carregado = processor.df_original is not None
+    return jsonify({
+        'status': 'ok' if carregado else 'erro',
+        'estacao': processor.estacao,
+        'versao_dados': processor.versao,
+        'registros': len(processor.df_original) if carregado else 0,
+        'cache_figuras': cache_figuras.estatisticas(),
+    }), 200 if carregado else 503
+
 # Layout principal
 app.layout = html.Div([
     # Header
@@ -374,36 +384,56 @@ def create_timeseries_tab():
         dcc.Graph(id='timeseries-plot')
     ])
 
+def janela_zoom(relayout):
+    """Intervalo (início, fim) do eixo x após um zoom, ou (None, None) para a série toda"""
+    if not relayout or relayout.get('xaxis.autorange'):
+        return None, None
+    if 'xaxis.range[0]' in relayout:
+        return relayout['xaxis.range[0]'], relayout['xaxis.range[1]']
+    if 'xaxis.range' in relayout:
+        return tuple(relayout['xaxis.range'])
+    return None, None
+
 @app.callback(
     Output('timeseries-plot', 'figure'),
-    Input('timeseries-variables', 'value')
+    Input('timeseries-variables', 'value'),
+    Input('timeseries-plot', 'relayoutData')
 )
-def update_timeseries(selected_vars):
+def update_timeseries(selected_vars, relayout):
     if not selected_vars or processor.df_original is None:
         return go.Figure()
     
-    df = processor.df_original
-    fig = go.Figure()
-    
-    colors = [COLORS['primary'], COLORS['success'], COLORS['warning'], COLORS['secondary']]
-    
-    for i, var in enumerate(selected_vars):
-        fig.add_trace(go.Scatter(
-            x=df['data'],
-            y=df[var],
-            mode='lines',
-            name=var.replace('_', ' ').title(),
-            line=dict(color=colors[i % len(colors)])
-        ))
+    # Só os pontos da janela visível, no nível da pirâmide que cabe na largura do gráfico;
+    # a chave do cache é o recorte (nível e fatia) de cada série, não o zoom exato
+    inicio, fim = janela_zoom(relayout)
+    n_pontos = pontos_para_largura()
+    recortes = [processor.piramide(var).recorte(inicio, fim, n_pontos) for var in selected_vars]
     
-    fig.update_layout(
-        title='Séries Temporais das Variáveis Selecionadas',
-        xaxis_title='Data',
-        yaxis_title='Valores',
-        hovermode='x unified'
-    )
+    def build_timeseries():
+        fig = go.Figure()
+        
+        colors = [COLORS['primary'], COLORS['success'], COLORS['warning'], COLORS['secondary']]
+        
+        for i, var in enumerate(selected_vars):
+            x, y = processor.piramide(var).janela(inicio, fim, n_pontos)
+            fig.add_trace(go.Scatter(
+                x=x,
+                y=y,
+                mode='lines',
+                name=var.replace('_', ' ').title(),
+                line=dict(color=colors[i % len(colors)])
+            ))
+        
+        fig.update_layout(
+            title='Séries Temporais das Variáveis Selecionadas',
+            xaxis_title='Data',
+            yaxis_title='Valores',
+            hovermode='x unified',
+            uirevision='timeseries'  # o zoom do usuário fica no cliente
+        )
+        return fig
     
-    return fig
+    return processor.figura('timeseries', 'series', build_timeseries, selected_vars, recortes)
 
 def create_correlation_tab():
     """Cria a aba de correlação"""
@@ -414,15 +444,13 @@ def create_correlation_tab():
     numeric_cols = ['temp_media', 'temp_minima', 'temp_maxima', 'umidade_relativa_media', 
                    'pressao_atm_media', 'precipitacao_total', 'vento_vel_media']
     
-    corr_matrix = processor.df_original[numeric_cols].corr()
-    
-    fig_corr = px.imshow(
-        corr_matrix,
+    fig_corr = processor.figura('correlation', 'matriz', lambda: px.imshow(
+        processor.df_original[numeric_cols].corr(),
         text_auto=True,
         aspect="auto",
         title="Mapa de Correlação entre Variáveis Climáticas",
         color_continuous_scale='RdBu_r'
-    )
+    ))
     
     # Correlação com lag features (se disponível)
     lag_content = html.Div("Dados de lag features não disponíveis")
@@ -430,22 +458,24 @@ def create_correlation_tab():
     if processor.df_with_lags is not None:
         lag_cols = [col for col in processor.df_with_lags.columns if '_lag' in col]
         if lag_cols:
-            lag_corr = processor.df_with_lags[lag_cols + ['temp_media']].corr()['temp_media'].sort_values(ascending=False)
-            
-            fig_lag_corr = go.Figure(data=go.Bar(
-                x=lag_corr.index[1:11],  # Top 10 correlações (excluindo auto-correlação)
-                y=lag_corr.values[1:11],
-                marker_color=COLORS['success']
-            ))
-            
-            fig_lag_corr.update_layout(
-                title='Top 10 Correlações com Lag Features',
-                xaxis_title='Lag Features',
-                yaxis_title='Correlação com Temperatura Média',
-                xaxis_tickangle=-45
-            )
+            def build_lag_corr():
+                lag_corr = processor.df_with_lags[lag_cols + ['temp_media']].corr()['temp_media'].sort_values(ascending=False)
+                
+                fig_lag_corr = go.Figure(data=go.Bar(
+                    x=lag_corr.index[1:11],  # Top 10 correlações (excluindo auto-correlação)
+                    y=lag_corr.values[1:11],
+                    marker_color=COLORS['success']
+                ))
+                
+                fig_lag_corr.update_layout(
+                    title='Top 10 Correlações com Lag Features',
+                    xaxis_title='Lag Features',
+                    yaxis_title='Correlação com Temperatura Média',
+                    xaxis_tickangle=-45
+                )
+                return fig_lag_corr
             
-            lag_content = dcc.Graph(figure=fig_lag_corr)
+            lag_content = dcc.Graph(figure=processor.figura('correlation', 'lags', build_lag_corr))
     
     return html.Div([
         html.H3("Análise de Correlação"),
@@ -463,34 +493,34 @@ def create_distributions_tab():
     df = processor.df_original
     
     # Histograma de temperatura
-    fig_temp_hist = px.histogram(
+    fig_temp_hist = processor.figura('distributions', 'hist_temp', lambda: px.histogram(
         df, x='temp_media', nbins=50,
         title='Distribuição da Temperatura Média',
         color_discrete_sequence=[COLORS['primary']]
-    )
+    ))
     
     # Histograma de umidade
-    fig_humidity_hist = px.histogram(
+    fig_humidity_hist = processor.figura('distributions', 'hist_umidade', lambda: px.histogram(
         df, x='umidade_relativa_media', nbins=50,
         title='Distribuição da Umidade Relativa',
         color_discrete_sequence=[COLORS['success']]
-    )
+    ))
     
     # Box plot de temperatura por estação
-    fig_temp_box = px.box(
+    fig_temp_box = processor.figura('distributions', 'box_temp', lambda: px.box(
         df, x='estacao', y='temp_media',
         title='Temperatura por Estação',
         color='estacao',
         color_discrete_sequence=px.colors.qualitative.Set3
-    )
+    ))
     
     # Densidade de precipitação
-    fig_precip_density = px.histogram(
+    fig_precip_density = processor.figura('distributions', 'densidade_precip', lambda: px.histogram(
         df[df['precipitacao_total'] > 0], x='precipitacao_total',
         title='Densidade de Precipitação (dias com chuva)',
         nbins=50,
         color_discrete_sequence=[COLORS['warning']]
-    )
+    ))
     
     return html.Div([
         html.Div([
@@ -504,6 +534,22 @@ def create_distributions_tab():
         ])
     ])
 
+def scatter_with_trends(df, x, y, title):
+    """Scatter colorido por estação do ano, com uma reta de mínimos quadrados por estação (somas acumuladas)"""
+    fig = px.scatter(
+        df, x=x, y=y,
+        title=title,
+        color='estacao',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    for trace in list(fig.data):
+        ajuste = processor.tendencias.tendencia(y, x=x, estacao_ano=trace.name)
+        extremos = np.array([np.nanmin(trace.x), np.nanmax(trace.x)], dtype=float)
+        fig.add_scatter(x=extremos, y=valores_ajuste(ajuste, extremos), mode='lines',
+                        name=f'{trace.name} (tendência)', line=dict(color=trace.marker.color),
+                        showlegend=False)
+    return fig
+
 def create_scatter_tab():
     """Cria a aba de scatter plots"""
     if processor.df_original is None:
@@ -512,30 +558,22 @@ def create_scatter_tab():
     df = processor.df_original
     
     # Temperatura vs Umidade
-    fig_temp_humidity = px.scatter(
-        df, x='temp_media', y='umidade_relativa_media',
-        title='Temperatura vs Umidade',
-        color='estacao',
-        color_discrete_sequence=px.colors.qualitative.Set3,
-        trendline="ols"
-    )
+    fig_temp_humidity = processor.figura('scatter', 'temp_umidade', lambda: scatter_with_trends(
+        df, 'temp_media', 'umidade_relativa_media', 'Temperatura vs Umidade'
+    ))
     
     # Pressão vs Temperatura
-    fig_pressure_temp = px.scatter(
-        df, x='pressao_atm_media', y='temp_media',
-        title='Pressão vs Temperatura',
-        color='estacao',
-        color_discrete_sequence=px.colors.qualitative.Set3,
-        trendline="ols"
-    )
+    fig_pressure_temp = processor.figura('scatter', 'pressao_temp', lambda: scatter_with_trends(
+        df, 'pressao_atm_media', 'temp_media', 'Pressão vs Temperatura'
+    ))
     
     # Precipitação vs Umidade
-    fig_precip_humidity = px.scatter(
+    fig_precip_humidity = processor.figura('scatter', 'precip_umidade', lambda: px.scatter(
         df, x='precipitacao_total', y='umidade_relativa_media',
         title='Precipitação vs Umidade',
         color='categoria_precipitacao',
         color_discrete_sequence=px.colors.qualitative.Pastel
-    )
+    ))
     
     # Previsto vs Real (usando melhor modelo se disponível)
     scatter_predicted = html.Div("Gráfico de predição vs real não disponível (modelo não carregado)")
@@ -557,11 +595,7 @@ def create_data_tab():
     if processor.df_original is None:
         return html.Div("Erro: Dados não carregados")
     
-    df = processor.df_original.copy()
-    
-    # Preparar dados para a tabela
-    df_display = df.round(2)
-    df_display['data'] = df_display['data'].dt.strftime('%Y-%m-%d')
+    df = processor.df_original
     
     return html.Div([
         html.H3("Dados Brutos Interativos"),
@@ -576,13 +610,18 @@ def create_data_tab():
             )
         ], style={'margin': '20px 0'}),
         
+        # Paginação, filtro e ordenação no servidor: só a página visível trafega
         dash_table.DataTable(
             id='data-table',
-            columns=[{"name": col, "id": col} for col in df_display.columns],
-            data=df_display.head(100).to_dict('records'),  # Primeiros 100 registros
-            page_size=20,
-            sort_action="native",
-            filter_action="native",
+            columns=[{"name": col, "id": col} for col in df.columns],
+            page_current=0,
+            page_size=TAMANHO_PAGINA,
+            page_action="custom",
+            sort_action="custom",
+            sort_mode="multi",
+            sort_by=[],
+            filter_action="custom",
+            filter_query='',
             style_cell={'textAlign': 'center', 'fontSize': '12px'},
             style_header={'backgroundColor': COLORS['primary'], 'color': 'white'},
             style_data_conditional=[
@@ -595,9 +634,60 @@ def create_data_tab():
                     'color': 'black',
                 }
             ]
-        )
+        ),
+        html.P(id='data-table-info', style={'color': COLORS['dark'], 'marginTop': '10px'})
     ])
 
+@app.callback(
+    Output('data-table', 'data'),
+    Output('data-table', 'page_count'),
+    Output('data-table-info', 'children'),
+    Input('data-table', 'page_current'),
+    Input('data-table', 'page_size'),
+    Input('data-table', 'sort_by'),
+    Input('data-table', 'filter_query'),
+    Input('date-range-picker', 'start_date'),
+    Input('date-range-picker', 'end_date')
+)
+def update_table(page_current, page_size, sort_by, filter_query, start_date, end_date):
+    if processor.indice is None:
+        return [], 0, "Erro: Dados não carregados"
+    
+    try:
+        pagina, total = consultar_pagina(
+            processor.indice.fatia(start_date, end_date), page_current or 0, page_size, filter_query, sort_by
+        )
+    except ValueError as e:
+        return [], 0, f"Filtro inválido: {e}"
+    
+    # Arredondamento e formatação só das linhas da página
+    pagina = pagina.round(2)
+    pagina['data'] = pagina['data'].dt.strftime('%Y-%m-%d')
+    n_paginas = max(-(-total // page_size), 1)
+    return pagina.to_dict('records'), n_paginas, f"{total:,} registros no período e filtro selecionados"
+
+# Abas cujas figuras são caras de montar; renderizadas uma vez antes de atender usuários
+ABAS_AQUECIMENTO = ['overview', 'timeseries', 'correlation', 'distributions', 'scatter']
+
+def aquecer():
+    """
+    Pré-renderiza as abas pesadas: as figuras vão para o cache (memória e
+    disco) e as pirâmides das séries ficam prontas. Chamado antes do fork,
+    o resultado é herdado por todos os workers.
+    """
+    if processor.df_original is None:
+        return 0.0
+    inicio = time.perf_counter()
+    for aba in ABAS_AQUECIMENTO:
+        try:
+            render_content(aba)
+        except Exception as e:
+            print(f"Aviso: aquecimento da aba '{aba}' falhou: {e}")
+    update_timeseries(['temp_media', 'umidade_relativa_media'], None)
+    duracao = time.perf_counter() - inicio
+    print(f"Aquecimento concluído em {duracao:.1f}s ({cache_figuras.estatisticas()['itens_memoria']} figuras em cache)")
+    return duracao
+
 if __name__ == '__main__':
     print("Iniciando Dashboard Climático...")
     print("Acesse: http://localhost:8050")
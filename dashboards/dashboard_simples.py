@@ -12,9 +12,14 @@ import streamlit as st
 import warnings
 import os
 import joblib
+import sys
 from datetime import datetime, timedelta
+from pathlib import Path
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.tendencias import ajuste_linear, valores_ajuste
+
 # Configuração da página
 st.set_page_config(
     page_title="Dashboard Climático",
@@ -119,12 +124,13 @@ def create_trend_plot(data, x_col, y_col, title):
     fig = px.line(data, x=x_col, y=y_col, title=title,
                   color_discrete_sequence=[COLORS['primary']])
     
-    # Adicionar linha de tendência
-    z = np.polyfit(range(len(data)), data[y_col].dropna(), 1)
-    p = np.poly1d(z)
-    fig.add_scatter(x=data[x_col], y=p(range(len(data))), 
-                   mode='lines', name='Tendência', 
-                   line=dict(dash='dash', color=COLORS['secondary']))
+    # Adicionar linha de tendência (dias e valores alinhados; pares com NaN ignorados)
+    if len(data) > 1:
+        dias = (data[x_col] - data[x_col].iloc[0]) / pd.Timedelta(days=1)
+        ajuste = ajuste_linear(dias, data[y_col])
+        fig.add_scatter(x=data[x_col].iloc[[0, -1]], y=valores_ajuste(ajuste, dias.iloc[[0, -1]]), 
+                       mode='lines', name='Tendência', 
+                       line=dict(dash='dash', color=COLORS['secondary']))
     
     fig.update_layout(
         xaxis_title=x_col.title(),
@@ -410,27 +416,13 @@ elif st.session_state.current_page == 'scatter':
                            color_discrete_sequence=[COLORS['primary']],
                            opacity=0.6)
     
-    # Adicionar linha de tendência usando statsmodels
-    try:
-        import statsmodels.api as sm
-        
-        # Remover valores NaN
-        data_clean = dados_lag[[var_x, var_y]].dropna()
-        
-        if len(data_clean) > 0:
-            X = sm.add_constant(data_clean[var_x])
-            model = sm.OLS(data_clean[var_y], X).fit()
-            
-            # Criar linha de predição
-            x_range = np.linspace(data_clean[var_x].min(), data_clean[var_x].max(), 100)
-            X_pred = sm.add_constant(x_range)
-            y_pred = model.predict(X_pred)
-            
-            fig_scatter.add_scatter(x=x_range, y=y_pred, mode='lines', 
-                                  name='Linha de Tendência',
-                                  line=dict(color=COLORS['secondary'], width=3))
-    except ImportError:
-        st.warning("Statsmodels não instalado. Linha de tendência não disponível.")
+    # Adicionar linha de tendência (mínimos quadrados em forma fechada)
+    ajuste = ajuste_linear(dados_lag[var_x], dados_lag[var_y])
+    if ajuste.n > 1 and var_x != var_y:
+        x_range = np.array([dados_lag[var_x].min(), dados_lag[var_x].max()])
+        fig_scatter.add_scatter(x=x_range, y=valores_ajuste(ajuste, x_range), mode='lines', 
+                              name='Linha de Tendência',
+                              line=dict(color=COLORS['secondary'], width=3))
     
     fig_scatter.update_layout(height=500)
     st.plotly_chart(fig_scatter, use_container_width=True)
@@ -12,9 +12,17 @@ import streamlit as st
 import warnings
 import os
 import joblib
+import sys
 from datetime import datetime, timedelta
+from pathlib import Path
 warnings.filterwarnings('ignore')
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.agregados import carregar_agregados, N_LINHAS_BORDA
+from clima.consulta import IndiceDatas
+from clima.reducao import Piramide, pontos_para_largura
+from clima.tendencias import MotorTendencias, ajuste_linear, valores_ajuste
+
 # Configuração da página
 st.set_page_config(
     page_title="Dashboard Climático",
@@ -89,42 +97,88 @@ COLORS = {
     'info': '#17a2b8'
 }
 
-# Cache para carregar dados
+ARQUIVO_DADOS = 'dados_climaticos_com_lags.csv'
+
+def versao_arquivo(caminho):
+    """(mtime, tamanho): chave de cache que muda quando o arquivo é regravado ou recebe linhas"""
+    stat = os.stat(caminho)
+    return stat.st_mtime_ns, stat.st_size
+
+# Agregados pré-calculados: a chave do cache é a versão do arquivo (mtime, tamanho),
+# então cada rerun custa um stat e as páginas só leem tabelas pequenas
 @st.cache_data
+def load_aggregates(caminho, versao):
+    """Tabelas agregadas (rollups, histogramas, quantis, correlações) dos dados principais"""
+    return carregar_agregados(caminho)
+
+@st.cache_data
+def load_csv(caminho, versao):
+    """CSV de resultados, relido só quando a versão do arquivo muda"""
+    return pd.read_csv(caminho)
+
+# Sem cache próprio: os stats rodam a cada rerun e só os arquivos alterados são relidos
 def load_data():
     """Carrega todos os datasets necessários"""
     try:
-        # Carregar dados principais
-        dados_lag = pd.read_csv('dados_climaticos_com_lags.csv')
-        dados_lag['data'] = pd.to_datetime(dados_lag['data'])
+        # Dados principais, como agregados recalculados só quando o arquivo muda
+        agregados = load_aggregates(ARQUIVO_DADOS, versao_arquivo(ARQUIVO_DADOS))
         
         # Comparação de modelos
-        comparison_df = pd.read_csv('model_comparison_results.csv')
+        comparison_df = load_csv('model_comparison_results.csv', versao_arquivo('model_comparison_results.csv'))
         
         # Melhorias com lag features
-        melhorias_df = pd.read_csv('melhorias_lag_features.csv')
+        melhorias_df = load_csv('melhorias_lag_features.csv', versao_arquivo('melhorias_lag_features.csv'))
         
         # Comparação completa lag features
-        comparacao_completa = pd.read_csv('comparacao_lag_features_completa.csv')
+        comparacao_completa = load_csv('comparacao_lag_features_completa.csv',
+                                       versao_arquivo('comparacao_lag_features_completa.csv'))
         
-        return dados_lag, comparison_df, melhorias_df, comparacao_completa
+        return agregados, comparison_df, melhorias_df, comparacao_completa
     
     except FileNotFoundError as e:
         st.error(f"Arquivo não encontrado: {e}")
         return None, None, None, None
 
+# Rollup diário ordenado por data, com mês e estação do ano já calculados
+@st.cache_resource
+def load_daily_index(versao, _dados):
+    """Índice de datas do rollup diário: recortes de período por busca binária"""
+    return IndiceDatas(_dados)
+
+# Somas acumuladas para tendências de qualquer período em O(1)
+@st.cache_resource
+def load_trends(versao, _indice):
+    """Motor de tendências lineares sobre o rollup diário"""
+    return MotorTendencias(_indice)
+
+# Pirâmide de resoluções de cada variável do rollup diário, uma por versão dos agregados
+@st.cache_resource
+def load_pyramid(versao, variavel, _dados):
+    """Níveis LTTB da série diária: qualquer período é desenhado com alguns milhares de pontos"""
+    return Piramide(_dados['data'].to_numpy(), _dados[variavel].to_numpy())
+
 # Função para criar gráfico de tendência
-def create_trend_plot(data, x_col, y_col, title):
-    """Cria gráfico de linha com tendência"""
+def create_trend_plot(data, x_col, y_col, title, motor=None, inicio=None, fim=None):
+    """
+    Cria gráfico de linha com tendência. Com `motor`, a reta vem das somas
+    acumuladas do período [inicio, fim] completo (não só dos pontos desenhados)
+    """
     fig = px.line(data, x=x_col, y=y_col, title=title,
                   color_discrete_sequence=[COLORS['primary']])
     
-    # Adicionar linha de tendência
-    z = np.polyfit(range(len(data)), data[y_col].dropna(), 1)
-    p = np.poly1d(z)
-    fig.add_scatter(x=data[x_col], y=p(range(len(data))), 
-                   mode='lines', name='Tendência', 
-                   line=dict(dash='dash', color=COLORS['secondary']))
+    # Adicionar linha de tendência (uma reta: bastam as duas extremidades)
+    if len(data) > 1:
+        extremos = data[x_col].iloc[[0, -1]]
+        if motor is not None:
+            ajuste = motor.tendencia(y_col, inicio=inicio, fim=fim)
+            tendencia = motor.linha_tempo(ajuste, extremos)
+        else:
+            dias = (data[x_col] - data[x_col].iloc[0]) / pd.Timedelta(days=1)
+            ajuste = ajuste_linear(dias, data[y_col])
+            tendencia = valores_ajuste(ajuste, dias.iloc[[0, -1]])
+        fig.add_scatter(x=extremos, y=tendencia,
+                       mode='lines', name=f'Tendência ({ajuste.inclinacao * 365.25:+.2f}/ano)',
+                       line=dict(dash='dash', color=COLORS['secondary']))
     
     fig.update_layout(
         xaxis_title=x_col.title(),
@@ -135,10 +189,8 @@ def create_trend_plot(data, x_col, y_col, title):
     return fig
 
 # Função para criar matriz de correlação
-def create_correlation_matrix(data, columns):
-    """Cria matriz de correlação interativa"""
-    corr_matrix = data[columns].corr()
-    
+def create_correlation_matrix(corr_matrix):
+    """Cria matriz de correlação interativa a partir da matriz pré-calculada"""
     fig = px.imshow(corr_matrix, 
                     text_auto=True,
                     aspect="auto",
@@ -172,12 +224,20 @@ with col7:
     btn_data = st.button("📋 Dados", width="stretch")
 
 # Carregar dados
-dados_lag, comparison_df, melhorias_df, comparacao_completa = load_data()
+agregados, comparison_df, melhorias_df, comparacao_completa = load_data()
 
-if dados_lag is None:
+if agregados is None:
     st.error("❌ Erro ao carregar os dados. Verifique se os arquivos CSV estão no diretório.")
     st.stop()
 
+meta = agregados['meta'].iloc[0]
+resumo = agregados['resumo'].set_index('estatistica')
+dados_diarios = agregados['diario']
+indice_diario = load_daily_index(meta['gerado_em'], dados_diarios)
+tendencias = load_trends(meta['gerado_em'], indice_diario)
+correlacoes_pre = agregados['correlacao'].set_index('variavel')
+covariancias_pre = agregados['covariancia'].set_index('variavel')
+
 # Inicializar sessão
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 'overview'
@@ -206,35 +266,38 @@ if st.session_state.current_page == 'overview':
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("📅 Total de Registros", f"{len(dados_lag):,}")
+        st.metric("📅 Total de Registros", f"{meta['linhas']:,}")
     
     with col2:
-        temp_media = dados_lag['temp_media'].mean()
+        temp_media = resumo.loc['mean', 'temp_media']
         st.metric("🌡️ Temperatura Média", f"{temp_media:.1f}°C")
     
     with col3:
-        precip_total = dados_lag['precipitacao_total'].sum()
+        precip_total = resumo.loc['soma', 'precipitacao_total']
         st.metric("🌧️ Precipitação Total", f"{precip_total:.0f}mm")
     
     with col4:
-        umidade_media = dados_lag['umidade_relativa_media'].mean()
+        umidade_media = resumo.loc['mean', 'umidade_relativa_media']
         st.metric("💧 Umidade Média", f"{umidade_media:.1f}%")
     
     st.markdown("---")
     
     # Gráficos de overview
+    ultimo_ano = dados_diarios.tail(365)
     col1, col2 = st.columns(2)
     
     with col1:
         # Temperatura ao longo do tempo
-        fig_temp = create_trend_plot(dados_lag.tail(365), 'data', 'temp_media', 
-                                   '🌡️ Temperatura Média (Último Ano)')
+        fig_temp = create_trend_plot(ultimo_ano, 'data', 'temp_media', 
+                                   '🌡️ Temperatura Média (Último Ano)',
+                                   motor=tendencias, inicio=ultimo_ano['data'].iloc[0])
         st.plotly_chart(fig_temp, width='stretch')
     
     with col2:
         # Precipitação ao longo do tempo
-        fig_precip = create_trend_plot(dados_lag.tail(365), 'data', 'precipitacao_total', 
-                                     '🌧️ Precipitação (Último Ano)')
+        fig_precip = create_trend_plot(ultimo_ano, 'data', 'precipitacao_total', 
+                                     '🌧️ Precipitação (Último Ano)',
+                                     motor=tendencias, inicio=ultimo_ano['data'].iloc[0])
         st.plotly_chart(fig_precip, width='stretch')
 
 # ==================== SEÇÃO: MODELOS ML ====================
@@ -363,22 +426,25 @@ elif st.session_state.current_page == 'timeseries':
     # Período de análise
     col1, col2 = st.columns(2)
     with col1:
-        data_inicio = st.date_input("Data de início:", dados_lag['data'].min())
+        data_inicio = st.date_input("Data de início:", meta['inicio'])
     with col2:
-        data_fim = st.date_input("Data de fim:", dados_lag['data'].max())
-    
-    # Filtrar dados
-    mask = (dados_lag['data'] >= pd.to_datetime(data_inicio)) & (dados_lag['data'] <= pd.to_datetime(data_fim))
-    dados_filtrados = dados_lag.loc[mask]
-    
-    # Gráfico principal
-    fig_ts = create_trend_plot(dados_filtrados, 'data', variavel, 
-                              f'Série Temporal: {variavel.replace("_", " ").title()}')
+        data_fim = st.date_input("Data de fim:", meta['fim'])
+    
+    # Filtrar dados (rollup diário: uma linha por dia, independente do número de estações)
+    dados_filtrados = indice_diario.fatia(data_inicio, data_fim)
+    
+    # Gráfico principal (série reduzida ao que cabe na largura do gráfico)
+    x, y = load_pyramid(meta['gerado_em'], variavel, dados_diarios).janela(data_inicio, data_fim, pontos_para_largura())
+    dados_grafico = pd.DataFrame({'data': x, variavel: y})
+    dados_grafico = dados_grafico[(dados_grafico['data'] >= pd.to_datetime(data_inicio)) &
+                                  (dados_grafico['data'] <= pd.to_datetime(data_fim))]
+    fig_ts = create_trend_plot(dados_grafico, 'data', variavel, 
+                              f'Série Temporal: {variavel.replace("_", " ").title()}',
+                              motor=tendencias, inicio=data_inicio, fim=data_fim)
     st.plotly_chart(fig_ts, width="stretch")
     
     # Análise sazonal
     st.subheader("📅 Análise Sazonal")
-    dados_filtrados['mes'] = dados_filtrados['data'].dt.month
     dados_mensais = dados_filtrados.groupby('mes')[variavel].mean().reset_index()
     
     fig_sazonal = px.line(dados_mensais, x='mes', y=variavel,
@@ -388,6 +454,13 @@ elif st.session_state.current_page == 'timeseries':
                             ticktext=['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun',
                                     'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'])
     st.plotly_chart(fig_sazonal, width="stretch")
+    
+    # Médias por estação do ano (período completo)
+    sazonal = agregados['sazonal']
+    fig_estacoes = px.bar(sazonal, x='estacao_ano', y=f'{variavel}_media', error_y=f'{variavel}_std',
+                          title=f'Média por Estação do Ano - {variavel.replace("_", " ").title()}',
+                          color_discrete_sequence=[COLORS['primary']])
+    st.plotly_chart(fig_estacoes, width="stretch")
 
 # ==================== SEÇÃO: CORRELAÇÃO ====================
 elif st.session_state.current_page == 'correlation':
@@ -397,12 +470,12 @@ elif st.session_state.current_page == 'correlation':
     numeric_cols = ['temp_media', 'precipitacao_total', 'umidade_relativa_media', 'pressao_atm_media']
     
     # Matriz de correlação
-    fig_corr = create_correlation_matrix(dados_lag, numeric_cols)
+    corr_matrix = correlacoes_pre.loc[numeric_cols, numeric_cols]
+    fig_corr = create_correlation_matrix(corr_matrix)
     st.plotly_chart(fig_corr, width="stretch")
     
     # Correlações mais fortes
     st.subheader("🔍 Correlações Mais Significativas")
-    corr_matrix = dados_lag[numeric_cols].corr()
     
     # Extrair correlações (excluindo diagonal)
     correlacoes = []
@@ -426,29 +499,30 @@ elif st.session_state.current_page == 'correlation':
 elif st.session_state.current_page == 'distributions':
     st.markdown('<div class="current-page">📊 Análise de Distribuições</div>', unsafe_allow_html=True)
     
-    # Histogramas
+    # Histogramas (contagens pré-calculadas)
+    tabela_histogramas = agregados['histogramas']
+    
+    def histograma(variavel, titulo, cor):
+        faixas = tabela_histogramas[tabela_histogramas['variavel'] == variavel]
+        fig = go.Figure(go.Bar(x=(faixas['inicio'] + faixas['fim']) / 2, y=faixas['contagem'],
+                               width=faixas['fim'] - faixas['inicio'], marker_color=cor))
+        fig.update_layout(title=titulo, xaxis_title=variavel, yaxis_title='count', bargap=0)
+        return fig
+    
     col1, col2 = st.columns(2)
     
     with col1:
-        fig_hist_temp = px.histogram(dados_lag, x='temp_media', nbins=50,
-                                   title='Distribuição da Temperatura Média',
-                                   color_discrete_sequence=[COLORS['primary']])
+        fig_hist_temp = histograma('temp_media', 'Distribuição da Temperatura Média', COLORS['primary'])
         st.plotly_chart(fig_hist_temp, width="stretch")
         
-        fig_hist_umid = px.histogram(dados_lag, x='umidade_relativa_media', nbins=50,
-                                   title='Distribuição da Umidade Relativa',
-                                   color_discrete_sequence=[COLORS['info']])
+        fig_hist_umid = histograma('umidade_relativa_media', 'Distribuição da Umidade Relativa', COLORS['info'])
         st.plotly_chart(fig_hist_umid, width="stretch")
     
     with col2:
-        fig_hist_precip = px.histogram(dados_lag, x='precipitacao_total', nbins=50,
-                                     title='Distribuição da Precipitação',
-                                     color_discrete_sequence=[COLORS['secondary']])
+        fig_hist_precip = histograma('precipitacao_total', 'Distribuição da Precipitação', COLORS['secondary'])
         st.plotly_chart(fig_hist_precip, width="stretch")
         
-        fig_hist_press = px.histogram(dados_lag, x='pressao_atm_media', nbins=50,
-                                    title='Distribuição da Pressão Atmosférica',
-                                    color_discrete_sequence=[COLORS['success']])
+        fig_hist_press = histograma('pressao_atm_media', 'Distribuição da Pressão Atmosférica', COLORS['success'])
         st.plotly_chart(fig_hist_press, width="stretch")
     
     # Box plots
@@ -459,11 +533,16 @@ elif st.session_state.current_page == 'distributions':
     fig_box = make_subplots(rows=2, cols=2, 
                            subplot_titles=['Temperatura', 'Precipitação', 'Umidade', 'Pressão'])
     
-    # Adicionar box plots
-    fig_box.add_box(y=dados_lag['temp_media'], name='Temperatura', row=1, col=1)
-    fig_box.add_box(y=dados_lag['precipitacao_total'], name='Precipitação', row=1, col=2)
-    fig_box.add_box(y=dados_lag['umidade_relativa_media'], name='Umidade', row=2, col=1)
-    fig_box.add_box(y=dados_lag['pressao_atm_media'], name='Pressão', row=2, col=2)
+    # Adicionar box plots a partir dos quartis pré-calculados
+    tabela_caixas = agregados['caixas'].set_index('variavel')
+    for variavel, nome, linha, coluna in [('temp_media', 'Temperatura', 1, 1),
+                                          ('precipitacao_total', 'Precipitação', 1, 2),
+                                          ('umidade_relativa_media', 'Umidade', 2, 1),
+                                          ('pressao_atm_media', 'Pressão', 2, 2)]:
+        caixa = tabela_caixas.loc[variavel]
+        fig_box.add_box(q1=[caixa['q1']], median=[caixa['mediana']], q3=[caixa['q3']],
+                        lowerfence=[caixa['cerca_inferior']], upperfence=[caixa['cerca_superior']],
+                        name=f"{nome} ({caixa['n_outliers']:,} outliers)", row=linha, col=coluna)
     
     fig_box.update_layout(height=600, showlegend=False)
     st.plotly_chart(fig_box, width="stretch")
@@ -485,33 +564,22 @@ elif st.session_state.current_page == 'scatter':
                            ['temp_media', 'precipitacao_total', 'umidade_relativa_media', 'pressao_atm_media'],
                            index=1)
     
-    # Scatter plot principal
-    fig_scatter = px.scatter(dados_lag, x=var_x, y=var_y,
-                           title=f'Relação entre {var_x.replace("_", " ").title()} e {var_y.replace("_", " ").title()}',
+    # Scatter plot principal (amostra pré-calculada)
+    amostra = agregados['amostra']
+    fig_scatter = px.scatter(amostra, x=var_x, y=var_y,
+                           title=f'Relação entre {var_x.replace("_", " ").title()} e {var_y.replace("_", " ").title()} (amostra de {len(amostra):,} pontos)',
                            color_discrete_sequence=[COLORS['primary']],
                            opacity=0.6)
     
-    # Adicionar linha de tendência usando statsmodels
-    try:
-        import statsmodels.api as sm
-        
-        # Remover valores NaN
-        data_clean = dados_lag[[var_x, var_y]].dropna()
-        
-        if len(data_clean) > 0:
-            X = sm.add_constant(data_clean[var_x])
-            model = sm.OLS(data_clean[var_y], X).fit()
-            
-            # Criar linha de predição
-            x_range = np.linspace(data_clean[var_x].min(), data_clean[var_x].max(), 100)
-            X_pred = sm.add_constant(x_range)
-            y_pred = model.predict(X_pred)
-            
-            fig_scatter.add_scatter(x=x_range, y=y_pred, mode='lines', 
-                                  name='Linha de Tendência',
-                                  line=dict(color=COLORS['secondary'], width=3))
-    except ImportError:
-        st.warning("Statsmodels não instalado. Linha de tendência não disponível.")
+    # Linha de tendência (mínimos quadrados) a partir da covariância e das médias do conjunto completo
+    variancia_x = covariancias_pre.loc[var_x, var_x]
+    if var_x != var_y and variancia_x > 0:
+        inclinacao = covariancias_pre.loc[var_x, var_y] / variancia_x
+        intercepto = resumo.loc['mean', var_y] - inclinacao * resumo.loc['mean', var_x]
+        x_range = np.linspace(resumo.loc['min', var_x], resumo.loc['max', var_x], 100)
+        fig_scatter.add_scatter(x=x_range, y=intercepto + inclinacao * x_range, mode='lines',
+                              name='Linha de Tendência',
+                              line=dict(color=COLORS['secondary'], width=3))
     
     fig_scatter.update_layout(height=500)
     st.plotly_chart(fig_scatter, width="stretch")
@@ -521,7 +589,7 @@ elif st.session_state.current_page == 'scatter':
     numeric_cols = ['temp_media', 'precipitacao_total', 'umidade_relativa_media', 'pressao_atm_media']
     
     # Criar scatter matrix
-    fig_matrix = px.scatter_matrix(dados_lag[numeric_cols].sample(1000), 
+    fig_matrix = px.scatter_matrix(amostra[numeric_cols].sample(min(1000, len(amostra)), random_state=42), 
                                  dimensions=numeric_cols,
                                  title="Matriz de Scatter Plots (Amostra de 1000 pontos)")
     fig_matrix.update_layout(height=800)
@@ -537,8 +605,8 @@ elif st.session_state.current_page == 'data':
     col1, col2 = st.columns(2)
     
     with col1:
-        st.metric("📊 Dados Principais", f"{len(dados_lag)} registros")
-        st.metric("📅 Período", f"{dados_lag['data'].min().strftime('%d/%m/%Y')} - {dados_lag['data'].max().strftime('%d/%m/%Y')}")
+        st.metric("📊 Dados Principais", f"{meta['linhas']} registros")
+        st.metric("📅 Período", f"{meta['inicio'].strftime('%d/%m/%Y')} - {meta['fim'].strftime('%d/%m/%Y')}")
     
     with col2:
         if comparison_df is not None:
@@ -553,29 +621,29 @@ elif st.session_state.current_page == 'data':
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        n_registros = st.slider("Número de registros:", 10, 1000, 100)
+        n_registros = st.slider("Número de registros:", 10, N_LINHAS_BORDA, 100)
     
     with col2:
         tipo_amostra = st.selectbox("Tipo de amostra:", ["Últimos registros", "Primeiros registros", "Aleatório"])
     
     with col3:
         colunas_selecionadas = st.multiselect("Colunas:", 
-                                            dados_lag.columns.tolist(),
+                                            agregados['primeiros'].columns.tolist(),
                                             default=['data', 'temp_media', 'precipitacao_total', 'umidade_relativa_media'])
     
     # Mostrar dados filtrados
     if tipo_amostra == "Últimos registros":
-        dados_mostrar = dados_lag[colunas_selecionadas].tail(n_registros)
+        dados_mostrar = agregados['ultimos'][colunas_selecionadas].tail(n_registros)
     elif tipo_amostra == "Primeiros registros":
-        dados_mostrar = dados_lag[colunas_selecionadas].head(n_registros)
+        dados_mostrar = agregados['primeiros'][colunas_selecionadas].head(n_registros)
     else:
-        dados_mostrar = dados_lag[colunas_selecionadas].sample(n_registros)
+        dados_mostrar = agregados['amostra'][colunas_selecionadas].sample(n_registros)
     
     st.dataframe(dados_mostrar, width="stretch")
     
     # Estatísticas descritivas
     st.subheader("📊 Estatísticas Descritivas")
-    st.dataframe(dados_lag.describe(), width="stretch")
+    st.dataframe(resumo, width="stretch")
     
     # Download dos dados
     st.subheader("💾 Download dos Dados")
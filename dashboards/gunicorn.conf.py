@@ -0,0 +1,24 @@
+"""
+Configuração do gunicorn para o dashboard Dash (gunicorn -c gunicorn.conf.py wsgi:server)
+"""
+import multiprocessing
+
+bind = '0.0.0.0:8050'
+
+# Dados e figuras carregados uma vez no mestre e compartilhados com os workers
+preload_app = True
+
+# Processos contornam o GIL nos callbacks; threads cobrem a espera de I/O
+workers = min(2 * multiprocessing.cpu_count() + 1, 8)
+worker_class = 'gthread'
+threads = 4
+
+# O aquecimento pode levar alguns segundos com muitas estações
+timeout = 120
+graceful_timeout = 30
+
+# Recicla workers periodicamente (libera memória que deixou de ser compartilhada)
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
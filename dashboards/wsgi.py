@@ -0,0 +1,18 @@
+"""
+Ponto de Entrada WSGI do Dashboard Climático
+Carrega os dados e aquece o cache de figuras uma única vez no processo
+mestre; com preload_app os workers herdam tudo por fork (copy-on-write)
+
+Exemplo:
+    cd dashboards/
+    gunicorn -c gunicorn.conf.py wsgi:server
+"""
+import gc
+
+from dashboard_climatico_completo import aquecer, app, server  # noqa: F401 (carrega os dados)
+
+aquecer()
+
+# Objetos criados até aqui saem da coleta de lixo: o gc não reescreve seus
+# cabeçalhos nos workers, e as páginas continuam compartilhadas após o fork
+gc.freeze()
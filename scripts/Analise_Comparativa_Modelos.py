@@ -46,45 +46,22 @@ import joblib
 # ### 1.2 Carregamento dos Dados
 
 # %%
-# Definição das colunas do dataset
-colunas = [
-    "data",
-    "precipitacao_total",
-    "pressao_atm_media",
-    "temp_orvalho_media",
-    "temp_maxima",
-    "temp_media",
-    "temp_minima",
-    "umidade_relativa_media",
-    "umidade_relativa_minima",
-    "umidade_relativa_maxima",
-    "vento_vel_media",
-]
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path.cwd().parent))
+from clima.comparacao import criar_svr_aproximado
+from clima.features import criar_lag_features as criar_lags_vetorizados
+from clima.ingestao import carregar_inmet
 
 # Carregamento dos dados
 caminho_csv = "/home/iioulos/Documents/IC_Danilo-Cotozika/Dados do INEP que eu solicitei/dados_A707_D_2014-01-01_2025-05-01.csv"
-df = pd.read_csv(
-    caminho_csv, sep=",", encoding="latin1", skiprows=11, header=None, names=colunas
-)
+df = carregar_inmet(caminho_csv).reset_index()
 
-# Verificação de valores faltantes
+# Verificação de valores faltantes (após conversão numérica e interpolação no tempo)
 print("Valores faltantes por coluna:")
 df.isna().sum()
 
-# %% [markdown]
-# ### 1.3 Tratamento de Dados
-
-# %%
-# Convertendo a coluna de data para datetime
-df["data"] = pd.to_datetime(df["data"])
-
-# Interpolação linear para valores faltantes
-colunas_numericas = df.select_dtypes(include=[np.number]).columns
-df[colunas_numericas] = df[colunas_numericas].interpolate(method="linear")
-
-print("\nValores faltantes após interpolação:")
-df.isna().sum()
-
 
 # %% [markdown]
 # ## 2. Criação dos Datasets
@@ -126,8 +103,6 @@ def criar_lag_features(df, lag_dias=[1, 2, 3, 7]):
     """
     Cria lag features para as variáveis selecionadas.
     """
-    df_com_lag = df.copy()
-
     features_para_lag = [
         "temp_maxima",
         "pressao_atm_media",
@@ -136,11 +111,9 @@ def criar_lag_features(df, lag_dias=[1, 2, 3, 7]):
         "vento_vel_media",
     ]
 
-    for feature in features_para_lag:
-        for lag in lag_dias:
-            df_com_lag[f"{feature}_lag_{lag}"] = df_com_lag[feature].shift(lag)
-
-    return df_com_lag.dropna()
+    return criar_lags_vetorizados(
+        df, variaveis=features_para_lag, lags=lag_dias, formato="{variavel}_lag_{lag}"
+    )
 
 
 def preparar_dataset_com_lag(df):
@@ -204,6 +177,7 @@ modelos_sem_lag = {
     "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
     "Gradient Boosting": GradientBoostingRegressor(random_state=42),
     "SVR": SVR(kernel="rbf"),
+    "SVR Aproximado": criar_svr_aproximado(),
 }
 # Treinando e avaliando modelos sem lag
 resultados_sem_lag = []
@@ -230,6 +204,7 @@ modelos_sem_lag = {
     "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
     "Gradient Boosting": GradientBoostingRegressor(random_state=42),
     "SVR": SVR(kernel="rbf"),
+    "SVR Aproximado": criar_svr_aproximado(),
 }
 
 # Treinando e avaliando modelos sem lag
@@ -258,6 +233,7 @@ modelos_com_lag = {
     "Random Forest": RandomForestRegressor(n_estimators=100, random_state=42),
     "Gradient Boosting": GradientBoostingRegressor(random_state=42),
     "SVR": SVR(kernel="rbf"),
+    "SVR Aproximado": criar_svr_aproximado(),
 }
 
 # Treinando e avaliando modelos com lag
@@ -322,6 +298,8 @@ ordem_modelos = [
     "Gradient Boosting (Com Lag)",
     "SVR (Sem Lag)",
     "SVR (Com Lag)",
+    "SVR Aproximado (Sem Lag)",
+    "SVR Aproximado (Com Lag)",
 ]
 
 # Definindo as cores para cada modelo
@@ -332,6 +310,8 @@ cores_modelos = {
     "Gradient Boosting (Com Lag)": "#009E73",  # Verde mais escuro
     "SVR (Sem Lag)": "#FFACAC",  # Vermelho pastel
     "SVR (Com Lag)": "#D55E00",  # Vermelho mais escuro
+    "SVR Aproximado (Sem Lag)": "#D0BBFF",  # Roxo pastel
+    "SVR Aproximado (Com Lag)": "#8172B3",  # Roxo mais escuro
 }
 
 # Ordenando o DataFrame
@@ -407,11 +387,14 @@ print(todos_resultados.round(4))
 # ### Usando as bibliotecas Lime e SHAP pra interpretar melhor e me certificar dos resultados
 
 # %%
-import lime
-import lime.lime_tabular
 import shap
+import tempfile
 import time
 
+from clima.explicacao import (calcular_valores_shap, criar_explicador, explicar_lime_lote, obter_treino_lime,
+                              salvar_explicador)
+from clima.registro import registrar_modelo
+
 print("Análise de Interpretabilidade dos Modelos ")
 # Selecionando o melhor modelo (Random Forest com Lag)
 melhor_modelo = modelos_com_lag["Random Forest"]
@@ -421,101 +404,129 @@ feature_names = X_train.columns.tolist()
 # 1. Análise SHAP
 print("\nAnálise SHAP")
 print("\n\nCalculando valores SHAP...")
-# Usando uma amostra para acelerar o cálculo dos valores SHAP
-amostra_idx = np.random.choice(
-    X_train.shape[0], min(100, X_train.shape[0]), replace=False
+# Explicador criado uma vez e salvo em disco; valores SHAP de todo o conjunto
+# de treino calculados em blocos paralelos (antes: amostra de 100 linhas)
+caminho_explicador = salvar_explicador(
+    criar_explicador(melhor_modelo, shap.sample(X_train, 100, random_state=42)),
+    Path(tempfile.gettempdir()) / "explicador_melhor_modelo.joblib"
 )
-X_train_amostra = X_train.iloc[amostra_idx]
-# Criando o explicador SHAP
-explainer = shap.TreeExplainer(melhor_modelo)
-shap_values = explainer.shap_values(X_train_amostra)
+shap_values, _ = calcular_valores_shap(caminho_explicador, X_train.to_numpy())
 # Resumo das contribuições das features
 plt.figure(figsize=(12, 8))
-shap.summary_plot(shap_values, X_train_amostra, feature_names=feature_names, show=False)
+shap.summary_plot(shap_values, X_train, feature_names=feature_names, show=False)
 plt.title("Resumo SHAP - Impacto das Features na Previsão", fontsize=14)
 plt.tight_layout()
 plt.show()
 
 # %%
 # 2. Análise LIME
-print("
-Análise LIME")
-# Criando o explicador LIME
-explainer_lime = lime.lime_tabular.LimeTabularExplainer(
-X_train.values,
-feature_names=feature_names,
-class_names=['temp_maxima'],
-mode='regression'
-)
+print("\nAnálise LIME")
+# O melhor modelo vai para um registro temporário: os processos do LIME o abrem
+# pelo registro e recebem as perturbações como arrays numpy (sem um DataFrame
+# por lote de amostras)
+registro_lime = Path(tempfile.mkdtemp(prefix="registro_lime_"))
+registrar_modelo(melhor_modelo, "melhor_modelo", feature_names, diretorio=registro_lime)
+obter_treino_lime("melhor_modelo", X_train, diretorio=registro_lime)
 # Selecionando uma instância aleatória para explicar
 idx = np.random.randint(0, len(X_test))
-instancia = X_test.iloc[idx]
-# Convertendo para DataFrame com os nomes das features para evitar o warning
-instancia_df = pd.DataFrame([instancia.values], columns=feature_names)
-# Visualizando a explicação LIME
-explicacao = explainer_lime.explain_instance(
-instancia.values,
-lambda x: melhor_modelo.predict(pd.DataFrame(x, columns=feature_names)),
-num_features=10
-)
-# O problema está aqui - a figura vazia é criada antes de chamar␣
-↪as_pyplot_figure
-# Removendo a criação da figura vazia
-# plt.figure(figsize=(10, 6)) # Esta linha cria uma figura vazia
-
-##__________________________________________________________________________________________
-
-# Usando diretamente o método as_pyplot_figure que já cria sua própria figura
-fig = explicacao.as_pyplot_figure()
+instancia_df = X_test.iloc[[idx]]
+pesos_lime = explicar_lime_lote("melhor_modelo", instancia_df, diretorio=registro_lime,
+                                indices=[idx], num_features=10)
+# Visualizando a explicação LIME (pesos locais de cada condição, como em as_pyplot_figure)
+pesos_grafico = pesos_lime.sort_values('rank', ascending=False)
+fig = plt.figure(figsize=(10, 6))
+plt.barh(pesos_grafico['condicao'], pesos_grafico['peso'],
+         color=np.where(pesos_grafico['peso'] > 0, 'green', 'red'))
 plt.title('LIME - Explicação para uma Previsão Individual', fontsize=14)
 plt.tight_layout()
 plt.show()
 # Comparando previsão vs. valor real
 valor_real = y_test_com_lag.iloc[idx]
-previsao = melhor_modelo.predict(instancia_df)[0] # Usando DataFrame com nomes␣
-↪de colunas
-print(f"
-Exemplo de Previsão Individual:")
+previsao = melhor_modelo.predict(instancia_df)[0] # Usando DataFrame com nomes de colunas
+print(f"\nExemplo de Previsão Individual:")
 print(f"Valor Real: {valor_real:.2f}")
 print(f"Previsão: {previsao:.2f}")
 print(f"Diferença: {abs(valor_real - previsao):.2f}")
 # 3. Comparação entre as Importâncias das Features (corrigindo numeração)
-print("
-Comparação entre Métodos de Interpretabilidade")
+print("\nComparação entre Métodos de Interpretabilidade")
 # Calculando importância média do SHAP
 importancia_shap = pd.DataFrame({
-'Feature': feature_names,
-'SHAP_Importância': np.abs(shap_values).mean(0)
+    'Feature': feature_names,
+    'SHAP_Importância': np.abs(shap_values).mean(0)
 }).sort_values('SHAP_Importância', ascending=False)
+
+# Obtendo importâncias do modelo Random Forest
+if hasattr(melhor_modelo, 'feature_importances_'):
+    importancias = pd.DataFrame({
+        'Feature': feature_names,
+        'Importância': melhor_modelo.feature_importances_
+    }).sort_values('Importância', ascending=False)
+else:
+    # Caso o melhor modelo não seja Random Forest
+    importancias = pd.DataFrame({
+        'Feature': feature_names,
+        'Importância': np.zeros(len(feature_names))  # Valores padrão
+    })
+    print("Aviso: O modelo não possui atributo feature_importances_")
+
 # Mesclando as importâncias do Random Forest e SHAP
 comparacao_importancias = importancia_shap.merge(
-importancias,
-on='Feature',
-how='inner'
+    importancias,
+    on='Feature',
+    how='inner'
 ).sort_values('SHAP_Importância', ascending=False).head(10)
-# Visualizando a comparação
+
+# Visualizando a comparação com melhor legibilidade
 plt.figure(figsize=(12, 8))
-plt.scatter(comparacao_importancias['Importância'],␣
-↪comparacao_importancias['SHAP_Importância'])
+plt.scatter(comparacao_importancias['Importância'], 
+            comparacao_importancias['SHAP_Importância'],
+            alpha=0.7, s=100)
+
+# Melhorando a visualização das anotações para evitar sobreposição
+# Criando um dicionário para armazenar as posições dos textos
+texto_posicoes = {}
+ajuste = 0.001  # Valor inicial de ajuste
+
+# Para cada ponto, verificar se há sobreposição e ajustar posição
 for i, txt in enumerate(comparacao_importancias['Feature']):
-plt.annotate(txt, (comparacao_importancias['Importância'].iloc[i],␣
-↪comparacao_importancias['SHAP_Importância'].iloc[i]))
-plt.xlabel('Importância Random Forest')
-plt.ylabel('Importância SHAP')
-plt.title('Correlação entre Importâncias: Random Forest vs SHAP')
-plt.grid(True)
+    x = comparacao_importancias['Importância'].iloc[i]
+    y = comparacao_importancias['SHAP_Importância'].iloc[i]
+    
+    # Abreviando os nomes dos lags de temp_orvalho_media para melhor visualização
+    if 'temp_orvalho_media_lag' in txt:
+        txt = txt.replace('temp_orvalho_media_lag', 'temp_orv_lag')
+    
+    # Verificar se há pontos próximos e ajustar posição
+    chave = f"{x:.4f}_{y:.4f}"
+    if chave in texto_posicoes:
+        y += ajuste
+        ajuste += 0.001  # Incrementar para o próximo ponto próximo
+    texto_posicoes[chave] = True
+    
+    # Adicionar anotação com offset e conectores
+    plt.annotate(txt, 
+                 xy=(x, y),
+                 xytext=(5, 5),
+                 textcoords='offset points',
+                 ha='left',
+                 va='bottom',
+                 fontsize=9,
+                 bbox=dict(boxstyle='round,pad=0.3', fc='yellow', alpha=0.3),
+                 arrowprops=dict(arrowstyle='->', connectionstyle='arc3,rad=0'))
+
+plt.xlabel('Importância Random Forest', fontsize=12)
+plt.ylabel('Importância SHAP', fontsize=12)
+plt.title('Correlação entre Importâncias: Random Forest vs SHAP', fontsize=14)
+plt.grid(True, alpha=0.3)
 plt.tight_layout()
 plt.show()
-print("
-Conclusão da Análise de Interpretabilidade:")
-print("1. As features mais importantes segundo o Random Forest são:", ", ".
-↪join(importancias.head(3)['Feature'].tolist()))
-print("2. As features mais importantes segundo o SHAP são:", ", ".
-↪join(importancia_shap.head(3)['Feature'].tolist()))
+print("\nConclusão da Análise de Interpretabilidade:")
+print("1. As features mais importantes segundo o Random Forest são:", ", ".join(importancias.head(3)['Feature'].tolist()))
+print("2. As features mais importantes segundo o SHAP são:", ", ".join(importancia_shap.head(3)['Feature'].tolist()))
 # Verificando consistência entre os métodos
 top5_rf = set(importancias.head(5)['Feature'].tolist())
 top5_shap = set(importancia_shap.head(5)['Feature'].tolist())
 intersecao = top5_rf.intersection(top5_shap)
-print(f"3. Consistência e
+print(f"3. Consistência entre métodos: {len(intersecao)} de 5 features aparecem em ambos os top 5.")
 
 # %%
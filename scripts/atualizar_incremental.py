@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Atualização diária incremental: anexa só as linhas novas dos exports do INMET
+ao armazenamento de features, estende o CSV e os agregados do dashboard e
+dispara o retreino completo apenas no agendamento ou quando há drift
+
+Exemplo:
+    python scripts/atualizar_incremental.py "dados/dados_INEP/*.csv" \
+        --csv-dashboard dados/dados_climaticos_com_lags.csv
+"""
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.agregados import estender_agregados
+from clima.incremental import (
+    anexar_csv,
+    atualizar,
+    diretorio_incremental,
+    gravar_estado,
+    marcar_retreino,
+    precisa_retreinar,
+    registrar_erros,
+)
+from clima.registro import listar_modelos, obter_modelo
+
+parser = argparse.ArgumentParser(description='Anexa as linhas novas dos exports sem reconstruir tudo')
+parser.add_argument('origem', help='CSV, diretório ou glob de exports do INMET')
+parser.add_argument('--diretorio', help='Diretório do armazenamento incremental (padrão: .cache/incremental junto aos exports)')
+parser.add_argument('--csv-dashboard', help='CSV derivado a estender (ex.: dados_climaticos_com_lags.csv) junto com seus agregados')
+parser.add_argument('--modelo', help='Modelo do registro monitorado para drift (padrão: o registrado por último)')
+parser.add_argument('--limiar-drift', type=float, default=0.25,
+                    help='Aumento relativo do RMSE nas linhas novas que dispara o retreino')
+parser.add_argument('--intervalo-retreino', type=int, default=30,
+                    help='Dias entre retreinos completos agendados')
+parser.add_argument('--reconstruir', action='store_true', help='Refaz o armazenamento a partir dos exports')
+parser.add_argument('--sem-retreino', action='store_true', help='Só informa se o retreino seria necessário')
+args = parser.parse_args()
+
+inicio = time.perf_counter()
+novas, estado, reconstruido = atualizar(args.origem, args.diretorio, reconstruir=args.reconstruir)
+diretorio = diretorio_incremental(args.origem, args.diretorio)
+if reconstruido:
+    print(f"Armazenamento reconstruído: {len(novas):,} linhas em {time.perf_counter() - inicio:.2f}s")
+else:
+    print(f"{len(novas):,} linhas novas anexadas em {time.perf_counter() - inicio:.2f}s "
+          f"({len(estado['partes'])} partes)")
+
+if args.csv_dashboard and len(novas) and not reconstruido:
+    inicio = time.perf_counter()
+    gravadas = anexar_csv(args.csv_dashboard, novas)
+    estender_agregados(args.csv_dashboard, gravadas)
+    print(f"{len(gravadas):,} linhas anexadas a {args.csv_dashboard} e agregados atualizados "
+          f"em {time.perf_counter() - inicio:.2f}s")
+elif args.csv_dashboard and reconstruido:
+    print(f"Aviso: armazenamento reconstruído; gere {args.csv_dashboard} e seus agregados novamente")
+
+nome_modelo = args.modelo
+if nome_modelo is None:
+    modelos = listar_modelos()
+    nome_modelo = modelos.sort_values('criado_em')['nome'].iloc[-1] if len(modelos) else None
+
+if nome_modelo is not None and len(novas) and not reconstruido:
+    drift = registrar_erros(estado, obter_modelo(nome_modelo), novas)
+    if drift['n']:
+        print(f"{nome_modelo} v{drift['versao']}: RMSE em {drift['n']} linhas novas = "
+              f"{(drift['soma_quadrados'] / drift['n']) ** 0.5:.3f} (treino: {drift['rmse_referencia']})")
+gravar_estado(diretorio, estado)
+
+retreinar, motivo = precisa_retreinar(estado, nome_modelo, args.intervalo_retreino, args.limiar_drift)
+if not retreinar:
+    print('Retreino não necessário')
+elif args.sem_retreino:
+    print(f'Retreino necessário: {motivo}')
+else:
+    print(f'Retreinando ({motivo})...')
+    script = Path(__file__).resolve().parent / 'gerar_comparacao_lag_features.py'
+    if subprocess.run([sys.executable, str(script), args.origem]).returncode == 0:
+        marcar_retreino(estado)
+        gravar_estado(diretorio, estado)
+    else:
+        print('Aviso: o retreino falhou; será tentado de novo na próxima atualização')
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Converte as planilhas .xls do arquivo histórico Jaschke (FCT/UNESP) para o
+esquema diário do INMET e grava o cache colunar lido pelo treino
+
+Exemplo:
+    python scripts/converter_jaschke.py dados/dados_historicos_Jaschke --n-processos 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.jaschke import DIRETORIO_JASCHKE, caminho_cache_jaschke, carregar_jaschke
+
+parser = argparse.ArgumentParser(description='Converte o arquivo histórico Jaschke para o cache colunar')
+parser.add_argument('origem', nargs='?', default=str(DIRETORIO_JASCHKE),
+                    help='Diretório com as planilhas (busca recursiva) ou uma planilha')
+parser.add_argument('--n-processos', type=int, default=None,
+                    help='Processos de leitura das planilhas (padrão: todos os núcleos)')
+parser.add_argument('--recriar', action='store_true', help='Converte de novo mesmo com o cache em dia')
+args = parser.parse_args()
+
+if args.recriar:
+    caminho_cache_jaschke(args.origem).unlink(missing_ok=True)
+
+inicio = time.perf_counter()
+dados, estacoes = carregar_jaschke(args.origem, n_processos=args.n_processos)
+estacao = estacoes.iloc[0]
+print(f"{len(dados):,} dias ({estacao['data_inicial']:%Y-%m-%d} a {estacao['data_final']:%Y-%m-%d}) "
+      f"de {estacao['n_arquivos']} planilhas em {time.perf_counter() - inicio:.2f}s")
+print('Dias com valor por variável:')
+print(dados.notna().sum().to_string())
+print(f'Cache em: {caminho_cache_jaschke(args.origem)}')
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Explicações LIME em lote para todos os dias de temperatura extrema
+
+Exemplo:
+    python scripts/explicar_extremos_lime.py random_forest_sem_lags "dados/dados_INEP/*.csv" --n-jobs 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.explicacao import explicar_lime_lote, obter_treino_lime
+from clima.inferencia import montar_features
+from clima.ingestao import carregar_estacoes
+from clima.registro import obter_modelo
+
+parser = argparse.ArgumentParser(description='Explica com LIME os dias de temperatura extrema')
+parser.add_argument('modelo', help='Nome do modelo no registro (ex.: random_forest_sem_lags)')
+parser.add_argument('origem', help='CSV, diretório ou glob de exports do INMET')
+parser.add_argument('destino', nargs='?', default='lime_dias_extremos.csv',
+                    help='Tabela de saída (.csv ou .parquet)')
+parser.add_argument('--versao', type=int, default=None,
+                    help='Versão do modelo (padrão: a mais recente)')
+parser.add_argument('--quantil', type=float, default=0.05,
+                    help='Extremos: temp_maxima acima do quantil 1-q ou temp_minima abaixo de q, por estação')
+parser.add_argument('--num-features', type=int, default=10)
+parser.add_argument('--num-samples', type=int, default=5000,
+                    help='Perturbações por instância')
+parser.add_argument('--n-jobs', type=int, default=-1,
+                    help='Número de processos (-1 = todos os núcleos)')
+args = parser.parse_args()
+
+modelo = obter_modelo(args.modelo, args.versao)
+dados, _ = carregar_estacoes(args.origem)
+dados = montar_features(modelo, dados.reset_index(), grupo='estacao').reset_index(drop=True)
+
+# Dias extremos de cada estação
+por_estacao = dados.groupby('estacao')
+extremos = dados[
+    (dados['temp_maxima'] >= por_estacao['temp_maxima'].transform('quantile', 1 - args.quantil))
+    | (dados['temp_minima'] <= por_estacao['temp_minima'].transform('quantile', args.quantil))
+]
+print(f'{len(extremos):,} dias extremos de {len(dados):,}')
+
+# Amostra de treino das estatísticas do LIME, salva uma vez junto ao modelo
+obter_treino_lime(args.modelo, dados[modelo.features], modelo.versao)
+
+inicio = time.perf_counter()
+pesos = explicar_lime_lote(
+    args.modelo, extremos, modelo.versao, indices=extremos.index,
+    num_features=args.num_features, num_samples=args.num_samples, n_jobs=args.n_jobs,
+)
+duracao = time.perf_counter() - inicio
+print(f'{len(extremos):,} instâncias explicadas em {duracao:.1f}s ({len(extremos) / duracao:,.1f} instâncias/s)')
+
+pesos = extremos[['estacao', 'data']].join(pesos.set_index('instancia'), how='inner').reset_index(drop=True)
+if args.destino.endswith('.parquet'):
+    pesos.to_parquet(args.destino, index=False)
+else:
+    pesos.to_csv(args.destino, index=False)
+print(f'Pesos salvos em: {args.destino}')
+
+print('\n=== PESO MÉDIO |LIME| POR FEATURE ===')
+print(pesos.groupby('feature')['peso'].agg(lambda p: p.abs().mean()).sort_values(ascending=False).round(4).to_string())
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Valores SHAP de todas as linhas para um modelo do registro (modelos/)
+
+Exemplo:
+    python scripts/explicar_modelo.py random_forest_sem_lags "dados/dados_INEP/*.csv" --n-jobs 4
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.explicacao import TAMANHO_BLOCO_SHAP, explicar_modelo, importancia_global, ler_valores_shap
+from clima.inferencia import montar_features
+from clima.ingestao import carregar_estacoes
+from clima.registro import obter_modelo
+
+parser = argparse.ArgumentParser(description='Calcula e salva os valores SHAP de um modelo registrado')
+parser.add_argument('modelo', help='Nome do modelo no registro (ex.: random_forest_sem_lags)')
+parser.add_argument('origem', help='CSV, diretório ou glob de exports do INMET')
+parser.add_argument('--versao', type=int, default=None,
+                    help='Versão do modelo (padrão: a mais recente)')
+parser.add_argument('--n-jobs', type=int, default=-1,
+                    help='Número de processos (-1 = todos os núcleos)')
+parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO_SHAP,
+                    help='Linhas explicadas por tarefa')
+args = parser.parse_args()
+
+modelo = obter_modelo(args.modelo, args.versao)
+dados, _ = carregar_estacoes(args.origem)
+
+# Mesmas lag features do treino, sem cruzar estações
+dados = montar_features(modelo, dados.reset_index(), grupo='estacao')
+
+inicio = time.perf_counter()
+destino = explicar_modelo(args.modelo, dados, modelo.versao, tamanho_bloco=args.tamanho_bloco, n_jobs=args.n_jobs)
+duracao = time.perf_counter() - inicio
+
+print(f'{len(dados):,} linhas explicadas em {duracao:.1f}s ({len(dados) / duracao:,.0f} linhas/s)')
+print(f'Valores SHAP salvos em: {destino}')
+print('\n=== IMPORTÂNCIA GLOBAL (média |SHAP|) ===')
+print(importancia_global(ler_valores_shap(args.modelo, modelo.versao), modelo.features).round(4).to_string(index=False))
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Pré-calcula os agregados do dashboard Streamlit (rollups, histogramas, quantis)
+
+Exemplo:
+    python scripts/gerar_agregados.py dados/dados_climaticos_com_lags.csv
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.agregados import carregar_agregados, diretorio_agregados
+
+parser = argparse.ArgumentParser(description='Gera (ou atualiza) os agregados de um arquivo de dados')
+parser.add_argument('dados', help='CSV com coluna data e as variáveis do INMET')
+parser.add_argument('--recriar', action='store_true', help='Recalcula mesmo se os agregados estiverem em dia')
+args = parser.parse_args()
+
+inicio = time.perf_counter()
+agregados = carregar_agregados(args.dados, recriar=args.recriar)
+meta = agregados['meta'].iloc[0]
+print(f"{meta['linhas']:,} linhas resumidas em {time.perf_counter() - inicio:.2f}s")
+print(f'Agregados em: {diretorio_agregados(args.dados)}')
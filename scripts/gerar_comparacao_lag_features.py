@@ -1,162 +1,176 @@
 #!/usr/bin/env python3
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-from sklearn.svm import SVR
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import mean_squared_error, r2_score
-import joblib
+import argparse
+import sys
 import warnings
-warnings.filterwarnings('ignore')
+from functools import partial
+from pathlib import Path
 
-# Carregar dados originais (sem lag features)
-caminho_csv = '/home/iioulos/Documents/IC_Danilo-Cotozika/Dados do INEP que eu solicitei/dados_A707_D_2014-01-01_2025-05-01.csv'
+import pandas as pd
+warnings.filterwarnings('ignore')
 
-colunas = [
-    'data', 'precipitacao_total', 'pressao_atm_media', 
-    'temp_orvalho_media', 'temp_maxima', 'temp_media', 
-    'temp_minima', 'umidade_relativa_media', 
-    'umidade_relativa_minima', 'umidade_relativa_maxima', 
-    'vento_vel_media'
-]
-
-# Dados sem lag features
-df_sem_lags = pd.read_csv(
-    caminho_csv,
-    sep=',', 
-    encoding='latin1',
-    skiprows=11,
-    header=None,
-    names=colunas
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.comparacao import (
+    ajustar_svr_aproximado,
+    com_imputacao,
+    criar_modelos,
+    criar_svr_aproximado,
+    divisao_aleatoria,
+    executar_comparacao,
+    identificador_modelo,
+    tabela_comparacao,
+    tabela_melhorias,
+    treinar_melhor_modelo,
 )
+from clima.features import LAGS_PADRAO, VARIAVEIS_LAG, criar_lag_features, nomes_lags
+from clima.fora_memoria import (
+    criar_modelos_fora_da_memoria,
+    executar_comparacao_fora_da_memoria,
+    preparar_matrizes,
+    treinar_melhor_fora_da_memoria,
+)
+from clima.incremental import construir_armazenamento, diretorio_incremental, ler_estado
+from clima.ingestao import carregar_estacoes
+from clima.jaschke import carregar_jaschke
+from clima.registro import registrar_modelo
+from clima.validacao import divisao_temporal
 
-# Processar dados
-df_sem_lags['data'] = pd.to_datetime(df_sem_lags['data'])
-df_sem_lags = df_sem_lags.set_index('data')
-for col in df_sem_lags.columns:
-    df_sem_lags[col] = pd.to_numeric(df_sem_lags[col], errors='coerce')
-df_sem_lags = df_sem_lags.interpolate(method='time')
-df_sem_lags = df_sem_lags.reset_index()
+# Carregar dados originais (sem lag features)
+caminho_csv = '/home/iioulos/Documents/IC_Danilo-Cotozika/Dados do INEP que eu solicitei/dados_A707_D_2014-01-01_2025-05-01.csv'
 
-# Carregar dados com lag features
-df_com_lags = pd.read_csv('/home/iioulos/Documents/IC_Danilo-Cotozika/dados_climaticos_com_lags.csv')
-df_com_lags['data'] = pd.to_datetime(df_com_lags['data'])
+parser = argparse.ArgumentParser(description='Compara modelos com e sem lag features')
+parser.add_argument('origem', nargs='?', default=caminho_csv,
+                    help='CSV, diretório ou glob de exports do INMET')
+parser.add_argument('--n-jobs', type=int, default=-1,
+                    help='Número de processos da grade de modelos (-1 = todos os núcleos)')
+parser.add_argument('--validacao', choices=['temporal', 'aleatoria'], default='temporal',
+                    help='Walk-forward com janela expansível ou divisão 80/20 embaralhada')
+parser.add_argument('--folds', type=int, default=5,
+                    help='Número de folds da validação temporal')
+parser.add_argument('--sem-registro', action='store_true',
+                    help='Não salvar o melhor modelo no registro (modelos/)')
+parser.add_argument('--historico-jaschke', action='store_true',
+                    help='Inclui a série 1968-2008 da FCT/UNESP (cache gerado por scripts/converter_jaschke.py)')
+parser.add_argument('--sem-interpolacao', action='store_true',
+                    help='Mantém as falhas como NaN: Random Forest e Hist Gradient Boosting as tratam '
+                         'nativamente, os demais modelos recebem imputação pela mediana do treino')
+parser.add_argument('--svr-componentes', type=int, default=300,
+                    help='Componentes Nystroem do SVR Aproximado')
+parser.add_argument('--svr-gamma', type=float, default=None,
+                    help='gamma do kernel RBF do SVR Aproximado (padrão: 1/n_features, como o SVR)')
+parser.add_argument('--svr-alpha', type=float, default=0.1,
+                    help='Regularização do Ridge do SVR Aproximado')
+parser.add_argument('--ajustar-svr', action='store_true',
+                    help='Escolhe os hiperparâmetros do SVR Aproximado por busca em grade nos folds (com lags)')
+parser.add_argument('--sem-svr-exato', action='store_true',
+                    help='Tira o SVR exato da grade (O(n²)-O(n³); inviável acima de dezenas de milhares de linhas)')
+parser.add_argument('--fora-da-memoria', action='store_true',
+                    help='Inclui modelos treinados em blocos do armazenamento incremental (partial_fit / memmap)')
+parser.add_argument('--somente-fora-da-memoria', action='store_true',
+                    help='Só os modelos fora da memória (bases maiores que a RAM; implica --fora-da-memoria)')
+parser.add_argument('--armazenamento',
+                    help='Diretório do armazenamento incremental (padrão: .cache/incremental junto aos exports)')
+parser.add_argument('--tamanho-bloco', type=int, default=100_000,
+                    help='Linhas por bloco no treino fora da memória')
+args = parser.parse_args()
+args.fora_da_memoria = args.fora_da_memoria or args.somente_fora_da_memoria
 
 # Features para modelos sem lag
 features_sem_lags = ['temp_minima', 'temp_maxima', 'umidade_relativa_media', 'pressao_atm_media']
 target = 'temp_media'
 
-# Features para modelos com lag (incluindo as originais + lag features)
-features_com_lags = features_sem_lags + [col for col in df_com_lags.columns if '_lag' in col]
-
-# Definir modelos
-modelos = {
-    'Regressão Linear': LinearRegression(),
-    'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1),
-    'Gradient Boosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
-    'SVR': SVR()
-}
-
-# Dicionário para armazenar resultados
-resultados = {}
-
-print('=== TREINANDO MODELOS SEM LAG FEATURES ===')
-print('-' * 50)
-
-# Preparar dados sem lag
-df_sem_lags_clean = df_sem_lags.dropna(subset=features_sem_lags + [target])
-X_sem_lags = df_sem_lags_clean[features_sem_lags]
-y_sem_lags = df_sem_lags_clean[target]
-
-X_train_sem, X_test_sem, y_train_sem, y_test_sem = train_test_split(
-    X_sem_lags, y_sem_lags, test_size=0.2, random_state=42
-)
-
-print(f'Dados de treino: {X_train_sem.shape[0]} amostras')
-print(f'Dados de teste: {X_test_sem.shape[0]} amostras')
-print()
-
-# Treinar modelos sem lag
-for nome, modelo in modelos.items():
-    print(f'Treinando {nome}...')
-    
-    # SVR precisa de normalização
-    if nome == 'SVR':
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train_sem)
-        X_test_scaled = scaler.transform(X_test_sem)
-        
-        modelo.fit(X_train_scaled, y_train_sem)
-        y_pred = modelo.predict(X_test_scaled)
-    else:
-        modelo.fit(X_train_sem, y_train_sem)
-        y_pred = modelo.predict(X_test_sem)
-    
-    rmse = np.sqrt(mean_squared_error(y_test_sem, y_pred))
-    r2 = r2_score(y_test_sem, y_pred)
-    
-    resultados[f'{nome} (Sem Lags)'] = {
-        'RMSE': rmse,
-        'R2': r2,
-        'Tipo': 'Sem Lag Features'
+# Walk-forward: cada fold treina no passado e testa no bloco seguinte (sem vazamento dos lags)
+if args.validacao == 'temporal':
+    divisor = partial(divisao_temporal, n_folds=args.folds, intervalo=7)
+else:
+    divisor = divisao_aleatoria
+
+modelos = criar_modelos()
+modelos['SVR Aproximado'] = criar_svr_aproximado(args.svr_componentes, args.svr_gamma, args.svr_alpha)
+if args.sem_svr_exato:
+    del modelos['SVR']
+
+conjuntos = {}
+resultados = pd.DataFrame()
+if not args.somente_fora_da_memoria:
+    # Dados sem lag features (leitura paralela, conversão numérica e interpolação com cache colunar)
+    df_sem_lags, estacoes = carregar_estacoes(args.origem, interpolar=not args.sem_interpolacao)
+    if args.historico_jaschke:
+        historico, estacao_historica = carregar_jaschke()
+        df_sem_lags = pd.concat([historico, df_sem_lags]).sort_index()
+        estacoes = pd.concat([estacao_historica, estacoes])
+    df_sem_lags = df_sem_lags.reset_index()
+    print(f'Estações carregadas: {len(estacoes)} ({", ".join(estacoes.index)})')
+
+    # Dados com lag features (lags 1, 2, 3 e 7 dias gerados na hora, sem cruzar estações)
+    df_com_lags = criar_lag_features(df_sem_lags, grupo='estacao', dropna=not args.sem_interpolacao)
+
+    # Features para modelos com lag (incluindo as originais + lag features)
+    features_com_lags = features_sem_lags + [col for col in df_com_lags.columns if '_lag' in col]
+
+    # Preparar dados sem e com lag (sem interpolação, só linhas sem o alvo saem)
+    df_sem_lags_clean = df_sem_lags.dropna(subset=[target] if args.sem_interpolacao else features_sem_lags + [target])
+    df_com_lags_clean = df_com_lags.dropna(subset=[target] if args.sem_interpolacao else features_com_lags + [target])
+
+    conjuntos = {
+        'Sem Lag Features': (df_sem_lags_clean[features_sem_lags], df_sem_lags_clean[target], df_sem_lags_clean['data']),
+        'Com Lag Features': (df_com_lags_clean[features_com_lags], df_com_lags_clean[target], df_com_lags_clean['data']),
     }
-    
-    print(f'  RMSE: {rmse:.4f}')
-    print(f'  R²: {r2:.4f}')
-    print()
-
-print('=== TREINANDO MODELOS COM LAG FEATURES ===')
-print('-' * 50)
-
-# Preparar dados com lag
-df_com_lags_clean = df_com_lags.dropna(subset=features_com_lags + [target])
-X_com_lags = df_com_lags_clean[features_com_lags]
-y_com_lags = df_com_lags_clean[target]
-
-X_train_com, X_test_com, y_train_com, y_test_com = train_test_split(
-    X_com_lags, y_com_lags, test_size=0.2, random_state=42
-)
 
-print(f'Dados de treino: {X_train_com.shape[0]} amostras')
-print(f'Dados de teste: {X_test_com.shape[0]} amostras')
-print(f'Número de features: {X_train_com.shape[1]}')
-print()
+    for tipo, (X, y, _) in conjuntos.items():
+        print(f'{tipo}: {X.shape[0]} amostras, {X.shape[1]} features')
+    print()
 
-# Treinar modelos com lag
-for nome, modelo in modelos.items():
-    print(f'Treinando {nome} com lag features...')
-    
-    # SVR precisa de normalização
-    if nome == 'SVR':
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train_com)
-        X_test_scaled = scaler.transform(X_test_com)
-        
-        modelo.fit(X_train_scaled, y_train_com)
-        y_pred = modelo.predict(X_test_scaled)
-    else:
-        modelo.fit(X_train_com, y_train_com)
-        y_pred = modelo.predict(X_test_com)
-    
-    rmse = np.sqrt(mean_squared_error(y_test_com, y_pred))
-    r2 = r2_score(y_test_com, y_pred)
-    
-    resultados[f'{nome} (Com Lags)'] = {
-        'RMSE': rmse,
-        'R2': r2,
-        'Tipo': 'Com Lag Features'
+    if args.ajustar_svr:
+        melhores, busca = ajustar_svr_aproximado(*conjuntos['Com Lag Features'], divisor=divisor, n_jobs=args.n_jobs)
+        print('=== AJUSTE DO SVR APROXIMADO ===')
+        print(busca.head(5).round(4).to_string(index=False))
+        print(f'Melhores hiperparâmetros: {melhores}\n')
+        modelos['SVR Aproximado'].set_params(**melhores)
+
+    # Cada (modelo x conjunto x fold) é uma tarefa independente no pool de processos
+    print('=== TREINANDO MODELOS (SEM E COM LAG FEATURES) ===')
+    print('-' * 50)
+    if args.sem_interpolacao:
+        modelos = com_imputacao(modelos)
+    resultados = executar_comparacao(conjuntos, modelos, divisor=divisor, n_jobs=args.n_jobs, verbose=5)
+
+resultados_fora = pd.DataFrame()
+if args.fora_da_memoria:
+    # As features vêm do armazenamento incremental (mesmos lags), em blocos, para matrizes em disco
+    diretorio = diretorio_incremental(args.origem, args.armazenamento)
+    estado = ler_estado(diretorio)
+    if estado is None:
+        print(f'Construindo o armazenamento incremental em {diretorio}...')
+        _, estado = construir_armazenamento(args.origem, diretorio)
+    conjuntos_fora = {
+        'Sem Lag Features': (features_sem_lags, target),
+        'Com Lag Features': (features_sem_lags + nomes_lags(), target),
     }
-    
-    print(f'  RMSE: {rmse:.4f}')
-    print(f'  R²: {r2:.4f}')
-    print()
+    matrizes = preparar_matrizes(diretorio, conjuntos_fora, tamanho_bloco=args.tamanho_bloco)
+    if args.somente_fora_da_memoria:
+        estacoes = pd.DataFrame(index=sorted({marca['estacao'] for marca in estado['arquivos'].values()}))
+    for tipo, (X, y, _) in matrizes.items():
+        print(f'{tipo} (fora da memória): {X.shape[0]} amostras, {X.shape[1]} features em {X.filename}')
+
+    print('\n=== TREINANDO MODELOS FORA DA MEMÓRIA ===')
+    print('-' * 50)
+    resultados_fora = executar_comparacao_fora_da_memoria(matrizes, divisor=divisor,
+                                                          tamanho_bloco=args.tamanho_bloco, verbose=1)
+    resultados = pd.concat([resultados, resultados_fora], ignore_index=True)
+
+print('\n=== RESULTADOS POR FOLD ===')
+print(resultados[['Tipo', 'Modelo', 'Divisao', 'RMSE', 'MAE', 'R2', 'Tempo_Treino_s']].round(4).to_string(index=False))
+resultados.to_csv('/home/iioulos/Documents/IC_Danilo-Cotozika/comparacao_lag_features_folds.csv', index=False)
+print('\nResultados por fold salvos em: comparacao_lag_features_folds.csv')
+
+# Custo de cada modelo (ex.: SVR Aproximado x SVR exato) nos mesmos folds
+print('\n=== TEMPO MÉDIO POR FOLD (s) ===')
+print(resultados.pivot_table(index='Modelo', columns='Tipo', values=['Tempo_Treino_s', 'Tempo_Predicao_s'],
+                             sort=False).round(4).to_string())
+print()
 
 # Criar DataFrame com resultados
-df_resultados = pd.DataFrame(resultados).T
-df_resultados = df_resultados.reset_index()
-df_resultados.columns = ['Modelo', 'RMSE', 'R2', 'Tipo']
+df_resultados = tabela_comparacao(resultados)
 
 print('=== RESULTADOS COMPARATIVOS ===')
 print(df_resultados.round(4))
@@ -166,25 +180,39 @@ df_resultados.to_csv('/home/iioulos/Documents/IC_Danilo-Cotozika/comparacao_lag_
 print('\nResultados salvos em: comparacao_lag_features_completa.csv')
 
 # Calcular melhorias percentuais
-melhorias = []
-for modelo_base in ['Regressão Linear', 'Random Forest', 'Gradient Boosting', 'SVR']:
-    sem_lags = df_resultados[(df_resultados['Modelo'].str.contains(modelo_base)) & (df_resultados['Tipo'] == 'Sem Lag Features')]
-    com_lags = df_resultados[(df_resultados['Modelo'].str.contains(modelo_base)) & (df_resultados['Tipo'] == 'Com Lag Features')]
-    
-    if not sem_lags.empty and not com_lags.empty:
-        melhoria_rmse = ((sem_lags['RMSE'].iloc[0] - com_lags['RMSE'].iloc[0]) / sem_lags['RMSE'].iloc[0]) * 100
-        melhoria_r2 = ((com_lags['R2'].iloc[0] - sem_lags['R2'].iloc[0]) / sem_lags['R2'].iloc[0]) * 100
-        
-        melhorias.append({
-            'Modelo': modelo_base,
-            'Melhoria_RMSE_%': melhoria_rmse,
-            'Melhoria_R2_%': melhoria_r2
-        })
-
-df_melhorias = pd.DataFrame(melhorias)
+df_melhorias = tabela_melhorias(df_resultados)
 print('\n=== MELHORIAS COM LAG FEATURES ===')
 print(df_melhorias.round(2))
 
 # Salvar melhorias
 df_melhorias.to_csv('/home/iioulos/Documents/IC_Danilo-Cotozika/melhorias_lag_features.csv', index=False)
 print('\nMelhorias salvas em: melhorias_lag_features.csv')
+
+# Retreinar o melhor modelo com todos os dados e salvar no registro
+if not args.sem_registro:
+    medias = resultados.groupby(['Modelo', 'Tipo'], sort=False)['RMSE'].mean()
+    if medias.idxmin()[0] in criar_modelos_fora_da_memoria():
+        nome_modelo, tipo, melhor_modelo, metricas = treinar_melhor_fora_da_memoria(
+            resultados_fora, matrizes, tamanho_bloco=args.tamanho_bloco
+        )
+        features_melhor, datas_melhor = conjuntos_fora[tipo][0], matrizes[tipo][2]
+        # treinado com o pré-processamento do armazenamento incremental, não com --sem-interpolacao
+        interpolacao = estado.get('interpolacao', True)
+    else:
+        resultados_memoria = resultados[~resultados['Modelo'].isin(list(criar_modelos_fora_da_memoria()))]
+        nome_modelo, tipo, melhor_modelo, metricas = treinar_melhor_modelo(resultados_memoria, conjuntos, modelos)
+        features_melhor, datas_melhor = list(conjuntos[tipo][0].columns), conjuntos[tipo][2]
+        interpolacao = not args.sem_interpolacao
+    metadados = registrar_modelo(
+        melhor_modelo,
+        identificador_modelo(nome_modelo, tipo),
+        features=features_melhor,
+        lags={'variaveis': VARIAVEIS_LAG, 'lags': LAGS_PADRAO} if tipo == 'Com Lag Features' else None,
+        janela_treino=(datas_melhor.min(), datas_melhor.max()),
+        metricas=metricas,
+        target=target,
+        estacoes=list(estacoes.index),
+        validacao=args.validacao,
+        interpolacao=interpolacao,
+    )
+    print(f"\nMelhor modelo ({nome_modelo}, {tipo}) registrado: {metadados['nome']} v{metadados['versao']}")
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Previsão em lote com um modelo do registro (modelos/)
+
+Exemplo:
+    python scripts/prever.py random_forest_sem_lags "dados/dados_INEP/*.csv" previsoes.parquet
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.inferencia import TAMANHO_BLOCO, prever_arquivos
+
+parser = argparse.ArgumentParser(description='Gera previsões em lote a partir de exports do INMET')
+parser.add_argument('modelo', help='Nome do modelo no registro (ex.: random_forest_sem_lags)')
+parser.add_argument('origem', help='CSV, diretório ou glob de exports do INMET')
+parser.add_argument('destino', help='Arquivo de saída (.parquet ou .csv)')
+parser.add_argument('--versao', type=int, default=None,
+                    help='Versão do modelo (padrão: a mais recente)')
+parser.add_argument('--tamanho-bloco', type=int, default=TAMANHO_BLOCO,
+                    help='Linhas lidas e previstas por bloco')
+parser.add_argument('--sem-cache', action='store_true',
+                    help='Ler sempre o CSV, ignorando o cache colunar')
+parser.add_argument('--silencioso', action='store_true',
+                    help='Não mostrar o progresso por bloco')
+args = parser.parse_args()
+
+estatisticas = prever_arquivos(
+    args.origem,
+    args.modelo,
+    args.destino,
+    versao=args.versao,
+    tamanho_bloco=args.tamanho_bloco,
+    usar_cache=not args.sem_cache,
+    verbose=not args.silencioso,
+)
+
+print(f"\nModelo: {estatisticas['modelo']} v{estatisticas['versao']}")
+print(f"Linhas previstas: {estatisticas['linhas']:,} em {estatisticas['segundos']:.2f}s")
+print(f"Vazão: {estatisticas['linhas_por_segundo']:,.0f} linhas/s")
+print(f"Previsões salvas em: {estatisticas['destino']}")
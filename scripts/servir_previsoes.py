@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Servidor HTTP local de previsões com modelos do registro (modelos/)
+
+Exemplo:
+    python scripts/servir_previsoes.py --historico "dados/dados_INEP/*.csv" --porta 8000
+    curl "http://127.0.0.1:8000/forecast?station=A707"
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from clima.ingestao import carregar_estacoes
+from clima.servico import MODELOS_PREVISAO_PADRAO, ServicoPrevisao, criar_servidor
+
+parser = argparse.ArgumentParser(description='Serve previsões de temperatura via HTTP')
+parser.add_argument('--modelo', default=None,
+                    help='Modelo do registro usado em /predict (padrão: o de menor RMSE registrado)')
+parser.add_argument('--historico', default=None,
+                    help='CSV, diretório ou glob do INMET para preencher os buffers de /forecast')
+parser.add_argument('--sem-forecast', action='store_true',
+                    help='Não carregar os modelos de previsão do dia seguinte')
+parser.add_argument('--host', default='127.0.0.1')
+parser.add_argument('--porta', type=int, default=8000)
+parser.add_argument('--espera-lote-ms', type=float, default=2.0,
+                    help='Tempo máximo que um pedido espera para formar o micro-lote')
+args = parser.parse_args()
+
+try:
+    servico = ServicoPrevisao(
+        args.modelo,
+        modelos_previsao=None if args.sem_forecast else MODELOS_PREVISAO_PADRAO,
+        espera_max=args.espera_lote_ms / 1000,
+    )
+except FileNotFoundError as erro:
+    sys.exit(f'Erro: {erro}')
+servico.aquecer()
+
+if args.historico and servico.modelos_previsao:
+    dados, estacoes = carregar_estacoes(args.historico)
+    servico.carregar_historico(dados)
+    print(f'Buffers preenchidos: {", ".join(estacoes.index)}')
+
+servidor = criar_servidor(servico, args.host, args.porta)
+print(f'Servindo {servico.modelo.nome} v{servico.modelo.versao} em http://{args.host}:{servidor.server_port}')
+try:
+    servidor.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    servidor.server_close()
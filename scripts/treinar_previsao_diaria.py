@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Treina e registra os modelos de previsão do dia seguinte (apenas lag features)
+
+Exemplo:
+    python scripts/treinar_previsao_diaria.py "dados/dados_INEP/*.csv" --n-jobs 4
+"""
+import argparse
+import sys
+import warnings
+from functools import partial
+from pathlib import Path
+warnings.filterwarnings('ignore')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sklearn.ensemble import RandomForestRegressor
+
+from clima.comparacao import executar_comparacao, treinar_melhor_modelo
+from clima.features import LAGS_PADRAO, VARIAVEIS_LAG, criar_lag_features, nomes_lags
+from clima.ingestao import carregar_estacoes
+from clima.registro import registrar_modelo
+from clima.servico import MODELOS_PREVISAO_PADRAO
+from clima.validacao import divisao_temporal
+
+parser = argparse.ArgumentParser(description='Treina modelos de previsão do dia seguinte')
+parser.add_argument('origem', help='CSV, diretório ou glob de exports do INMET')
+parser.add_argument('--n-jobs', type=int, default=-1,
+                    help='Número de processos da validação (-1 = todos os núcleos)')
+parser.add_argument('--folds', type=int, default=5,
+                    help='Número de folds da validação temporal')
+args = parser.parse_args()
+
+df, estacoes = carregar_estacoes(args.origem)
+df = criar_lag_features(df.reset_index(), grupo='estacao')
+
+# Só valores de dias anteriores: a linha do dia D é prevista com o que se sabia em D - 1
+features = nomes_lags(VARIAVEIS_LAG, LAGS_PADRAO)
+modelos = {'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=1)}
+divisor = partial(divisao_temporal, n_folds=args.folds, intervalo=7)
+
+for target, nome_registro in MODELOS_PREVISAO_PADRAO.items():
+    df_target = df.dropna(subset=features + [target])
+    conjuntos = {'Com Lag Features': (df_target[features], df_target[target], df_target['data'])}
+
+    resultados = executar_comparacao(conjuntos, modelos=modelos, divisor=divisor, n_jobs=args.n_jobs)
+    _, _, modelo, metricas = treinar_melhor_modelo(resultados, conjuntos, modelos=modelos)
+
+    metadados = registrar_modelo(
+        modelo,
+        nome_registro,
+        features=features,
+        lags={'variaveis': VARIAVEIS_LAG, 'lags': LAGS_PADRAO},
+        janela_treino=(df_target['data'].min(), df_target['data'].max()),
+        metricas=metricas,
+        target=target,
+        horizonte_dias=1,
+        estacoes=list(estacoes.index),
+    )
+    print(f"{target}: RMSE {metricas['RMSE']:.3f}, R2 {metricas['R2']:.3f} "
+          f"-> {metadados['nome']} v{metadados['versao']}")